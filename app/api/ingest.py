@@ -1,72 +1,164 @@
 from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, Form
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.db.postgres import get_db
-from app.db.models import DocumentMetadata
-from app.db.weaviate import get_weaviate_client
-from app.core.embeddings import embedding_service
-from app.core.chunking import chunk_text
-from app.core.logging import logger
-from app.schemas.ingest import IngestResponse, TextIngestRequest
-import pypdf
-import io
+from app.db.models import DocumentMetadata, IngestionJob
+from app.core.ingestion import ingestion_queue
+from app.schemas.ingest import IngestJobResponse, IngestJobStatus, TextIngestRequest, TextBatchIngestRequest, IngestBatchResponse
+from datetime import datetime
+import asyncio
+import shutil
 import uuid
 
 router = APIRouter()
 
-async def process_document(title: str, text: str, tags: str, source: str, db: AsyncSession):
-    # 1. Save metadata to Postgres
-    doc_id = uuid.uuid4()
-    doc_meta = DocumentMetadata(id=doc_id, title=title, source=source, tags=tags)
-    db.add(doc_meta)
-    await db.commit()
-    await db.refresh(doc_meta)
+def _spool_upload(src, path: str):
+    with open(path, "wb") as out:
+        shutil.copyfileobj(src, out, 1024 * 1024)
 
-    # 2. Chunk text
-    chunks = chunk_text(text)
-    
-    # 3. Embed and store in Weaviate
-    weaviate_client = get_weaviate_client()
-    try:
-        if chunks:
-            # Batch embedding
-            embeddings = embedding_service.embed_documents(chunks)
-            for i, (chunk, vector) in enumerate(zip(chunks, embeddings)):
-                weaviate_client.insert_chunk(
-                    chunk_text=chunk,
-                    vector=vector,
-                    document_id=str(doc_id),
-                    chunk_index=i
-                )
-    finally:
-        weaviate_client.close()
+def _spool_text(text: str, path: str):
+    with open(path, "w", encoding="utf-8") as out:
+        out.write(text)
 
-    return doc_id, len(chunks)
+def _spool_texts(items: list[tuple[str, str]]):
+    for text, path in items:
+        _spool_text(text, path)
 
-@router.post("/file", response_model=IngestResponse)
+async def _document_ids_for(sources: list[str], db: AsyncSession) -> dict[str, uuid.UUID]:
+    """
+    Re-ingesting a source updates the existing document instead of creating a new one.
+    Falls back to a queued job for the same source, so back-to-back uploads don't fork it.
+    Sources seen for the first time are missing from the result. Two queries for any
+    number of sources (DISTINCT ON over the source indexes).
+    """
+    wanted = {s for s in sources if s and s != "manual_input"}
+    found: dict[str, uuid.UUID] = {}
+    for source_column, id_column, order_column in (
+        (DocumentMetadata.source, DocumentMetadata.id, DocumentMetadata.uploaded_at),
+        (IngestionJob.source, IngestionJob.document_id, IngestionJob.created_at),
+    ):
+        missing = wanted - found.keys()
+        if not missing:
+            break
+        rows = await db.execute(
+            select(source_column, id_column)
+            .where(source_column.in_(missing))
+            .distinct(source_column)
+            .order_by(source_column, order_column.desc())
+        )
+        found.update(rows.tuples().all())
+    return found
+
+async def _document_id_for(source: str, db: AsyncSession) -> uuid.UUID:
+    return (await _document_ids_for([source], db)).get(source) or uuid.uuid4()
+
+@router.post("/file", response_model=IngestJobResponse, status_code=202)
 async def ingest_file(
     file: UploadFile = File(...),
     title: str = Form(None),
     tags: str = Form(None),
     db: AsyncSession = Depends(get_db)
 ):
-    text = ""
-    # Only simple PDF parsing for now
-    if file.filename.endswith(".pdf"):
-        content = await file.read()
-        pdf_reader = pypdf.PdfReader(io.BytesIO(content))
-        for page in pdf_reader.pages:
-            text += page.extract_text() + "\n"
-    else:
-        # Assume text
-        content = await file.read()
-        text = content.decode("utf-8")
+    ingestion_queue.check_capacity()
+    job_id = uuid.uuid4()
+    path = ingestion_queue.spool_path(job_id)
+    await asyncio.to_thread(_spool_upload, file.file, path)
 
-    doc_title = title or file.filename
-    doc_id, chunk_count = await process_document(doc_title, text, tags, file.filename, db)
-    
-    return IngestResponse(document_id=doc_id, chunks_created=chunk_count, message="Document processed")
+    # Only simple PDF parsing for now; anything else is treated as UTF-8 text
+    job = IngestionJob(
+        id=job_id,
+        document_id=await _document_id_for(file.filename, db),
+        title=title or file.filename,
+        source=file.filename,
+        tags=tags,
+        content_type="pdf" if file.filename.endswith(".pdf") else "text",
+        payload_path=path
+    )
+    await ingestion_queue.submit(job, db)
+    return IngestJobResponse(job_id=job.id, document_id=job.document_id, status="queued", message="Document queued")
 
-@router.post("/text", response_model=IngestResponse)
+@router.post("/text", response_model=IngestJobResponse, status_code=202)
 async def ingest_text(request: TextIngestRequest, db: AsyncSession = Depends(get_db)):
-    doc_id, chunk_count = await process_document(request.title, request.text, request.tags, "manual_input", db)
-    return IngestResponse(document_id=doc_id, chunks_created=chunk_count, message="Text processed")
+    ingestion_queue.check_capacity()
+    job_id = uuid.uuid4()
+    path = ingestion_queue.spool_path(job_id)
+    await asyncio.to_thread(_spool_text, request.text, path)
+
+    job = IngestionJob(
+        id=job_id,
+        document_id=await _document_id_for(request.source, db),
+        title=request.title,
+        source=request.source or "manual_input",
+        tags=request.tags,
+        content_type="text",
+        payload_path=path
+    )
+    await ingestion_queue.submit(job, db)
+    return IngestJobResponse(job_id=job.id, document_id=job.document_id, status="queued", message="Text queued")
+
+@router.post("/batch", response_model=IngestBatchResponse, status_code=202)
+async def ingest_batch(request: TextBatchIngestRequest, db: AsyncSession = Depends(get_db)):
+    """
+    Queue many text documents at once: document ids are resolved and the jobs inserted
+    in a fixed number of statements, however many documents there are. Each document
+    is still ingested as its own job.
+    """
+    documents = request.documents
+    ingestion_queue.check_capacity(len(documents))
+    document_ids = await _document_ids_for([d.source for d in documents], db)
+    jobs = []
+    for document in documents:
+        source = document.source or "manual_input"
+        job_id = uuid.uuid4()
+        if source == "manual_input":
+            document_id = uuid.uuid4()
+        else:
+            # Repeats of a new source within the batch update one document
+            document_id = document_ids.setdefault(source, uuid.uuid4())
+        jobs.append({
+            "id": job_id,
+            "document_id": document_id,
+            "title": document.title,
+            "source": source,
+            "tags": document.tags,
+            "content_type": "text",
+            "payload_path": ingestion_queue.spool_path(job_id),
+        })
+    await asyncio.to_thread(_spool_texts, [(d.text, j["payload_path"]) for d, j in zip(documents, jobs)])
+
+    await ingestion_queue.submit_many(jobs, db)
+    return IngestBatchResponse(jobs=[
+        IngestJobResponse(job_id=j["id"], document_id=j["document_id"], status="queued", message="Text queued")
+        for j in jobs
+    ])
+
+@router.get("/jobs/{job_id}", response_model=IngestJobStatus)
+async def ingest_job_status(job_id: uuid.UUID, db: AsyncSession = Depends(get_db)):
+    job = await db.get(IngestionJob, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    elapsed = 0.0
+    if job.started_at:
+        elapsed = ((job.finished_at or datetime.utcnow()) - job.started_at).total_seconds()
+
+    return IngestJobStatus(
+        job_id=job.id,
+        document_id=job.document_id,
+        title=job.title,
+        source=job.source,
+        status=job.status,
+        stage=job.stage,
+        chunks_total=job.chunks_total,
+        chunks_embedded=job.chunks_embedded,
+        chunks_written=job.chunks_written,
+        chunks_failed=job.chunks_failed,
+        chunks_unchanged=job.chunks_unchanged,
+        chunks_removed=job.chunks_removed,
+        chunks_per_second=round(job.chunks_written / elapsed, 2) if elapsed > 0 else 0.0,
+        stage_seconds=job.stage_seconds or {},
+        error=job.error,
+        created_at=job.created_at,
+        started_at=job.started_at,
+        finished_at=job.finished_at
+    )
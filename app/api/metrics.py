@@ -0,0 +1,53 @@
+import re
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from app.api.stats import stats
+from app.core.metrics import metrics
+
+router = APIRouter()
+
+# /stats dicts keyed by a name rather than a fixed field: one series per name, with that name as a label
+_LABELED = {
+    ("workers", "tasks"): "task",
+    ("reranking", "degraded"): "reason",
+    ("llm", "circuits"): "model",
+    ("llm", "hedge_after_ms"): "model",
+}
+# /stats fields that only go up while the process runs
+_COUNTERS = {
+    "hits", "memory_hits", "disk_hits", "misses", "invalidations", "latency_saved_ms", "rejected", "count",
+    "batches", "queries", "calls", "candidates", "degraded", "completed", "failed", "opened", "ok", "retries",
+    "rate_limited", "errors", "timeouts", "fallback", "hedged", "hedge_won", "unavailable", "quota_wait_seconds",
+}
+_INVALID_NAME_CHARS = re.compile(r"[^a-zA-Z0-9_:]")
+
+def _series(path: tuple, values: dict, labels: tuple, out: list):
+    for key, value in values.items():
+        child = (*path, str(key))
+        label = _LABELED.get(child)
+        if label is not None and isinstance(value, dict):
+            for name, item in value.items():
+                _export(child, item, (*labels, (label, str(name))), out)
+        else:
+            _export(child, value, labels, out)
+
+def _export(path: tuple, value, labels: tuple, out: list):
+    # Numeric leaves of the /stats document, e.g. rag_embedding_cache_hits_total or
+    # rag_llm_circuits_opened_total{model="..."}
+    if isinstance(value, dict):
+        _series(path, value, labels, out)
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        name = _INVALID_NAME_CHARS.sub("_", "_".join(("rag", *path)))
+        if path[-1] in _COUNTERS:
+            out.append((f"{name}_total", "counter", labels, value))
+        else:
+            out.append((name, "gauge", labels, value))
+
+@router.get("", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Prometheus scrape endpoint: stage histograms, counters, and the /stats values as counters and gauges."""
+    series = []
+    snapshot = await stats()
+    snapshot.pop("latency", None)  # already exported as histograms
+    _series((), snapshot, (), series)
+    return PlainTextResponse(metrics.render(series), media_type="text/plain; version=0.0.4")
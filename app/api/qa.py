@@ -1,14 +1,45 @@
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.db.postgres import get_db
-from app.api.search import search
-from app.schemas.qa import QARequest, QAResponse
-from app.core.llm import llm_client
+from app.api.search import retrieve, retrieve_many
+from app.schemas.qa import ContextStats, QABatchRequest, QABatchResponse, QARequest, QAResponse
+from app.schemas.search import SearchResult
+from app.core.llm import llm_client, LLMUnavailable, RateLimitBackoff
 from app.core.prompts import QA_SYSTEM_PROMPT, QA_USER_PROMPT_TEMPLATE
 from app.core.logging import logger
+from app.core.workers import worker_pool, WorkerPoolSaturated
+from app.core.embeddings import embed_batch
+from app.core.batching import embedding_batcher
+from app.core.answer_cache import answer_cache
+from app.core.context import context_packer
+from app.core.metrics import metrics
+from app.core.config import get_settings
+import asyncio
+import json
+import time
+
+settings = get_settings()
 
 router = APIRouter()
 
+def build_user_prompt(question: str, results: list[SearchResult]) -> tuple[str, ContextStats]:
+    # Build Context (Enriched Format): adjacent chunks merged, near-duplicates dropped,
+    # packed to CONTEXT_MAX_TOKENS (see app.core.context)
+    enriched_context, stats = context_packer.pack(results)
+    
+    # Prompt Construction
+    return QA_USER_PROMPT_TEMPLATE.format(
+        context=enriched_context,
+        question=question
+    ), stats
+
+def sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def _ms(since: float) -> float:
+    return round((time.perf_counter() - since) * 1000, 1)
+
 @router.post("", response_model=QAResponse)
 async def question_answering(request: QARequest, db: AsyncSession = Depends(get_db)):
     """
@@ -18,39 +49,28 @@ async def question_answering(request: QARequest, db: AsyncSession = Depends(get_
     3. Generate answer asynchronously.
     """
     try:
+        # 0. Embed the question once; it is used for both the answer cache and retrieval
+        with metrics.span("embed_query"):
+            question_vector = await embedding_batcher.embed(request.question)
+        if settings.QA_CACHE_ENABLED:
+            cached = await answer_cache.lookup(question_vector, request.k, db)
+            if cached:
+                answer, sources = cached
+                logger.info("qa_cache_hit", question_len=len(request.question))
+                return QAResponse(answer=answer, sources=sources)
+        started = time.perf_counter()
+
         # 1. Retrieve context via search
         # We reuse the existing search logic which correctly queries Weaviate + Postgres
-        search_resp = await search(q=request.question, k=request.k, db=db)
+        search_resp = await retrieve(question_vector, k=request.k, db=db, query=request.question)
         
         # SAFEGUARD: If no context is found, return I don't know immediately
         if not search_resp.results:
             logger.info("qa_no_context", question=request.question)
             return QAResponse(answer="I don't know", sources=[])
         
-        # 2. Build Context (Enriched Format)
-        # We include ID, Title, and Score to give the LLM full visibility
-        context_chunks = []
-        for i, res in enumerate(search_resp.results, 1):
-            # Using get() for safety, though schema guarantees fields
-            # Fix: Use real title, fallback to Unknown
-            doc_title = getattr(res, "title", "Unknown Document") 
-            score = getattr(res, "score", 0.0)
-            
-            chunk_text = (
-                f"[Source {i}]\n"
-                f"Document: {doc_title}\n"
-                f"Similarity: {score:.4f}\n"
-                f"Content: {res.text}"
-            )
-            context_chunks.append(chunk_text)
-        
-        enriched_context = "\n\n".join(context_chunks)
-        
-        # 3. Prompt Construction
-        user_prompt = QA_USER_PROMPT_TEMPLATE.format(
-            context=enriched_context,
-            question=request.question
-        )
+        # 2-3. Build context and prompt
+        user_prompt, context_stats = build_user_prompt(request.question, search_resp.results)
         
         # 4. LLM Generation
         # Await the async generator
@@ -58,13 +78,177 @@ async def question_answering(request: QARequest, db: AsyncSession = Depends(get_
         
         # 5. Logging & Return
         logger.info("qa_success", question_len=len(request.question), response_len=len(answer))
+        answer = answer.strip()
+
+        # "I don't know" may be an LLM failure rather than a real answer, so it is never cached
+        if settings.QA_CACHE_ENABLED and answer != "I don't know":
+            answer_cache.store(question_vector, request.k, answer, search_resp.results, time.perf_counter() - started)
         
         return QAResponse(
-            answer=answer.strip(),
-            sources=search_resp.results
+            answer=answer,
+            sources=search_resp.results,
+            context=context_stats
         )
         
+    except (WorkerPoolSaturated, LLMUnavailable):
+        # Let backpressure reach the client as a 429/503 instead of a wrong answer
+        raise
     except Exception as e:
         logger.error("qa_endpoint_failed", error=str(e), question=request.question)
         # Graceful degradation - never crash the API for a runtime error
         return QAResponse(answer="I don't know", sources=[])
+
+@router.post("/batch", response_model=QABatchResponse)
+async def question_answering_batch(request: QABatchRequest, db: AsyncSession = Depends(get_db)):
+    """
+    RAG QA for many questions in one call (evaluation runs, bulk FAQ generation).
+    1. Embed all questions in one encode call and answer cache hits directly (one cache
+       pass, whose hits are checked against Postgres with one query).
+    2. Retrieve context for the rest concurrently, with one metadata query for the batch.
+    3. Generate answers QA_BATCH_LLM_CONCURRENCY at a time; a rate limit (429) pauses the
+       whole batch for the server's Retry-After before retrying.
+    Answers are in request order; a question that fails gets "I don't know".
+    """
+    started = time.perf_counter()
+    questions = request.questions
+    with metrics.span("embed_batch"):
+        question_vectors = await worker_pool.run(embed_batch, questions)
+
+    answers: list[QAResponse | None] = [None] * len(questions)
+    pending = []
+    # One cache pass (and one Postgres check) for the whole batch
+    cached_answers = (
+        await answer_cache.lookup_many(question_vectors, request.k, db) if settings.QA_CACHE_ENABLED
+        else [None] * len(questions)
+    )
+    for i, cached in enumerate(cached_answers):
+        if cached:
+            answers[i] = QAResponse(answer=cached[0], sources=cached[1])
+        else:
+            pending.append(i)
+    cached_count = len(questions) - len(pending)
+
+    # A failed search (or metadata lookup, shared by the batch) only costs the questions it served
+    retrieved = time.perf_counter()
+    try:
+        search_responses = await retrieve_many(
+            [question_vectors[i] for i in pending], request.k, db, queries=[questions[i] for i in pending],
+            return_exceptions=True
+        )
+    except WorkerPoolSaturated:
+        raise
+    except Exception as e:
+        logger.error("qa_batch_retrieval_failed", questions=len(pending), error=str(e))
+        search_responses = [e] * len(pending)
+
+    semaphore = asyncio.Semaphore(settings.QA_BATCH_LLM_CONCURRENCY)
+    backoff = RateLimitBackoff()
+
+    async def answer(i: int, results: list[SearchResult]):
+        if not results:
+            answers[i] = QAResponse(answer="I don't know", sources=[])
+            return
+        user_prompt, context_stats = build_user_prompt(questions[i], results)
+        async with semaphore:
+            try:
+                text = (await llm_client.generate(
+                    system_content=QA_SYSTEM_PROMPT, user_content=user_prompt, backoff=backoff
+                )).strip()
+            except LLMUnavailable:
+                # One question running out of retries doesn't fail the rest of the batch
+                text = "I don't know"
+        if settings.QA_CACHE_ENABLED and text != "I don't know":
+            answer_cache.store(question_vectors[i], request.k, text, results, time.perf_counter() - retrieved)
+        answers[i] = QAResponse(answer=text, sources=results, context=context_stats)
+
+    async def answer_or_degrade(i: int, response):
+        # Graceful degradation per question, as /qa does for a single one
+        try:
+            if isinstance(response, Exception):
+                raise response
+            await answer(i, response.results)
+        except (WorkerPoolSaturated, LLMUnavailable):
+            raise
+        except Exception as e:
+            logger.error("qa_batch_question_failed", question=questions[i], error=str(e))
+            answers[i] = QAResponse(answer="I don't know", sources=[])
+
+    await asyncio.gather(*(answer_or_degrade(i, resp) for i, resp in zip(pending, search_responses)))
+
+    elapsed = time.perf_counter() - started
+    logger.info(
+        "qa_batch_done", questions=len(questions), cached=cached_count, elapsed_ms=round(elapsed * 1000, 1),
+        llm_retries=backoff.retries, rate_limited=backoff.rate_limited
+    )
+    return QABatchResponse(
+        answers=answers,
+        questions=len(questions),
+        cached=cached_count,
+        elapsed_ms=round(elapsed * 1000, 1),
+        questions_per_second=round(len(questions) / elapsed, 1) if elapsed else 0.0
+    )
+
+@router.post("/stream")
+async def question_answering_stream(request: QARequest, db: AsyncSession = Depends(get_db)):
+    """
+    Streaming RAG QA over Server-Sent Events.
+    Emits a `sources` event first, then one `token` event per generated delta, and a final
+    `done` event with time-to-first-token, total latency and context packing stats (or an
+    `error` event).
+    Retrieval happens before the stream opens, so backpressure still surfaces as a 429.
+    """
+    started = time.perf_counter()
+    with metrics.span("embed_query"):
+        question_vector = await embedding_batcher.embed(request.question)
+
+    cached = await answer_cache.lookup(question_vector, request.k, db) if settings.QA_CACHE_ENABLED else None
+    if cached:
+        search_results = cached[1]
+    else:
+        search_results = (await retrieve(question_vector, k=request.k, db=db, query=request.question)).results
+    # Before the stream opens: once `sources` is sent, a failure can only be an `error` event
+    if not cached and search_results:
+        user_prompt, context_stats = build_user_prompt(request.question, search_results)
+
+    async def events():
+        yield sse_event("sources", [s.model_dump(mode="json") for s in search_results])
+
+        if cached:
+            yield sse_event("token", {"text": cached[0]})
+            yield sse_event("done", {"cached": True, "ttft_ms": _ms(started), "total_ms": _ms(started)})
+            return
+        if not search_results:
+            logger.info("qa_no_context", question=request.question)
+            yield sse_event("token", {"text": "I don't know"})
+            yield sse_event("done", {"cached": False, "ttft_ms": _ms(started), "total_ms": _ms(started)})
+            return
+
+        parts = []
+        ttft = None
+        try:
+            async for delta in llm_client.stream(system_content=QA_SYSTEM_PROMPT, user_content=user_prompt):
+                if ttft is None:
+                    ttft = _ms(started)
+                parts.append(delta)
+                yield sse_event("token", {"text": delta})
+        except asyncio.CancelledError:
+            # Client went away; the LLM stream is closed by its own cleanup
+            logger.info("qa_stream_cancelled", tokens_sent=len(parts), ttft_ms=ttft, elapsed_ms=_ms(started))
+            raise
+        except Exception as e:
+            logger.error("qa_stream_failed", error=str(e), question=request.question)
+            yield sse_event("error", {"message": "I don't know"})
+            return
+
+        answer = "".join(parts).strip()
+        total = _ms(started)
+        logger.info("qa_stream_success", question_len=len(request.question), response_len=len(answer), ttft_ms=ttft, total_ms=total)
+        if settings.QA_CACHE_ENABLED and answer and answer != "I don't know":
+            answer_cache.store(question_vector, request.k, answer, search_results, total / 1000)
+        yield sse_event("done", {"cached": False, "ttft_ms": ttft, "total_ms": total, "context": context_stats.model_dump()})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
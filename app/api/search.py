@@ -1,69 +1,194 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
 from app.db.postgres import get_db
-from app.db.models import DocumentMetadata
-from app.db.weaviate import get_weaviate_client
-from app.core.embeddings import embedding_service
-from app.schemas.search import SearchResponse, SearchResult
+from app.db.models import split_tags
+from app.db.vector_store import ChunkFilter, ChunkHit, get_vector_store
+from app.core.batching import embedding_batcher
+from app.core.embeddings import embed_batch
+from app.core.workers import worker_pool, WorkerPoolSaturated
+from app.core.config import get_settings
+from app.core.reranking import rerank_stage
+from app.core.metadata_cache import metadata_cache
+from app.core.metrics import metrics
+from app.schemas.search import SearchBatchRequest, SearchBatchResponse, SearchResponse, SearchResult
 from app.core.logging import logger
+from datetime import datetime
+from typing import Literal, Optional
+import asyncio
+import time
 import uuid
 
 router = APIRouter()
+settings = get_settings()
 
 @router.get("/", response_model=SearchResponse)
-async def search(q: str, k: int = 5, db: AsyncSession = Depends(get_db)):
-    # 1. Embed query
-    query_vector = embedding_service.embed_text(q)
-    
-    # 2. Search Weaviate
-    weaviate_client = get_weaviate_client()
-    try:
-        results = weaviate_client.search(query_vector, limit=k)
-    finally:
-        weaviate_client.close()
+async def search(
+    q: str,
+    k: int = 5,
+    mode: Optional[Literal["vector", "hybrid"]] = None,
+    alpha: Optional[float] = Query(None, ge=0.0, le=1.0),
+    fusion: Optional[Literal["relative", "rrf"]] = None,
+    tags: Optional[str] = None,
+    source: Optional[str] = None,
+    uploaded_after: Optional[datetime] = None,
+    uploaded_before: Optional[datetime] = None,
+    rerank: Optional[bool] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    mode=hybrid fuses BM25 keyword scores with vector similarity (alpha: 1 = pure vector,
+    0 = pure keyword; fusion=rrf for reciprocal rank fusion). tags (comma separated, any
+    match), source and the uploaded_at range filter inside the vector store, before the top k.
+    rerank overrides RERANK_ENABLED for this query.
+    """
+    # 1. Embed query (micro-batched with concurrent queries on the worker pool)
+    with metrics.span("embed_query"):
+        query_vector = await embedding_batcher.embed(q)
+    filters = ChunkFilter(split_tags(tags), source, uploaded_after, uploaded_before)
+    return await retrieve(
+        query_vector, k, db, query=q, mode=mode,
+        alpha=alpha, fusion=fusion, filters=filters, rerank=rerank
+    )
 
+@router.post("/batch", response_model=SearchBatchResponse)
+async def search_batch(request: SearchBatchRequest, db: AsyncSession = Depends(get_db)):
+    """
+    Many queries in one call, with the same options and filters as GET /search.
+    All queries are embedded in one encode call, searched concurrently
+    (SEARCH_BATCH_CONCURRENCY at a time), and their metadata is fetched in one query.
+    Results are in request order.
+    """
+    started = time.perf_counter()
+    with metrics.span("embed_batch"):
+        query_vectors = await worker_pool.run(embed_batch, request.queries)
+    filters = ChunkFilter(split_tags(request.tags), request.source, request.uploaded_after, request.uploaded_before)
+    responses = await retrieve_many(
+        query_vectors, request.k, db, queries=request.queries, mode=request.mode,
+        alpha=request.alpha, fusion=request.fusion, filters=filters, rerank=request.rerank
+    )
+    elapsed = time.perf_counter() - started
+    logger.info("search_batch_done", queries=len(request.queries), elapsed_ms=round(elapsed * 1000, 1))
+    return SearchBatchResponse(
+        results=responses,
+        queries=len(request.queries),
+        elapsed_ms=round(elapsed * 1000, 1),
+        queries_per_second=round(len(request.queries) / elapsed, 1) if elapsed else 0.0
+    )
+
+async def retrieve(
+    query_vector: list[float], k: int, db: AsyncSession, query: str = None, mode: str = None,
+    alpha: float = None, fusion: str = None, filters: ChunkFilter = None, rerank: bool = None
+) -> SearchResponse:
+    """
+    Search plus metadata merge for an already-embedded query.
+    Vector or hybrid BM25 + vector retrieval (hybrid and reranking need the query text).
+    With reranking, RERANK_CANDIDATES are retrieved and the k best by cross-encoder
+    score are kept; if the rerank budget runs out the retrieval order is kept instead.
+    """
+    hits = await _retrieve_hits(query_vector, k, query, mode, alpha, fusion, filters, rerank)
+    return (await _merge_metadata([hits], db))[0]
+
+async def retrieve_many(
+    query_vectors: list[list[float]], k: int, db: AsyncSession, queries: list[str] = None, mode: str = None,
+    alpha: float = None, fusion: str = None, filters: ChunkFilter = None, rerank: bool = None,
+    concurrency: int = None, return_exceptions: bool = False
+) -> list[SearchResponse | Exception]:
+    """
+    retrieve() for many queries at once: vector store searches (and reranking) run
+    concurrently, at most `concurrency` at a time, and document metadata for the whole
+    batch comes from a single IN query.
+    With return_exceptions, a query whose search fails gets its exception in place of a
+    response and the others still complete (backpressure is always raised).
+    """
+    semaphore = asyncio.Semaphore(concurrency or settings.SEARCH_BATCH_CONCURRENCY)
+    queries = queries or [None] * len(query_vectors)
+
+    async def one(query_vector, query):
+        async with semaphore:
+            try:
+                return await _retrieve_hits(query_vector, k, query, mode, alpha, fusion, filters, rerank)
+            except WorkerPoolSaturated:
+                raise
+            except Exception as e:
+                if not return_exceptions:
+                    raise
+                logger.error("search_query_failed", query=query, error=str(e))
+                return e
+
+    hits = await asyncio.gather(*(one(v, q) for v, q in zip(query_vectors, queries)))
+    merged = iter(await _merge_metadata([h for h in hits if not isinstance(h, Exception)], db))
+    return [h if isinstance(h, Exception) else next(merged) for h in hits]
+
+async def _retrieve_hits(
+    query_vector: list[float], k: int, query: str = None, mode: str = None, alpha: float = None,
+    fusion: str = None, filters: ChunkFilter = None, rerank: bool = None
+) -> tuple[list[ChunkHit], dict]:
+    """Top k hits for one query, plus {chunk uuid: rerank score} when reranked."""
+    mode = mode or settings.SEARCH_MODE
+    rerank = (settings.RERANK_ENABLED if rerank is None else rerank) and query is not None
+    limit = max(k, settings.RERANK_CANDIDATES) if rerank else k
+
+    # 2. Search the vector store (pooled connection, off the event loop)
+    with metrics.span("vector_search"):
+        if mode == "hybrid" and query is not None:
+            fusion = fusion or settings.SEARCH_HYBRID_FUSION
+            results = await get_vector_store().run(
+                lambda store: store.hybrid_search(query, query_vector, limit=limit, alpha=alpha, fusion=fusion, filters=filters)
+            )
+        else:
+            results = await get_vector_store().run(lambda store: store.search(query_vector, limit=limit, filters=filters))
+
+    # 2b. Rerank the over-fetched candidates, then keep the top k
+    rerank_scores = {}
+    if rerank and len(results) > 1:
+        with metrics.span("rerank"):
+            scores = await rerank_stage.scores(query, [res.properties.get('text', '') for res in results])
+        if scores is not None:
+            rerank_scores = {res.uuid: score for res, score in zip(results, scores)}
+            results = sorted(results, key=lambda res: rerank_scores[res.uuid], reverse=True)
+    return results[:k], rerank_scores
+
+async def _merge_metadata(hit_sets: list[tuple[list[ChunkHit], dict]], db: AsyncSession) -> list[SearchResponse]:
     # 3. Merge metadata
-    search_results = []
-    
-    # Pre-fetch doc metadata to avoid N+1 if possible, or just query one by one for simplicity (k is small)
-    # Ideally, collect IDs and do IN query.
+    # Collect the document ids of every query's hits; cache misses are fetched with one IN query
     doc_ids = set()
-    for res in results:
-        # Weaviate collections object returns properties as dict
-        props = res.properties
-        if 'document_id' in props:
-            doc_ids.add(uuid.UUID(props['document_id']))
-
-    # Bulk fetch metadata
-    meta_map = {}
-    if doc_ids:
-        stmt = select(DocumentMetadata).where(DocumentMetadata.id.in_(doc_ids))
-        result_proxy = await db.execute(stmt)
-        metas = result_proxy.scalars().all()
-        meta_map = {m.id: m for m in metas}
-
-    for res in results:
-        props = res.properties
-        doc_id_str = props.get('document_id')
-        doc_uuid = uuid.UUID(doc_id_str) if doc_id_str else None
-        
-        meta = meta_map.get(doc_uuid)
-        
-        # distance is returned in metadata, typical similarity = 1 - distance/2 or similar depends on metric
-        # Weaviate typically returns distance. Let's just use 1/(1+distance) or similar proxy if needed, 
-        # but for now we pass raw retrieval stats or just 1.0 if not provided.
-        # Actually res.metadata.distance is available if requested.
-        score = 0.0
-        if res.metadata and res.metadata.distance is not None:
-            score = 1.0 - res.metadata.distance # Approximate similarity
-
-        search_results.append(SearchResult(
-            document_id=doc_uuid,
-            text=props.get('text', ''),
-            score=score,
-            title=meta.title if meta else "Unknown",
-            source=meta.source if meta else "Unknown"
-        ))
-
-    return SearchResponse(results=search_results)
+    for results, _ in hit_sets:
+        for res in results:
+            # Stores return chunk properties as a dict
+            props = res.properties
+            if 'document_id' in props:
+                doc_ids.add(uuid.UUID(props['document_id']))
+
+    # Bulk fetch metadata (title/source rarely change after ingest, so they are cached)
+    with metrics.span("metadata"):
+        meta_map = await metadata_cache.get_many(doc_ids, db) if doc_ids else {}
+
+    responses = []
+    for results, rerank_scores in hit_sets:
+        search_results = []
+        for res in results:
+            props = res.properties
+            doc_id_str = props.get('document_id')
+            doc_uuid = uuid.UUID(doc_id_str) if doc_id_str else None
+
+            meta = meta_map.get(doc_uuid)
+
+            # Cosine distance from vector search, fused score from hybrid search
+            score = 0.0
+            if res.distance is not None:
+                score = 1.0 - res.distance # Approximate similarity
+            elif res.score is not None:
+                score = res.score
+
+            search_results.append(SearchResult(
+                document_id=doc_uuid,
+                chunk_id=res.uuid,
+                chunk_index=props.get('chunk_index'),
+                text=props.get('text', ''),
+                score=score,
+                rerank_score=rerank_scores.get(res.uuid),
+                title=meta.title if meta else "Unknown",
+                source=meta.source if meta else "Unknown"
+            ))
+        responses.append(SearchResponse(results=search_results))
+    return responses
@@ -0,0 +1,29 @@
+from fastapi import APIRouter
+from app.core.workers import worker_pool
+from app.core.batching import embedding_batcher
+from app.core.embeddings import embedding_service
+from app.core.answer_cache import answer_cache
+from app.core.metadata_cache import metadata_cache
+from app.core.metrics import metrics
+from app.core.reranking import rerank_stage
+from app.core.ingestion import ingestion_queue
+from app.core.llm import llm_client
+
+router = APIRouter()
+
+@router.get("")
+async def stats():
+    """Runtime counters for the in-process components (JSON)."""
+    return {
+        "workers": worker_pool.stats(),
+        "query_batching": embedding_batcher.stats(),
+        # In process worker mode each worker keeps its own memory tier; these are this process's counters
+        "embedding_cache": embedding_service.cache.stats(),
+        "qa_cache": answer_cache.stats(),
+        "metadata_cache": metadata_cache.stats(),
+        "reranking": rerank_stage.stats(),
+        "ingestion": ingestion_queue.stats(),
+        "llm": llm_client.gateway.stats(),
+        # Per-stage p50/p95/p99 (full histograms on /metrics)
+        "latency": metrics.summary()
+    }
@@ -0,0 +1,152 @@
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+import numpy as np
+from sqlalchemy import or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import get_settings
+from app.core.logging import logger
+from app.db.models import DocumentMetadata
+
+settings = get_settings()
+
+class SemanticAnswerCache:
+    """
+    Semantic cache for QA answers.
+    Stores (question embedding, answer, documents it was built from) and serves the answer for
+    any later question whose embedding is within the similarity threshold, as long as
+    the entry hasn't expired and none of its source documents were re-ingested since.
+    Ingestion in this process drops entries directly; re-ingestion in another worker process
+    is caught on a hit by checking the documents' content_updated_at in Postgres.
+    """
+    def __init__(self, threshold: float = None, ttl: float = None, max_entries: int = None,
+                 check_documents: bool = None):
+        self.threshold = settings.QA_CACHE_SIMILARITY_THRESHOLD if threshold is None else threshold
+        self.ttl = settings.QA_CACHE_TTL_SECONDS if ttl is None else ttl
+        self.max_entries = max_entries or settings.QA_CACHE_MAX_ENTRIES
+        self.check_documents = settings.QA_CACHE_CHECK_DOCUMENTS if check_documents is None else check_documents
+        self._entries: OrderedDict[int, dict] = OrderedDict()
+        self._next_id = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.latency_saved = 0.0
+
+    @staticmethod
+    def _normalize(vector) -> np.ndarray:
+        v = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(v)
+        return v / norm if norm else v
+
+    def _expire(self):
+        cutoff = time.monotonic() - self.ttl
+        for entry_id in [i for i, e in self._entries.items() if e["created_at"] < cutoff]:
+            del self._entries[entry_id]
+
+    async def _changed(self, entries: list[dict], db: AsyncSession) -> list[bool]:
+        """
+        For each entry, whether a document its answer was built from (or a newer upload
+        from one of its sources) changed since; one query for all of them.
+        """
+        document_ids = set().union(*(e["document_ids"] for e in entries))
+        sources = set().union(*(e["source_names"] for e in entries)) - {None}
+        conditions = [DocumentMetadata.id.in_(document_ids)]
+        if sources:
+            conditions.append(DocumentMetadata.source.in_(sources))
+        result = await db.execute(
+            select(DocumentMetadata.id, DocumentMetadata.source, DocumentMetadata.content_updated_at)
+            .where(or_(*conditions), DocumentMetadata.content_updated_at >= min(e["built_at"] for e in entries))
+        )
+        changed = result.all()
+        return [
+            any(
+                (document_id in e["document_ids"] or source in e["source_names"] - {None}) and updated_at >= e["built_at"]
+                for document_id, source, updated_at in changed
+            )
+            for e in entries
+        ]
+
+    def _closest(self, question_vector: list[float], k: int):
+        candidates = [(i, e) for i, e in self._entries.items() if e["k"] == k]
+        if candidates:
+            matrix = np.stack([e["vector"] for _, e in candidates])
+            similarities = matrix @ self._normalize(question_vector)
+            best = int(np.argmax(similarities))
+            if similarities[best] >= self.threshold:
+                return candidates[best]
+        return None
+
+    async def lookup(self, question_vector: list[float], k: int, db: AsyncSession):
+        """Return the cached (answer, sources) for the closest similar question, or None."""
+        return (await self.lookup_many([question_vector], k, db))[0]
+
+    async def lookup_many(self, question_vectors: list[list[float]], k: int, db: AsyncSession) -> list:
+        """lookup() for several questions, checking all their matches against Postgres at once."""
+        self._expire()
+        matches = [self._closest(vector, k) for vector in question_vectors]
+        found = {entry_id: entry for entry_id, entry in filter(None, matches)}
+        stale = set()
+        if self.check_documents and found:
+            changed = await self._changed(list(found.values()), db)
+            stale = {entry_id for entry_id, is_changed in zip(found, changed) if is_changed}
+            for entry_id in stale:
+                self._entries.pop(entry_id, None)
+            if stale:
+                self.invalidations += len(stale)
+                logger.info("qa_cache_invalidated", entries=len(stale), reason="document_changed")
+        results = []
+        for match in matches:
+            if match is None or match[0] in stale:
+                self.misses += 1
+                results.append(None)
+                continue
+            entry_id, entry = match
+            self._entries.move_to_end(entry_id)
+            self.hits += 1
+            self.latency_saved += entry["latency"]
+            results.append((entry["answer"], entry["sources"]))
+        return results
+
+    def store(self, question_vector: list[float], k: int, answer: str, sources: list, latency: float):
+        """Cache an answer; latency is what retrieval + generation cost, i.e. what a hit saves."""
+        self._entries[self._next_id] = {
+            "vector": self._normalize(question_vector),
+            "k": k,
+            "answer": answer,
+            "sources": sources,
+            "document_ids": {s.document_id for s in sources},
+            "source_names": {s.source for s in sources},
+            "latency": latency,
+            "created_at": time.monotonic(),
+            # Wall clock (as content_updated_at) when retrieval started; a document changed since may not be in the answer
+            "built_at": datetime.utcnow() - timedelta(seconds=latency),
+        }
+        self._next_id += 1
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, document_id=None, source: str = None):
+        """Drop every answer built from the given document (or a document from the same source)."""
+        stale = [
+            i for i, e in self._entries.items()
+            if document_id in e["document_ids"] or (source is not None and source in e["source_names"])
+        ]
+        for entry_id in stale:
+            del self._entries[entry_id]
+        if stale:
+            self.invalidations += len(stale)
+            logger.info("qa_cache_invalidated", entries=len(stale), document_id=str(document_id), source=source)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "invalidations": self.invalidations,
+            "latency_saved_ms": round(self.latency_saved * 1000, 1),
+        }
+
+# Singleton instance
+answer_cache = SemanticAnswerCache()
@@ -0,0 +1,76 @@
+import asyncio
+from app.core.config import get_settings
+from app.core.embeddings import embed_batch
+from app.core.logging import logger
+from app.core.workers import worker_pool
+
+settings = get_settings()
+
+class EmbeddingBatcher:
+    """
+    Micro-batcher in front of EmbeddingService for query embeddings.
+    Queries arriving within a short window (or until max_batch_size is reached) are
+    encoded in a single call on the worker pool, and each caller's future is resolved
+    with its own vector.
+    """
+    def __init__(self, window_ms: float = None, max_batch_size: int = None):
+        self.window = (settings.EMBEDDING_BATCH_WINDOW_MS if window_ms is None else window_ms) / 1000
+        self.max_batch_size = max_batch_size or settings.EMBEDDING_BATCH_MAX_SIZE
+        self._pending: list[tuple[str, asyncio.Future]] = []
+        self._timer: asyncio.TimerHandle | None = None
+        self._tasks: set[asyncio.Task] = set()
+        self._batches = 0
+        self._queries = 0
+        self._largest_batch = 0
+
+    async def embed(self, text: str) -> list[float]:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        task = asyncio.get_running_loop().create_task(self._encode(batch))
+        # Keep a reference so the task isn't garbage collected mid-flight
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _encode(self, batch: list[tuple[str, asyncio.Future]]):
+        self._batches += 1
+        self._queries += len(batch)
+        self._largest_batch = max(self._largest_batch, len(batch))
+        try:
+            vectors = await worker_pool.run(embed_batch, [text for text, _ in batch])
+        except Exception as e:
+            logger.error("embedding_batch_failed", batch_size=len(batch), error=str(e))
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), vector in zip(batch, vectors):
+            # Callers that were cancelled (e.g. client disconnected) are skipped
+            if not future.done():
+                future.set_result(vector)
+
+    def stats(self) -> dict:
+        return {
+            "window_ms": self.window * 1000,
+            "max_batch_size": self.max_batch_size,
+            "batches": self._batches,
+            "queries": self._queries,
+            "avg_batch_size": round(self._queries / self._batches, 2) if self._batches else 0.0,
+            "largest_batch": self._largest_batch,
+        }
+
+# Singleton instance
+embedding_batcher = EmbeddingBatcher()
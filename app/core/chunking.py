@@ -1,26 +1,238 @@
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Iterable, Iterator
+from app.core.config import get_settings
 from app.core.logging import logger
 
+settings = get_settings()
+
+class StreamingChunker:
+    """
+    Incremental version of the sliding window chunker.
+    Text is fed piece by piece (PDF pages, file blocks) and complete windows are returned
+    as soon as they are known; only about one window of words is held at a time. A word
+    split across a piece boundary is carried over to the next piece.
+    """
+    def __init__(self, chunk_size: int = 500, overlap: int = 100):
+        if overlap >= chunk_size:
+            raise ValueError("overlap must be smaller than chunk_size")
+        self.chunk_size = chunk_size
+        self.step = chunk_size - overlap
+        self._words: list[str] = []
+        self._carry = ""
+
+    def feed(self, piece: str) -> list[str]:
+        piece = self._carry + piece
+        self._carry = ""
+        words = piece.split()
+        if words and not piece[-1].isspace():
+            # The last word may continue in the next piece
+            self._carry = words.pop()
+        self._words.extend(words)
+        return self._drain()
+
+    def flush(self) -> list[str]:
+        if self._carry:
+            self._words.append(self._carry)
+            self._carry = ""
+        chunks = self._drain()
+        if self._words:
+            chunks.append(" ".join(self._words))
+            self._words = []
+        return chunks
+
+    def _drain(self) -> list[str]:
+        # A window is final once at least one word beyond it has arrived
+        chunks = []
+        while len(self._words) > self.chunk_size:
+            chunks.append(" ".join(self._words[:self.chunk_size]))
+            del self._words[:self.step]
+        return chunks
+
+def iter_chunks(pieces: Iterable[str], chunk_size: int = 500, overlap: int = 100) -> Iterator[str]:
+    """Generator version of chunk_text over a stream of text pieces; yields the same chunks."""
+    chunker = StreamingChunker(chunk_size, overlap)
+    for piece in pieces:
+        yield from chunker.feed(piece)
+    yield from chunker.flush()
+
 def chunk_text(text: str, chunk_size: int = 500, overlap: int = 100) -> list[str]:
     """
     Simple sliding window chunking based on words/tokens.
     For simplicity, we'll approximate tokens by splitting on whitespace.
     """
-    words = text.split()
-    if not words:
-        return []
-
-    chunks = []
-    start = 0
-    while start < len(words):
-        end = start + chunk_size
-        chunk = " ".join(words[start:end])
-        chunks.append(chunk)
-        
-        # Break if we've reached the end
-        if end >= len(words):
-            break
-            
-        start += (chunk_size - overlap)
-        
+    chunks = list(iter_chunks([text], chunk_size, overlap))
     logger.info("text_chunked", total_chunks=len(chunks))
     return chunks
+
+_PARAGRAPH_BREAK = re.compile(r"\n[ \t]*\n")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+_LIST_ITEM = re.compile(r"^\s*(?:[-*\u2022]|\(?\w{1,3}[.)])\s+")
+_MARKDOWN_HEADING = re.compile(r"^\s*#{1,6}\s+\S")
+
+def _is_heading(line: str, first_in_paragraph: bool) -> bool:
+    if _MARKDOWN_HEADING.match(line):
+        return True
+    # Short first line of a paragraph with no closing punctuation: "2. War Room", "Title: ..."
+    stripped = line.strip()
+    return (first_in_paragraph and 0 < len(stripped.split()) <= 10
+            and stripped[-1] not in ".,;:!?" and not stripped.startswith(("-", "*", "\u2022")))
+
+@dataclass
+class _Unit:
+    text: str
+    separator: str  # joins it to the previous unit: "\n\n" new paragraph, "\n" new line, " " same line
+    tokens: int = 0
+    heading: bool = False
+
+class TokenChunker:
+    """
+    Structure-aware chunker measured in the embedding model's own tokens, so every chunk
+    fits in what the model actually embeds (max_seq_length minus special tokens).
+    Paragraphs are split into heading, list-item and sentence units; all units of a fed
+    piece are tokenized in one batched call and packed greedily:
+    - a heading always starts a new chunk, so chunks don't straddle sections,
+    - a paragraph that doesn't fit in the current chunk starts a new one if the current
+      chunk is at least half full,
+    - otherwise chunks break between sentences, carrying up to `overlap` tokens of
+      trailing sentences into the next chunk,
+    - a single sentence longer than the budget is cut at token offsets.
+    Like StreamingChunker it is fed piece by piece; text after the last paragraph break is
+    held back (at most `max_buffer` characters), so memory stays bounded and every unit is
+    tokenized once (linear in the document size).
+    """
+    def __init__(self, tokenizer, max_tokens: int, overlap: int = 32, max_buffer: int = 64 * 1024):
+        self.tokenizer = tokenizer
+        # Room for [CLS]/[SEP] (or the model's equivalent)
+        self.budget = max_tokens - len(tokenizer.encode("").ids)
+        if overlap >= self.budget:
+            raise ValueError("overlap must be smaller than the chunk budget")
+        self.overlap = overlap
+        self.max_buffer = max_buffer
+        self._buffer = ""
+        self._continues = False  # the buffer continues a paragraph that was flushed early
+        self._units: list[_Unit] = []
+        self._tokens = 0
+
+    def feed(self, piece: str) -> list[str]:
+        self._buffer += piece
+        breaks = list(_PARAGRAPH_BREAK.finditer(self._buffer))
+        if breaks:
+            complete, self._buffer = self._buffer[:breaks[-1].start()], self._buffer[breaks[-1].end():]
+        elif len(self._buffer) > self.max_buffer:
+            # No paragraph break in sight (e.g. PDF text): cut at the last sentence end or space
+            cut = max(self._buffer.rfind(". ") + 1, self._buffer.rfind("\n"))
+            if cut <= 0:
+                cut = self._buffer.rfind(" ")
+            if cut <= 0:
+                cut = len(self._buffer)
+            complete, self._buffer = self._buffer[:cut], self._buffer[cut:]
+        else:
+            return []
+        chunks = self._pack(self._segment(complete))
+        self._continues = not breaks
+        return chunks
+
+    def flush(self) -> list[str]:
+        chunks = self._pack(self._segment(self._buffer))
+        self._buffer, self._continues = "", False
+        if self._units:
+            chunks.append(self._join(self._units))
+            self._units, self._tokens = [], 0
+        return chunks
+
+    def _segment(self, text: str) -> list[_Unit]:
+        units = []
+        for p, paragraph in enumerate(_PARAGRAPH_BREAK.split(text)):
+            continuing = p == 0 and self._continues
+            separator = " " if continuing else "\n\n"
+            block = []
+            def close_block():
+                nonlocal separator
+                if block:
+                    for s, sentence in enumerate(_SENTENCE_END.split(" ".join(block))):
+                        units.append(_Unit(sentence, separator if s == 0 else " "))
+                    separator = "\n"
+                    block.clear()
+            lines = [line.strip() for line in paragraph.split("\n") if line.strip()]
+            for i, line in enumerate(lines):
+                if _is_heading(line, i == 0 and not continuing):
+                    close_block()
+                    units.append(_Unit(line, separator, heading=True))
+                    separator = "\n"
+                    continue
+                # List items and lines after a finished sentence start a new line of output;
+                # other lines are wrapped text and are re-joined
+                if block and (_LIST_ITEM.match(line) or block[-1][-1] in ".!?:"):
+                    close_block()
+                block.append(line)
+            close_block()
+        # One batched call to the Rust tokenizer for everything in this piece
+        encodings = self.tokenizer.encode_batch([u.text for u in units], add_special_tokens=False) if units else []
+        out = []
+        for unit, encoding in zip(units, encodings):
+            unit.tokens = len(encoding.ids)
+            if unit.tokens <= self.budget:
+                out.append(unit)
+                continue
+            # Over-long sentence: cut into budget-sized windows at token boundaries
+            offsets, step = encoding.offsets, self.budget - self.overlap
+            for start in range(0, unit.tokens, step):
+                stop = min(start + self.budget, unit.tokens)
+                out.append(_Unit(unit.text[offsets[start][0]:offsets[stop - 1][1]], unit.separator if start == 0 else " ", stop - start))
+                if stop == unit.tokens:
+                    break
+        return out
+
+    def _emit(self, carry_overlap: bool) -> str:
+        chunk = self._join(self._units)
+        carried, tokens = [], 0
+        if carry_overlap:
+            for unit in reversed(self._units[1:]):
+                if tokens + unit.tokens > self.overlap:
+                    break
+                carried.insert(0, unit)
+                tokens += unit.tokens
+        self._units, self._tokens = carried, tokens
+        return chunk
+
+    def _pack(self, units: list[_Unit]) -> list[str]:
+        chunks = []
+        # Paragraph sizes, for the keep-paragraphs-together rule
+        paragraph_tokens, start = {}, 0
+        for i, unit in enumerate(units):
+            if unit.separator == "\n\n" or i == 0:
+                start = i
+            paragraph_tokens[start] = paragraph_tokens.get(start, 0) + unit.tokens
+        for i, unit in enumerate(units):
+            if self._units:
+                if unit.heading and not all(u.heading for u in self._units):
+                    chunks.append(self._emit(carry_overlap=False))
+                elif (i in paragraph_tokens and unit.separator == "\n\n"
+                      and self._tokens + paragraph_tokens[i] > self.budget and self._tokens >= self.budget // 2):
+                    chunks.append(self._emit(carry_overlap=False))
+                elif self._tokens + unit.tokens > self.budget:
+                    chunks.append(self._emit(carry_overlap=True))
+                    # The carried overlap must still leave room for this unit
+                    while self._units and self._tokens + unit.tokens > self.budget:
+                        self._tokens -= self._units.pop(0).tokens
+            self._units.append(unit)
+            self._tokens += unit.tokens
+        return chunks
+
+    @staticmethod
+    def _join(units: list[_Unit]) -> str:
+        return "".join((u.separator if i else "") + u.text for i, u in enumerate(units))
+
+@lru_cache()
+def _embedding_tokenizer():
+    from app.core.embeddings import embedding_service, load_tokenizer
+    return load_tokenizer(embedding_service.model_name)
+
+def make_chunker():
+    """The ingestion chunker selected by CHUNK_STRATEGY ("tokens" or the legacy "words")."""
+    if settings.CHUNK_STRATEGY == "words":
+        return StreamingChunker()
+    tokenizer, max_seq_length = _embedding_tokenizer()
+    return TokenChunker(tokenizer, settings.CHUNK_MAX_TOKENS or max_seq_length, settings.CHUNK_OVERLAP_TOKENS)
@@ -1,5 +1,6 @@
 from pydantic_settings import BaseSettings
 from functools import lru_cache
+from urllib.parse import urlparse
 
 class Settings(BaseSettings):
     PROJECT_NAME: str = "Kimochi RAG"
@@ -11,10 +12,105 @@ class Settings(BaseSettings):
     POSTGRES_DB: str
     POSTGRES_HOST: str
     POSTGRES_PORT: int = 5432
+    POSTGRES_POOL_SIZE: int = 10  # connections kept open per process
+    POSTGRES_MAX_OVERFLOW: int = 10  # extra connections under bursts, closed when returned
+    POSTGRES_POOL_TIMEOUT: float = 30.0  # seconds to wait for a free connection
+    POSTGRES_POOL_RECYCLE: int = 1800  # seconds; reconnect before server or proxy idle timeouts
+    POSTGRES_POOL_PRE_PING: bool = True  # check connections on checkout (survives Postgres restarts)
     
-    WEAVIATE_URL: str
+    VECTOR_STORE: str = "weaviate"  # "weaviate", or "local" for the in-process index (single node)
+    LOCAL_INDEX_PATH: str = "data/vector_index"
+    LOCAL_INDEX_DTYPE: str = "float32"  # or "float16": half the disk/page cache, slower exact scans (no f16 BLAS)
+    LOCAL_INDEX_IVF_MIN_ROWS: int = 50_000  # exact scan below this many chunks, IVF above
+    LOCAL_INDEX_IVF_NPROBE: int = 8  # IVF lists scanned per query
+
+    WEAVIATE_URL: str = "http://localhost:8080"  # unused with VECTOR_STORE=local
+    WEAVIATE_GRPC_PORT: int = 50051
+    WEAVIATE_POOL_SIZE: int = 4
+    WEAVIATE_HEALTHCHECK_INTERVAL: float = 30.0  # seconds between readiness probes per connection
+    WEAVIATE_BATCH_SIZE: int = 100
+    WEAVIATE_BATCH_CONCURRENCY: int = 2
     
+    METRICS_ENABLED: bool = True  # stage timings, counters and /metrics
+    OTEL_ENABLED: bool = False  # also export stage spans via OTLP (needs opentelemetry-sdk + exporter)
+    OTEL_SERVICE_NAME: str = "rag-api"
+    OTEL_EXPORTER_OTLP_ENDPOINT: str = ""  # empty = the exporter's default / OTEL_* env vars
+
     GROQ_API_KEY: str
+    GROQ_BASE_URL: str = ""  # override the Groq endpoint, e.g. a local fake server
+
+    LLM_MODEL: str = "mixtral-8x7b-32768"
+    LLM_FALLBACK_MODEL: str = ""  # secondary model for hedging and while the primary's breaker is open
+    LLM_TIMEOUT_SECONDS: float = 30.0  # deadline per answer, across retries and rate limit waits
+    LLM_MAX_CONCURRENCY: int = 16  # in-flight LLM calls (streams included) per process
+    LLM_RATE_LIMIT_RPM: int = 0  # requests per minute quota; 0 = no client-side limit
+    LLM_RATE_LIMIT_TPM: int = 0  # tokens per minute quota; 0 = no client-side limit
+    LLM_RATE_LIMIT_BURST_SECONDS: float = 10.0  # quota that may be spent at once, in seconds' worth
+    LLM_MAX_RETRIES: int = 3
+    LLM_RETRY_BASE_DELAY: float = 0.5  # seconds, doubled per attempt with jitter (when there is no Retry-After)
+    LLM_HEDGE_ENABLED: bool = False  # needs LLM_FALLBACK_MODEL
+    LLM_HEDGE_PERCENTILE: float = 95.0  # hedge once the primary is slower than this percentile of its latency
+    LLM_HEDGE_MIN_SAMPLES: int = 20  # primary latencies observed before hedging starts
+    LLM_BREAKER_FAILURES: int = 5  # consecutive failures that open a model's circuit
+    LLM_BREAKER_RESET_SECONDS: float = 30.0  # open circuit duration before a trial call
+
+    WORKER_POOL_MODE: str = "thread"  # "thread" or "process"
+    WORKER_POOL_SIZE: int = 2
+    WORKER_POOL_MAX_QUEUE: int = 32  # tasks waiting beyond this are rejected with 429
+
+    EMBEDDING_BACKEND: str = "torch"  # "torch" (sentence-transformers) or "onnx" (onnxruntime, no torch import)
+    EMBEDDING_ONNX_FILE: str = "onnx/model.onnx"  # in the model repo or a local path; int8: onnx/model_quint8_avx2.onnx
+    EMBEDDING_CACHE_MAX_ITEMS: int = 100_000
+    EMBEDDING_CACHE_MAX_BYTES: int = 256 * 1024 * 1024
+    EMBEDDING_CACHE_PATH: str = ""  # SQLite file for the persistent tier; empty = memory only
+    EMBEDDING_BATCH_WINDOW_MS: float = 5.0  # how long a query waits for others to share its encode call
+    EMBEDDING_BATCH_MAX_SIZE: int = 32
+
+    CHUNK_STRATEGY: str = "tokens"  # "tokens" (embedding tokenizer, structure-aware) or "words" (500/100 word window)
+    CHUNK_MAX_TOKENS: int = 0  # 0 = the embedding model's max_seq_length
+    CHUNK_OVERLAP_TOKENS: int = 32
+
+    INGEST_WORKERS: int = 2  # documents processed concurrently
+    INGEST_MAX_PENDING: int = 100  # queued jobs beyond this are rejected with 429
+    INGEST_BATCH_MAX_DOCUMENTS: int = 256  # per /ingest/batch request
+    INGEST_EMBED_BATCH_SIZE: int = 64  # chunks per embed -> write pipeline step
+    INGEST_PDF_PAGES_PER_TASK: int = 8  # PDF pages extracted per worker pool call
+    INGEST_TEXT_BLOCK_SIZE: int = 1024 * 1024  # characters read per step from text uploads
+    INGEST_SPOOL_DIR: str = "data/ingest_spool"  # uploads wait here until their job finishes
+    INGEST_HEARTBEAT_SECONDS: float = 10.0  # running jobs refresh heartbeat_at this often
+    INGEST_STALE_SECONDS: float = 60.0  # running jobs without a heartbeat this long are taken over
+
+    QA_CACHE_ENABLED: bool = True
+    QA_CACHE_SIMILARITY_THRESHOLD: float = 0.95  # cosine similarity between questions to reuse an answer
+    QA_CACHE_TTL_SECONDS: float = 3600.0
+    QA_CACHE_MAX_ENTRIES: int = 1000
+    QA_CACHE_CHECK_DOCUMENTS: bool = True  # verify hits against Postgres, so re-ingestion in any worker process invalidates
+
+    METADATA_CACHE_ENABLED: bool = True  # document title/source for search results, in process
+    METADATA_CACHE_MAX_ENTRIES: int = 10_000
+    METADATA_CACHE_TTL_SECONDS: float = 300.0  # bounds staleness across worker processes
+
+    CONTEXT_PACKING_ENABLED: bool = True  # merge adjacent chunks, drop near-duplicates, enforce the budget
+    CONTEXT_MAX_TOKENS: int = 3000  # QA prompt context budget
+    CONTEXT_DEDUP_THRESHOLD: float = 0.8  # word-shingle containment above which a passage is a duplicate
+    CONTEXT_TOKENIZER: str = ""  # LLM tokenizer (HF repo or dir with tokenizer.json); empty = embedding model's
+
+    SEARCH_BATCH_MAX_QUERIES: int = 256  # per /search/batch or /qa/batch request
+    SEARCH_BATCH_CONCURRENCY: int = 8  # vector store searches in flight per batch request
+    QA_BATCH_LLM_CONCURRENCY: int = 4  # LLM calls in flight per /qa/batch request
+    QA_BATCH_MAX_RETRIES: int = 3  # per question, on 429 / 5xx / connection errors
+    QA_BATCH_RETRY_BASE_DELAY: float = 1.0  # seconds, doubled per attempt when there is no Retry-After
+
+    SEARCH_MODE: str = "vector"  # default /search mode: "vector" or "hybrid" (BM25 + vector)
+    SEARCH_HYBRID_ALPHA: float = 0.5  # 1.0 = pure vector, 0.0 = pure BM25
+    SEARCH_HYBRID_FUSION: str = "relative"  # "relative" (score fusion) or "rrf" (reciprocal rank fusion)
+
+    RERANK_ENABLED: bool = False  # loads torch and adds up to RERANK_BUDGET_MS per query; rerank=true opts in per query
+    RERANK_MODEL: str = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+    RERANK_CANDIDATES: int = 20  # retrieved and scored per query; the best k are returned
+    RERANK_BUDGET_MS: float = 200.0  # over budget -> keep retrieval order
+    RERANK_BATCH_SIZE: int = 32
+    RERANK_QUANTIZE: bool = True  # dynamic int8 quantization of the cross-encoder on CPU
     
     LOG_LEVEL: str = "INFO"
 
@@ -25,6 +121,19 @@ class Settings(BaseSettings):
     def DATABASE_URL(self) -> str:
         return f"postgresql+asyncpg://{self.POSTGRES_USER}:{self.POSTGRES_PASSWORD}@{self.POSTGRES_HOST}:{self.POSTGRES_PORT}/{self.POSTGRES_DB}"
 
+    @property
+    def WEAVIATE_HOST(self) -> str:
+        return urlparse(self.WEAVIATE_URL).hostname or "localhost"
+
+    @property
+    def WEAVIATE_HTTP_PORT(self) -> int:
+        parsed = urlparse(self.WEAVIATE_URL)
+        return parsed.port or (443 if parsed.scheme == "https" else 8080)
+
+    @property
+    def WEAVIATE_SECURE(self) -> bool:
+        return urlparse(self.WEAVIATE_URL).scheme == "https"
+
 @lru_cache()
 def get_settings():
     return Settings()
@@ -0,0 +1,196 @@
+import uuid
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Optional
+from app.core.config import get_settings
+from app.core.logging import logger
+from app.core.metrics import metrics
+from app.schemas.qa import ContextStats
+from app.schemas.search import SearchResult
+
+settings = get_settings()
+
+_SHINGLE = 5  # words per shingle for near-duplicate detection
+_MIN_TRUNCATED_TOKENS = 32  # don't add a passage cut shorter than this
+
+@dataclass
+class Passage:
+    document_id: Optional[uuid.UUID]
+    title: Optional[str]
+    score: float
+    text: str
+    rank: int  # best retrieval rank among its chunks
+    chunk_indexes: list[int] = field(default_factory=list)
+
+@lru_cache()
+def _tokenizer():
+    # CONTEXT_TOKENIZER names the LLM's tokenizer (HF repo or local dir with tokenizer.json);
+    # unset, the embedding model's tokenizer is a close enough estimate for budgeting
+    from app.core.embeddings import embedding_service, load_tokenizer
+    try:
+        return load_tokenizer(settings.CONTEXT_TOKENIZER or embedding_service.model_name)[0]
+    except Exception as e:
+        # Cached too, so requests don't retry the download; counts fall back to an estimate
+        logger.error("context_tokenizer_unavailable", error=str(e))
+        return None
+
+def estimate_tokens(text: str) -> int:
+    # ~4 characters per token, as the LLM client estimates quota use
+    return len(text) // 4
+
+def count_tokens(text: str) -> int:
+    tokenizer = _tokenizer()
+    if tokenizer is None:
+        return estimate_tokens(text)
+    return len(tokenizer.encode(text, add_special_tokens=False).ids)
+
+def format_passage(i: int, title: Optional[str], score: float, text: str) -> str:
+    # We include ID, Title, and Score to give the LLM full visibility
+    return (
+        f"[Source {i}]\n"
+        f"Document: {title or 'Unknown Document'}\n"
+        f"Similarity: {score:.4f}\n"
+        f"Content: {text}"
+    )
+
+def _join_overlapping(first: str, second: str) -> str:
+    """Concatenate two consecutive chunks, dropping the words the second repeats from the first."""
+    a, b = first.split(), second.split()
+    # An empty (or whitespace-only) chunk adds nothing
+    if not b:
+        return first
+    if not a:
+        return second
+    # Longest suffix of a that is a prefix of b (chunk overlap is at most a window)
+    for start in range(max(0, len(a) - len(b)), len(a)):
+        if a[start] == b[0] and a[start:] == b[:len(a) - start]:
+            return " ".join(a + b[len(a) - start:])
+    return first + "\n" + second
+
+def _merge_adjacent(results: list[SearchResult]) -> tuple[list[Passage], int]:
+    by_document: dict = {}
+    for rank, res in enumerate(results):
+        by_document.setdefault(res.document_id, []).append((rank, res))
+    passages, merged = [], 0
+    for document_id, hits in by_document.items():
+        hits.sort(key=lambda h: (h[1].chunk_index is None, h[1].chunk_index or 0))
+        current = None
+        for rank, res in hits:
+            if (current is not None and res.chunk_index is not None and current.chunk_indexes
+                    and res.chunk_index == current.chunk_indexes[-1] + 1):
+                current.text = _join_overlapping(current.text, res.text)
+                current.chunk_indexes.append(res.chunk_index)
+                current.score = max(current.score, res.score)
+                current.rank = min(current.rank, rank)
+                merged += 1
+                continue
+            current = Passage(
+                document_id, res.title, res.score, res.text, rank,
+                [res.chunk_index] if res.chunk_index is not None else []
+            )
+            passages.append(current)
+    passages.sort(key=lambda p: p.rank)
+    return passages, merged
+
+def _shingles(text: str) -> set[int]:
+    words = text.lower().split()
+    if len(words) <= _SHINGLE:
+        return {hash(" ".join(words))}
+    return {hash(" ".join(words[i:i + _SHINGLE])) for i in range(len(words) - _SHINGLE + 1)}
+
+def _drop_near_duplicates(passages: list[Passage], threshold: float) -> tuple[list[Passage], int]:
+    """
+    Keep passages in rank order, skipping any whose shingles are mostly (>= threshold)
+    contained in an already kept passage, or that mostly contain one (the kept one is
+    then replaced by the longer text at its rank).
+    """
+    kept: list[tuple[Passage, set[int]]] = []
+    dropped = 0
+    for passage in passages:
+        shingles = _shingles(passage.text)
+        duplicate = False
+        for i, (other, other_shingles) in enumerate(kept):
+            common = len(shingles & other_shingles)
+            if common >= threshold * len(shingles):
+                duplicate = True
+                break
+            if common >= threshold * len(other_shingles):
+                # The new passage covers the kept one: keep the longer text, at the better rank
+                passage.rank = other.rank
+                passage.score = max(passage.score, other.score)
+                kept[i] = (passage, shingles)
+                duplicate = True
+                break
+        if duplicate:
+            dropped += 1
+        else:
+            kept.append((passage, shingles))
+    return [p for p, _ in kept], dropped
+
+class ContextPacker:
+    """
+    Context assembly for QA prompts:
+    1. chunks of the same document with consecutive chunk_index are merged into one
+       passage, with the text they share (window overlap) kept once,
+    2. near-duplicate passages (word-shingle containment >= dedup_threshold) are dropped,
+    3. passages are added in retrieval order up to max_tokens of context, measured with
+       the real tokenizer (a character estimate if it can't be loaded); the first one that
+       doesn't fit is cut at a token boundary.
+    Token savings against the verbatim concatenation are returned per request.
+    """
+    def __init__(self, max_tokens: int = None, dedup_threshold: float = None, enabled: bool = None):
+        self.max_tokens = max_tokens or settings.CONTEXT_MAX_TOKENS
+        self.dedup_threshold = settings.CONTEXT_DEDUP_THRESHOLD if dedup_threshold is None else dedup_threshold
+        self.enabled = settings.CONTEXT_PACKING_ENABLED if enabled is None else enabled
+
+    def pack(self, results: list[SearchResult]) -> tuple[str, ContextStats]:
+        verbatim = "\n\n".join(format_passage(i, r.title, r.score, r.text) for i, r in enumerate(results, 1))
+        if not self.enabled:
+            # No budget to enforce, so no tokenizer either; the counts are estimates
+            tokens_before = estimate_tokens(verbatim)
+            return verbatim, ContextStats(
+                chunks=len(results), passages=len(results), merged=0, duplicates=0, truncated=False,
+                tokens=tokens_before, tokens_before=tokens_before, tokens_saved=0
+            )
+
+        tokens_before = count_tokens(verbatim)
+        passages, merged = _merge_adjacent(results)
+        passages, duplicates = _drop_near_duplicates(passages, self.dedup_threshold)
+
+        blocks, used, truncated = [], 0, False
+        tokenizer = _tokenizer()
+        for passage in passages:
+            block = format_passage(len(blocks) + 1, passage.title, passage.score, passage.text)
+            # +2 for the blank line between blocks
+            cost = count_tokens(block) + (2 if blocks else 0)
+            if used + cost <= self.max_tokens:
+                blocks.append(block)
+                used += cost
+                continue
+            remaining = self.max_tokens - used - (count_tokens(format_passage(len(blocks) + 1, passage.title, passage.score, "")) + 2)
+            if remaining >= _MIN_TRUNCATED_TOKENS:
+                if tokenizer is None:
+                    cut = passage.text[:remaining * 4]
+                else:
+                    encoding = tokenizer.encode(passage.text, add_special_tokens=False)
+                    cut = passage.text[:encoding.offsets[min(remaining, len(encoding.ids)) - 1][1]]
+                blocks.append(format_passage(len(blocks) + 1, passage.title, passage.score, cut))
+                truncated = True
+            break
+
+        context = "\n\n".join(blocks)
+        tokens = count_tokens(context)
+        stats = ContextStats(
+            chunks=len(results), passages=len(blocks), merged=merged, duplicates=duplicates, truncated=truncated,
+            tokens=tokens, tokens_before=tokens_before, tokens_saved=max(0, tokens_before - tokens)
+        )
+        metrics.inc("rag_prompt_tokens_total", tokens, kind="sent")
+        metrics.inc("rag_prompt_tokens_total", stats.tokens_saved, kind="saved")
+        logger.info(
+            "qa_context_packed", chunks=stats.chunks, passages=stats.passages, merged=merged,
+            duplicates=duplicates, truncated=truncated, tokens=tokens, tokens_saved=stats.tokens_saved
+        )
+        return context, stats
+
+# Singleton instance
+context_packer = ContextPacker()
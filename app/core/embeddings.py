@@ -1,26 +1,286 @@
-from sentence_transformers import SentenceTransformer
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+import numpy as np
 from app.core.config import get_settings
 from app.core.logging import logger
+from app.core.metrics import metrics
+
+settings = get_settings()
+
+class EmbeddingCache:
+    """
+    Content-addressed embedding cache keyed by (model_name, hash of normalized text).
+    An in-process LRU tier bounded by entry count and bytes sits in front of an
+    optional SQLite tier that survives restarts. Entries for any other model are
+    dropped as soon as the model changes.
+    """
+    def __init__(self, max_items: int = None, max_bytes: int = None, path: str = None):
+        self.max_items = max_items or settings.EMBEDDING_CACHE_MAX_ITEMS
+        self.max_bytes = max_bytes or settings.EMBEDDING_CACHE_MAX_BYTES
+        self.path = settings.EMBEDDING_CACHE_PATH if path is None else path
+        self._memory: OrderedDict[str, np.ndarray] = OrderedDict()
+        self._bytes = 0
+        self._model_name = None
+        self._lock = threading.Lock()
+        self._db = None
+        self._db_pid = None
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @property
+    def db(self) -> sqlite3.Connection | None:
+        # Opened per process on first use: with gunicorn preload_app the cache is created in
+        # the master, and an SQLite connection must not be shared across fork
+        if not self.path:
+            return None
+        if self._db_pid != os.getpid():
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "model TEXT NOT NULL, key TEXT NOT NULL, vector BLOB NOT NULL, PRIMARY KEY (model, key))"
+            )
+            self._db.commit()
+            self._db_pid = os.getpid()
+        return self._db
+
+    @staticmethod
+    def key(text: str) -> str:
+        normalized = " ".join(unicodedata.normalize("NFC", text).split())
+        return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+    def _ensure_model(self, model_name: str):
+        # Called with the lock held
+        if model_name == self._model_name:
+            return
+        if self._model_name is not None:
+            logger.info("embedding_cache_invalidated", old_model=self._model_name, new_model=model_name)
+        self._memory.clear()
+        self._bytes = 0
+        self._model_name = model_name
+        if self.db is not None:
+            self.db.execute("DELETE FROM embeddings WHERE model != ?", (model_name,))
+            self.db.commit()
+
+    def _remember(self, key: str, vector: np.ndarray):
+        # Called with the lock held
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            return
+        self._memory[key] = vector
+        self._bytes += vector.nbytes
+        while self._memory and (len(self._memory) > self.max_items or self._bytes > self.max_bytes):
+            _, evicted = self._memory.popitem(last=False)
+            self._bytes -= evicted.nbytes
+
+    def get_many(self, model_name: str, texts: list[str]) -> list[np.ndarray | None]:
+        keys = [self.key(t) for t in texts]
+        found: list[np.ndarray | None] = [None] * len(texts)
+        with self._lock:
+            self._ensure_model(model_name)
+            disk_lookup = []
+            for i, key in enumerate(keys):
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    found[i] = vector
+                    self.memory_hits += 1
+                else:
+                    disk_lookup.append(i)
+
+            if disk_lookup and self.db is not None:
+                wanted = list({keys[i] for i in disk_lookup})
+                rows = {}
+                # Stay under SQLite's bound-parameter limit
+                for start in range(0, len(wanted), 500):
+                    part = wanted[start:start + 500]
+                    placeholders = ",".join("?" * len(part))
+                    rows.update(self.db.execute(
+                        f"SELECT key, vector FROM embeddings WHERE model = ? AND key IN ({placeholders})",
+                        (model_name, *part)
+                    ).fetchall())
+                for i in disk_lookup:
+                    blob = rows.get(keys[i])
+                    if blob is not None:
+                        found[i] = np.frombuffer(blob, dtype=np.float32)
+                        self._remember(keys[i], found[i])
+                        self.disk_hits += 1
+
+            self.misses += sum(1 for v in found if v is None)
+        return found
+
+    def put_many(self, model_name: str, texts: list[str], vectors):
+        entries = [(self.key(t), np.array(v, dtype=np.float32)) for t, v in zip(texts, vectors)]
+        with self._lock:
+            self._ensure_model(model_name)
+            for key, vector in entries:
+                self._remember(key, vector)
+            if self.db is not None:
+                self.db.executemany(
+                    "INSERT OR REPLACE INTO embeddings (model, key, vector) VALUES (?, ?, ?)",
+                    [(model_name, key, vector.tobytes()) for key, vector in entries]
+                )
+                self.db.commit()
+
+    def stats(self) -> dict:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "model": self._model_name,
+            "entries": len(self._memory),
+            "bytes": self._bytes,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+            "persistent": bool(self.path),
+        }
+
+def model_file(model_name: str, filename: str) -> str:
+    """Path of a file of a sentence-transformers model: a local model directory or the Hugging Face Hub."""
+    if os.path.isdir(model_name):
+        return os.path.join(model_name, filename)
+    from huggingface_hub import hf_hub_download
+    return hf_hub_download(model_name, filename)
+
+def load_tokenizer(model_name: str):
+    """
+    The model's fast (Rust) tokenizer, with truncation and padding off, and the
+    max_seq_length the model embeds (tokens beyond it are truncated by the encoder).
+    """
+    from tokenizers import Tokenizer
+    tokenizer = Tokenizer.from_file(model_file(model_name, "tokenizer.json"))
+    try:
+        with open(model_file(model_name, "sentence_bert_config.json")) as f:
+            max_seq_length = json.load(f)["max_seq_length"]
+    except Exception:
+        max_seq_length = (tokenizer.truncation or {}).get("max_length", 512)
+    tokenizer.no_truncation()
+    tokenizer.no_padding()
+    return tokenizer, max_seq_length
+
+class OnnxEncoder:
+    """
+    Torch-free sentence encoder: an exported ONNX transformer run with onnxruntime on CPU,
+    HF tokenizers, then mean pooling and L2 normalisation (the same pipeline as the
+    SentenceTransformer all-MiniLM-L6-v2 model). onnx_file is a path inside the model's
+    Hugging Face repo (e.g. onnx/model.onnx, or an int8 variant such as
+    onnx/model_quint8_avx2.onnx) or a local file.
+    """
+    def __init__(self, model_name: str, onnx_file: str, batch_size: int = 32):
+        import onnxruntime
+        model_path = onnx_file if os.path.exists(onnx_file) else model_file(model_name, onnx_file)
+        self.tokenizer, self.max_seq_length = load_tokenizer(model_name)
+        self.tokenizer.enable_truncation(max_length=self.max_seq_length)
+        self.tokenizer.enable_padding()
+        self.session = onnxruntime.InferenceSession(model_path, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.batch_size = batch_size
+
+    def encode(self, texts: list[str]) -> np.ndarray:
+        # Length-sorted batches keep padding (and wasted compute) small
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        out = [None] * len(texts)
+        for start in range(0, len(order), self.batch_size):
+            batch = order[start:start + self.batch_size]
+            encodings = self.tokenizer.encode_batch([texts[i] for i in batch])
+            inputs = {
+                "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+                "attention_mask": np.array([e.attention_mask for e in encodings], dtype=np.int64),
+                "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64),
+            }
+            hidden = self.session.run(None, {k: v for k, v in inputs.items() if k in self.input_names})[0]
+            mask = inputs["attention_mask"][..., None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+            for i, vector in zip(batch, pooled):
+                out[i] = vector
+        return np.stack(out).astype(np.float32)
 
 class EmbeddingService:
-    def __init__(self, model_name: str = "sentence-transformers/all-MiniLM-L6-v2"):
+    def __init__(self, model_name: str = "sentence-transformers/all-MiniLM-L6-v2", cache: EmbeddingCache = None, backend: str = None):
         self.model_name = model_name
+        self.backend = backend or settings.EMBEDDING_BACKEND
+        self.cache = cache if cache is not None else EmbeddingCache()
         self._model = None
+        self._loaded = None
+
+    @property
+    def cache_namespace(self) -> str:
+        # Vectors from different backends/quantizations are not interchangeable in the cache
+        if self.backend == "onnx":
+            return f"{self.model_name}:{settings.EMBEDDING_ONNX_FILE}"
+        return self.model_name
 
     @property
     def model(self):
-        if self._model is None:
-            logger.info("loading_embedding_model", model=self.model_name)
-            self._model = SentenceTransformer(self.model_name)
+        # Reload if model_name or backend was changed after the first load
+        if self._model is None or self._loaded != (self.model_name, self.backend):
+            logger.info("loading_embedding_model", model=self.model_name, backend=self.backend)
+            started = time.perf_counter()
+            if self.backend == "onnx":
+                self._model = OnnxEncoder(self.model_name, settings.EMBEDDING_ONNX_FILE)
+            elif self.backend == "torch":
+                # Imported here so the onnx backend never loads torch
+                from sentence_transformers import SentenceTransformer
+                self._model = SentenceTransformer(self.model_name)
+            else:
+                raise ValueError(f"Unknown EMBEDDING_BACKEND: {self.backend}")
+            self._loaded = (self.model_name, self.backend)
+            logger.info("embedding_model_loaded", backend=self.backend, seconds=round(time.perf_counter() - started, 2))
         return self._model
 
     def embed_text(self, text: str) -> list[float]:
-        embedding = self.model.encode(text)
-        return embedding.tolist()
+        return self.embed_documents([text])[0]
 
     def embed_documents(self, texts: list[str]) -> list[list[float]]:
-        embeddings = self.model.encode(texts)
-        return embeddings.tolist()
+        if not texts:
+            return []
+        # Only encode what the cache doesn't already have (each distinct text once)
+        namespace = self.cache_namespace
+        vectors = self.cache.get_many(namespace, texts)
+        missing = {}
+        for text, vector in zip(texts, vectors):
+            if vector is None:
+                missing.setdefault(self.cache.key(text), text)
+        metrics.inc("rag_embedding_texts_total", len(texts) - len(missing), cache="hit")
+        metrics.inc("rag_embedding_texts_total", len(missing), cache="miss")
+        if missing:
+            with metrics.span("embed_encode"):
+                encoded = self.model.encode(list(missing.values()))
+            self.cache.put_many(namespace, list(missing.values()), encoded)
+            computed = dict(zip(missing.keys(), encoded))
+            vectors = [computed[self.cache.key(t)] if v is None else v for t, v in zip(texts, vectors)]
+        return [np.asarray(v).tolist() for v in vectors]
 
 # Singleton instance
 embedding_service = EmbeddingService()
+
+# Module-level entry points for the worker pool (picklable in process mode)
+def embed_query(text: str) -> list[float]:
+    return embedding_service.embed_text(text)
+
+def embed_batch(texts: list[str]) -> list[list[float]]:
+    return embedding_service.embed_documents(texts)
+
+def preload() -> float:
+    """
+    Load the model weights without running them; returns seconds taken. For a parent that
+    forks its workers afterwards (gunicorn preload_app), which then share the weights
+    copy-on-write instead of each loading a copy.
+    """
+    started = time.perf_counter()
+    embedding_service.model
+    return time.perf_counter() - started
+
+def warm_up() -> float:
+    """Load the model and run one encode (bypassing the cache); returns seconds taken."""
+    started = time.perf_counter()
+    embedding_service.model.encode(["warm up"])
+    return time.perf_counter() - started
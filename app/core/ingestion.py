@@ -0,0 +1,445 @@
+import asyncio
+import hashlib
+import os
+import socket
+import time
+import uuid
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import and_, insert, or_, select, text, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.answer_cache import answer_cache
+from app.core.chunking import make_chunker
+from app.core.config import get_settings
+from app.core.embeddings import embed_batch
+from app.core.logging import logger
+from app.core.metadata_cache import metadata_cache
+from app.core.metrics import metrics
+from app.core.parsing import extract_pdf_pages
+from app.core.workers import worker_pool, WorkerPoolSaturated
+from app.db.models import DocumentMetadata, IngestionJob, split_tags
+from app.db.postgres import AsyncSessionLocal, engine
+from app.db.vector_store import get_vector_store
+
+settings = get_settings()
+
+# First key of the per-document advisory locks (the second is the document id's hash)
+_DOCUMENT_LOCK_NAMESPACE = 0x6b696d6f
+
+class IngestQueueFull(Exception):
+    """Raised when too many ingestion jobs are pending; surfaced to clients as HTTP 429."""
+
+async def _run_cpu(fn, *args):
+    # Ingestion yields to query traffic: wait for room on the worker pool instead of failing the job
+    while True:
+        try:
+            return await worker_pool.run(fn, *args)
+        except WorkerPoolSaturated:
+            await asyncio.sleep(0.5)
+
+async def _iter_pieces(job: IngestionJob, timings: dict):
+    """Yield the payload a few PDF pages (or one text block) at a time."""
+    if job.content_type == "pdf":
+        start, total = 0, None
+        while total is None or start < total:
+            started = time.perf_counter()
+            pages, total = await _run_cpu(extract_pdf_pages, job.payload_path, start, start + settings.INGEST_PDF_PAGES_PER_TASK)
+            timings["parse"] = timings.get("parse", 0.0) + time.perf_counter() - started
+            start += settings.INGEST_PDF_PAGES_PER_TASK
+            for page in pages:
+                yield page
+    else:
+        f = await asyncio.to_thread(open, job.payload_path, encoding="utf-8")
+        try:
+            while True:
+                started = time.perf_counter()
+                block = await asyncio.to_thread(f.read, settings.INGEST_TEXT_BLOCK_SIZE)
+                timings["parse"] = timings.get("parse", 0.0) + time.perf_counter() - started
+                if not block:
+                    break
+                yield block
+        finally:
+            f.close()
+
+def chunk_id(document_id: uuid.UUID, content_hash: str, occurrence: int) -> str:
+    """Deterministic chunk UUID for the n-th chunk with this content in a document."""
+    return str(uuid.uuid5(document_id, f"{content_hash}:{occurrence}"))
+
+async def process_document(job: IngestionJob, db: AsyncSession):
+    """
+    Runs one ingestion job as a streaming pipeline: pages (or text blocks) are extracted
+    a few at a time and fed through the streaming chunker, and chunks are embedded and
+    bulk written in fixed-size batches as they come out. The store write of one batch
+    overlaps with embedding the next. Memory stays bounded by the batch size, not the
+    document size. Progress is committed after every batch.
+
+    Ingestion is an upsert: chunks are identified by a content hash, so on a re-upload of
+    the same source only new or changed chunks are embedded and written, unchanged ones
+    are kept (re-numbered if they moved), and chunks no longer present are deleted.
+    """
+    doc_id = job.document_id
+    store = get_vector_store()
+    timings = {}
+
+    async def progress(**fields):
+        for name, value in fields.items():
+            setattr(job, name, value)
+        job.stage_seconds = {k: round(v, 3) for k, v in timings.items()}
+        await db.commit()
+
+    # 1. Save metadata to Postgres, in one statement (the document may exist from an earlier upload)
+    uploaded_at = datetime.utcnow()
+    tags = split_tags(job.tags)
+    values = {"title": job.title, "source": job.source, "tags": job.tags, "uploaded_at": uploaded_at}
+    await db.execute(
+        pg_insert(DocumentMetadata)
+        .values(id=doc_id, **values)
+        .on_conflict_do_update(index_elements=[DocumentMetadata.id], set_=values)
+    )
+    # Copied onto every new chunk so search filters run inside the vector store.
+    # uploaded_at on a chunk is when its content was first uploaded.
+    document_props = {"tags": tags, "source": job.source, "uploaded_at": uploaded_at.replace(tzinfo=timezone.utc)}
+    # Chunks already stored for this document (earlier upload, or a job interrupted midway)
+    existing = await store.run(lambda s: s.fetch_chunk_state(str(doc_id)))
+    seen: set[str] = set()
+    updates: dict[str, dict] = {}
+    occurrences: dict[str, int] = {}
+    await progress(stage="parse")
+    # Title/source may have changed; committed above, so the next search reloads them
+    metadata_cache.invalidate(doc_id)
+
+    # 2. Embed and bulk store new chunks, one batch in flight to the vector store at a time
+    async def write(batch):
+        started = time.perf_counter()
+        errors = await store.run(lambda s: s.insert_chunks(batch))
+        timings["write"] = timings.get("write", 0.0) + time.perf_counter() - started
+        return batch, errors
+
+    async def finish_write(task):
+        batch, errors = await task
+        if errors:
+            logger.error("ingest_chunks_failed", document_id=str(doc_id), failed=len(errors), errors=errors[:5])
+        await progress(
+            chunks_written=job.chunks_written + len(batch) - len(errors),
+            chunks_failed=job.chunks_failed + len(errors)
+        )
+
+    pending_write = None
+
+    async def process_batch(texts: list[str]):
+        nonlocal pending_write
+        new_chunks = []
+        for text in texts:
+            # chunks_total grows while the document is still being parsed
+            index = job.chunks_total
+            job.chunks_total += 1
+            content_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+            occurrence = occurrences.get(content_hash, 0)
+            occurrences[content_hash] = occurrence + 1
+            cid = chunk_id(doc_id, content_hash, occurrence)
+            seen.add(cid)
+            if cid in existing:
+                job.chunks_unchanged += 1
+                stored = existing[cid]
+                if (stored.get("chunk_index"), stored.get("tags") or [], stored.get("source")) != (index, tags, job.source):
+                    updates[cid] = {"chunk_index": index, "tags": tags, "source": job.source}
+            else:
+                new_chunks.append({
+                    "uuid": cid, "text": text, "content_hash": content_hash,
+                    "document_id": str(doc_id), "chunk_index": index, **document_props
+                })
+        if not new_chunks:
+            return
+
+        job.stage = "embed_write"
+        started = time.perf_counter()
+        vectors = await _run_cpu(embed_batch, [c["text"] for c in new_chunks])
+        timings["embed"] = timings.get("embed", 0.0) + time.perf_counter() - started
+        job.chunks_embedded += len(new_chunks)
+        for chunk, vector in zip(new_chunks, vectors):
+            chunk["vector"] = vector
+
+        if pending_write is not None:
+            await finish_write(pending_write)
+        pending_write = asyncio.create_task(write(new_chunks))
+
+    # 3. Parse -> chunk -> embed/write, incrementally
+    # Token counting is CPU work on large pieces (and loads the tokenizer once): keep it off the loop
+    chunker = await asyncio.to_thread(make_chunker)
+    batch_size = settings.INGEST_EMBED_BATCH_SIZE
+    ready: list[str] = []
+    try:
+        async for piece in _iter_pieces(job, timings):
+            started = time.perf_counter()
+            ready.extend(await asyncio.to_thread(chunker.feed, piece))
+            timings["chunk"] = timings.get("chunk", 0.0) + time.perf_counter() - started
+            while len(ready) >= batch_size:
+                await process_batch(ready[:batch_size])
+                del ready[:batch_size]
+        ready.extend(await asyncio.to_thread(chunker.flush))
+        for offset in range(0, len(ready), batch_size):
+            await process_batch(ready[offset:offset + batch_size])
+        if pending_write is not None:
+            await finish_write(pending_write)
+    except BaseException:
+        if pending_write is not None and not pending_write.done():
+            pending_write.cancel()
+        raise
+
+    # 4. Reconcile with what was stored before: drop stale chunks, re-number moved ones
+    #    and refresh tags/source on kept ones if they changed
+    job.stage = "reconcile"
+    stale = [cid for cid in existing if cid not in seen]
+    if stale:
+        await store.run(lambda s: s.delete_chunks(stale))
+    if updates:
+        await store.run(lambda s: s.update_chunks(updates))
+    job.chunks_removed = len(stale)
+    logger.info(
+        "document_upserted", document_id=str(doc_id), total_chunks=job.chunks_total,
+        added=job.chunks_written, unchanged=job.chunks_unchanged, removed=job.chunks_removed
+    )
+
+    # 5. Cached answers built from this document (or an earlier upload of it) are now stale.
+    #    Other worker processes see content_updated_at when one of their cached answers is hit.
+    if job.chunks_written or job.chunks_removed:
+        answer_cache.invalidate(document_id=doc_id, source=job.source)
+        await db.execute(
+            update(DocumentMetadata).where(DocumentMetadata.id == doc_id).values(content_updated_at=datetime.utcnow())
+        )
+    # Committed by the caller together with the job's final status
+    job.stage = "done"
+    job.stage_seconds = {k: round(v, 3) for k, v in timings.items()}
+    for stage, seconds in timings.items():
+        metrics.observe("rag_ingest_stage_seconds", seconds, stage=stage)
+
+class IngestionQueue:
+    """
+    Ingestion job queue backed by the ingestion_jobs table.
+    Endpoints spool the upload and enqueue a job; a fixed number of workers process jobs
+    in order. Every server process runs a queue on the same table, so a job is claimed
+    with a conditional UPDATE before it runs and only the process that claimed it runs it.
+    Running jobs keep a heartbeat; queued jobs and running jobs whose heartbeat went stale
+    (their process died) are picked up on start and periodically after that.
+    """
+    def __init__(self, workers: int = None, max_pending: int = None, spool_dir: str = None):
+        self.workers = workers or settings.INGEST_WORKERS
+        self.max_pending = max_pending or settings.INGEST_MAX_PENDING
+        self.spool_dir = spool_dir or settings.INGEST_SPOOL_DIR
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._queue: asyncio.Queue = asyncio.Queue()
+        # Job ids in _queue, so recovery does not queue a job twice
+        self._queued: set[uuid.UUID] = set()
+        self._tasks: list[asyncio.Task] = []
+        # Jobs for the same document in this process wait here: document_id -> (lock, jobs holding or waiting)
+        self._document_locks: dict[uuid.UUID, list] = {}
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+
+    def _claimable(self):
+        # Queued, or running in a process that stopped sending heartbeats (NULL: claimed before heartbeats existed)
+        stale = datetime.utcnow() - timedelta(seconds=settings.INGEST_STALE_SECONDS)
+        return or_(
+            IngestionJob.status == "queued",
+            and_(
+                IngestionJob.status == "running",
+                or_(IngestionJob.heartbeat_at.is_(None), IngestionJob.heartbeat_at < stale),
+            ),
+        )
+
+    def _enqueue(self, job_id: uuid.UUID):
+        self._queued.add(job_id)
+        self._queue.put_nowait(job_id)
+
+    async def _recover(self) -> int:
+        # Other processes may hold some of these jobs in their queues; the claim in _run decides who runs them
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(IngestionJob.id).where(self._claimable()).order_by(IngestionJob.created_at)
+            )
+            job_ids = [job_id for job_id in result.scalars().all() if job_id not in self._queued]
+        for job_id in job_ids:
+            self._enqueue(job_id)
+        return len(job_ids)
+
+    async def _recover_loop(self):
+        while True:
+            await asyncio.sleep(settings.INGEST_STALE_SECONDS)
+            try:
+                count = await self._recover()
+            except Exception as e:
+                logger.error("ingest_recover_failed", error=str(e))
+                continue
+            if count:
+                logger.info("ingest_jobs_recovered", count=count)
+
+    async def start(self):
+        os.makedirs(self.spool_dir, exist_ok=True)
+        count = await self._recover()
+        if count:
+            logger.info("ingest_jobs_recovered", count=count)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._recover_loop()))
+        logger.info("ingest_queue_started", workers=self.workers, worker_id=self.worker_id)
+
+    async def stop(self):
+        # Interrupted jobs stay "running" in Postgres; their heartbeat goes stale and another start() resumes them
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        logger.info("ingest_queue_stopped")
+
+    def check_capacity(self, count: int = 1):
+        if self._queue.qsize() + count > self.max_pending:
+            raise IngestQueueFull(f"Ingestion queue full ({self._queue.qsize()} jobs pending)")
+
+    def spool_path(self, job_id: uuid.UUID) -> str:
+        return os.path.join(self.spool_dir, str(job_id))
+
+    async def submit(self, job: IngestionJob, db: AsyncSession) -> IngestionJob:
+        """Persist a job whose payload is already at spool_path(job.id) and queue it."""
+        db.add(job)
+        await db.commit()
+        self._enqueue(job.id)
+        logger.info("ingest_job_queued", job_id=str(job.id), document_id=str(job.document_id), pending=self._queue.qsize())
+        return job
+
+    async def submit_many(self, jobs: list[dict], db: AsyncSession) -> list[uuid.UUID]:
+        """
+        Persist several jobs (IngestionJob column values, payloads already spooled) with one
+        INSERT ... RETURNING and queue them in order.
+        """
+        result = await db.execute(insert(IngestionJob).returning(IngestionJob.id, sort_by_parameter_order=True), jobs)
+        job_ids = result.scalars().all()
+        await db.commit()
+        for job_id in job_ids:
+            self._enqueue(job_id)
+        logger.info("ingest_jobs_queued", count=len(job_ids), pending=self._queue.qsize())
+        return job_ids
+
+    async def _worker(self):
+        while True:
+            job_id = await self._queue.get()
+            self._queued.discard(job_id)
+            try:
+                await self._run(job_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("ingest_worker_error", job_id=str(job_id), error=str(e))
+            finally:
+                self._queue.task_done()
+
+    @asynccontextmanager
+    async def _document_lock(self, document_id: uuid.UUID):
+        """
+        Jobs for the same document run one at a time, in this process and across worker
+        processes: each job works from its own snapshot of the document's stored chunks.
+        The Postgres advisory lock is held by a transaction on its own connection until
+        the job ends (and is released with the connection if the process dies).
+        """
+        entry = self._document_locks.setdefault(document_id, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0], engine.begin() as conn:
+                await conn.execute(
+                    text("SELECT pg_advisory_xact_lock(:namespace, hashtext(:document_id))"),
+                    {"namespace": _DOCUMENT_LOCK_NAMESPACE, "document_id": str(document_id)}
+                )
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._document_locks[document_id]
+
+    async def _claim(self, job_id: uuid.UUID) -> bool:
+        now = datetime.utcnow()
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                update(IngestionJob)
+                .where(IngestionJob.id == job_id, self._claimable())
+                .values(status="running", claimed_by=self.worker_id, heartbeat_at=now, started_at=now)
+                .returning(IngestionJob.id)
+            )
+            claimed = result.scalar_one_or_none() is not None
+            await db.commit()
+        return claimed
+
+    async def _heartbeat(self, job_id: uuid.UUID):
+        while True:
+            await asyncio.sleep(settings.INGEST_HEARTBEAT_SECONDS)
+            try:
+                async with AsyncSessionLocal() as db:
+                    result = await db.execute(
+                        update(IngestionJob)
+                        .where(IngestionJob.id == job_id, IngestionJob.claimed_by == self.worker_id)
+                        .values(heartbeat_at=datetime.utcnow())
+                    )
+                    await db.commit()
+            except Exception as e:
+                logger.warning("ingest_heartbeat_failed", job_id=str(job_id), error=str(e))
+                continue
+            if result.rowcount == 0:
+                logger.error("ingest_job_claim_lost", job_id=str(job_id), worker_id=self.worker_id)
+                return
+
+    async def _run(self, job_id: uuid.UUID):
+        # Another process may have claimed (or finished) the job since it was queued here
+        if not await self._claim(job_id):
+            return
+        heartbeat = asyncio.create_task(self._heartbeat(job_id))
+        try:
+            async with AsyncSessionLocal() as db:
+                job = await db.get(IngestionJob, job_id)
+                payload_path = job.payload_path
+                async with self._document_lock(job.document_id):
+                    await self._process(job, db)
+        finally:
+            heartbeat.cancel()
+
+        try:
+            os.remove(payload_path)
+        except FileNotFoundError:
+            pass
+
+    async def _process(self, job: IngestionJob, db: AsyncSession):
+        # The job was claimed by this process; a previous attempt's progress starts over
+        job_id = job.id
+        job.chunks_total = job.chunks_embedded = job.chunks_written = job.chunks_failed = 0
+        job.chunks_unchanged = job.chunks_removed = 0
+        job.error = None
+        await db.commit()
+
+        self.running += 1
+        try:
+            await process_document(job, db)
+            status, error = "completed", None
+            self.completed += 1
+        except Exception as e:
+            logger.error("ingest_job_failed", job_id=str(job_id), stage=job.stage, error=str(e))
+            await db.rollback()
+            status, error = "failed", str(e)
+            self.failed += 1
+        finally:
+            self.running -= 1
+
+        # One UPDATE with the final stage and counters (rolled back on failure) and the status
+        job.status, job.error, job.finished_at = status, error, datetime.utcnow()
+        await db.commit()
+        logger.info("ingest_job_finished", job_id=str(job_id), status=status)
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "worker_id": self.worker_id,
+            "pending": self._queue.qsize(),
+            "running": self.running,
+            "completed": self.completed,
+            "failed": self.failed,
+        }
+
+# Singleton instance, started and stopped by the application lifespan
+ingestion_queue = IngestionQueue()
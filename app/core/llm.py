@@ -1,46 +1,125 @@
-from groq import AsyncGroq
 from app.core.config import get_settings
 from app.core.logging import logger
+from app.core.metrics import metrics
+from app.core.llm_gateway import LLMGateway, LLMUnavailable, RateLimitBackoff
 
 settings = get_settings()
 
 class LLMClient:
-    def __init__(self):
+    def __init__(self, gateway: LLMGateway = None, base_url: str = None):
+        # Retries, timeouts, quotas and model choice are the gateway's
+        self.gateway = gateway or LLMGateway()
+        self.model = self.gateway.model
+        # GROQ_BASE_URL points the client at a local stand-in if set
+        self.base_url = base_url or settings.GROQ_BASE_URL or None
+        self._client = None
         if not settings.GROQ_API_KEY:
             logger.warning("groq_api_key_missing", message="LLM features will fail if key not provided")
-            self.client = None
-        else:
-            # Initialize AsyncGroq client
-            self.client = AsyncGroq(api_key=settings.GROQ_API_KEY)
-            self.model = "mixtral-8x7b-32768"
 
-    async def generate(self, system_content: str, user_content: str) -> str:
+    @property
+    def client(self):
+        # Created on first use: importing groq (and httpx) is a large share of app startup
+        if self._client is None and settings.GROQ_API_KEY:
+            from groq import AsyncGroq
+            self._client = AsyncGroq(api_key=settings.GROQ_API_KEY, base_url=self.base_url, max_retries=0)
+        return self._client
+
+    @staticmethod
+    def _messages(system_content: str, user_content: str) -> list[dict]:
+        return [
+            {"role": "system", "content": system_content},
+            {"role": "user", "content": user_content}
+        ]
+
+    @staticmethod
+    def _estimate_tokens(system_content: str, user_content: str) -> int:
+        # ~4 characters per token; settled against the reported usage afterwards
+        return (len(system_content) + len(user_content)) // 4
+
+    def _record_usage(self, usage, estimated: int):
+        metrics.inc("rag_llm_tokens_total", usage.prompt_tokens, type="prompt")
+        metrics.inc("rag_llm_tokens_total", usage.completion_tokens, type="completion")
+        self.gateway.settle(estimated, usage.prompt_tokens + usage.completion_tokens)
+
+    async def generate(self, system_content: str, user_content: str, backoff: RateLimitBackoff = None) -> str:
         """
         Generates a response using the Groq API asynchronously.
         Takes structured system and user prompts.
+        Rate limits, server errors and timeouts are retried by the gateway (with `backoff`
+        as the retry policy of a group of calls, if given); when it gives up,
+        LLMUnavailable is raised instead of answering "I don't know".
         """
         if not self.client:
             logger.error("llm_client_not_initialized")
             return "I don't know"
 
-        try:
-            messages = [
-                {"role": "system", "content": system_content},
-                {"role": "user", "content": user_content}
-            ]
-            
+        estimated = self._estimate_tokens(system_content, user_content)
+
+        async def call(model: str, timeout: float) -> str:
             # Async call to Groq
-            completion = await self.client.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                temperature=0.0, # Deterministic outcomes
-                max_tokens=1024
-            )
+            with metrics.span("llm_generate"):
+                completion = await self.client.with_options(timeout=timeout).chat.completions.create(
+                    model=model,
+                    messages=self._messages(system_content, user_content),
+                    temperature=0.0, # Deterministic outcomes
+                    max_tokens=1024
+                )
+            if completion.usage is not None:
+                self._record_usage(completion.usage, estimated)
             return completion.choices[0].message.content
 
+        try:
+            return await self.gateway.run(call, tokens=estimated, backoff=backoff)
+        except LLMUnavailable:
+            raise
         except Exception as e:
             logger.error("llm_generation_failed", error=str(e))
+            metrics.inc("rag_llm_requests_total", outcome="error")
             return "I don't know"
 
+    async def stream(self, system_content: str, user_content: str):
+        """
+        Streams the completion as an async generator of text deltas.
+        Unlike generate(), errors are raised so the caller can report them mid-stream.
+        Opening the stream goes through the gateway (retries, quotas, circuit breakers; no
+        hedging), and the stream holds a gateway slot until it ends.
+        Closing the generator (e.g. on client disconnect) closes the upstream connection.
+        """
+        if not self.client:
+            logger.error("llm_client_not_initialized")
+            yield "I don't know"
+            return
+
+        estimated = self._estimate_tokens(system_content, user_content)
+
+        async def call(model: str, timeout: float):
+            return await self.client.with_options(timeout=timeout).chat.completions.create(
+                model=model,
+                messages=self._messages(system_content, user_content),
+                temperature=0.0,
+                max_tokens=1024,
+                stream=True
+            )
+
+        async with self.gateway.slot():
+            try:
+                stream = await self.gateway.run(call, tokens=estimated, hedge=False, limit=False)
+            except Exception as e:
+                logger.error("llm_stream_failed", error=str(e))
+                raise
+
+            metrics.inc("rag_llm_requests_total", outcome="stream")
+            try:
+                async for chunk in stream:
+                    delta = chunk.choices[0].delta.content if chunk.choices else None
+                    if delta:
+                        yield delta
+                    # Groq reports usage on the last chunk
+                    usage = getattr(getattr(chunk, "x_groq", None), "usage", None)
+                    if usage is not None:
+                        self._record_usage(usage, estimated)
+            finally:
+                await stream.close()
+
 # Singleton instance
 llm_client = LLMClient()
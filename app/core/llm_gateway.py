@@ -0,0 +1,433 @@
+import asyncio
+import random
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from typing import Awaitable, Callable, Optional, TypeVar
+from app.core.config import get_settings
+from app.core.logging import logger
+from app.core.metrics import metrics
+
+settings = get_settings()
+
+T = TypeVar("T")
+
+@lru_cache()
+def _errors() -> tuple[type, tuple, tuple]:
+    """
+    (rate limited, transient, timed out) exception classes. groq (with httpx) is only
+    imported on the first LLM call, not when the app is imported.
+    """
+    import groq
+    # Worth retrying: the same request may succeed later or on another model (APITimeoutError is an APIConnectionError)
+    transient = (groq.InternalServerError, groq.APIConnectionError, asyncio.TimeoutError)
+    return groq.RateLimitError, transient, (asyncio.TimeoutError, groq.APITimeoutError)
+
+class LLMUnavailable(Exception):
+    """
+    No answer is possible before the deadline (quota exhausted, circuits open, upstream
+    failing); surfaced to clients as HTTP 503 with Retry-After instead of a wrong answer.
+    """
+    def __init__(self, message: str, retry_after: float = 1.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class RateLimitBackoff:
+    """
+    Retry policy shared by a group of concurrent LLM calls (e.g. one batch request).
+    A 429 on any call pauses all of them until the server's Retry-After (or an
+    exponential backoff with jitter) has passed, instead of every call hammering the
+    rate limit on its own.
+    """
+    def __init__(self, max_retries: int = None, base_delay: float = None):
+        self.max_retries = settings.QA_BATCH_MAX_RETRIES if max_retries is None else max_retries
+        self.base_delay = settings.QA_BATCH_RETRY_BASE_DELAY if base_delay is None else base_delay
+        self.rate_limited = 0
+        self.retries = 0
+        self._resume_at = 0.0
+
+    def delay(self, attempt: int, error: Exception) -> float:
+        response = getattr(error, "response", None)
+        try:
+            # Never before Retry-After, but spread out so paused calls don't all resume at once
+            return float(response.headers["retry-after"]) * random.uniform(1.0, 1.2)
+        except (AttributeError, KeyError, TypeError, ValueError):
+            return self.base_delay * 2 ** attempt * random.uniform(0.5, 1.5)
+
+    async def wait(self, deadline: float = None):
+        loop = asyncio.get_running_loop()
+        while (remaining := self._resume_at - loop.time()) > 0:
+            if deadline is not None and time.monotonic() + remaining > deadline:
+                raise LLMUnavailable("LLM rate limited past the deadline", retry_after=remaining)
+            await asyncio.sleep(remaining)
+
+    def pause(self, seconds: float):
+        self._resume_at = max(self._resume_at, asyncio.get_running_loop().time() + seconds)
+
+class TokenBucket:
+    """
+    Client-side quota of `per_minute` units (requests or tokens), refilled continuously
+    up to `burst`. Waiters are served in arrival order. A request larger than the bucket
+    waits for a full bucket and leaves it in debt, so it still goes through at the
+    quota's pace.
+    """
+    def __init__(self, per_minute: float, burst: float = None):
+        self.rate = per_minute / 60
+        self.capacity = burst or per_minute
+        self.level = self.capacity
+        self.waited = 0.0  # total seconds callers spent waiting for the bucket
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, amount: float = 1) -> bool:
+        self._refill()
+        if self._lock.locked() or self.level < min(amount, self.capacity):
+            return False
+        self.level -= amount
+        return True
+
+    async def acquire(self, amount: float = 1, deadline: float = None):
+        async with self._lock:
+            while True:
+                self._refill()
+                needed = min(amount, self.capacity)
+                if self.level >= needed:
+                    self.level -= amount
+                    return
+                wait = (needed - self.level) / self.rate
+                if deadline is not None and time.monotonic() + wait > deadline:
+                    raise LLMUnavailable("LLM quota exhausted until past the deadline", retry_after=wait)
+                self.waited += wait
+                await asyncio.sleep(wait)
+
+    def consume(self, amount: float):
+        """Settle usage known only afterwards (a negative amount gives units back)."""
+        self._refill()
+        self.level = min(self.capacity, self.level - amount)
+
+class CircuitBreaker:
+    """
+    Per-model breaker. After `failures` consecutive transient failures (5xx, connection
+    errors, timeouts; 429s say nothing about the model's health) the circuit opens and
+    calls fail fast for `reset_seconds`. Then one trial call is let through (half-open),
+    and its outcome closes or re-opens the circuit.
+    """
+    def __init__(self, name: str, failures: int = None, reset_seconds: float = None):
+        self.name = name
+        self.threshold = failures or settings.LLM_BREAKER_FAILURES
+        self.reset_seconds = settings.LLM_BREAKER_RESET_SECONDS if reset_seconds is None else reset_seconds
+        self.failures = 0
+        self.opened = 0
+        self._opened_at = None
+        self._trial = False
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at < self.reset_seconds:
+            return "open"
+        return "half_open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self._trial:
+            self._trial = True
+            return True
+        return False
+
+    def retry_after(self) -> float:
+        if self._opened_at is None:
+            return 0.0
+        return max(0.0, self.reset_seconds - (time.monotonic() - self._opened_at))
+
+    def record_success(self):
+        if self._opened_at is not None:
+            logger.info("llm_circuit_closed", model=self.name)
+        self.failures = 0
+        self._opened_at = None
+        self._trial = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self._trial or self.failures >= self.threshold:
+            if self._opened_at is None:
+                self.opened += 1
+                logger.warning("llm_circuit_open", model=self.name, failures=self.failures)
+            self._opened_at = time.monotonic()
+            self._trial = False
+
+    def release(self):
+        """The call ended without saying anything about the model (429, cancelled)."""
+        self._trial = False
+
+class LatencyWindow:
+    """Latencies of the last `size` successful calls to one model."""
+    def __init__(self, size: int = 200):
+        self.samples = deque(maxlen=size)
+
+    def add(self, seconds: float):
+        self.samples.append(seconds)
+
+    def percentile(self, pct: float, min_samples: int = 1) -> Optional[float]:
+        if len(self.samples) < max(1, min_samples):
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))]
+
+class LLMGateway:
+    """
+    Policies around every LLM API call:
+    - a deadline per answer (LLM_TIMEOUT_SECONDS) covering retries and quota waits,
+    - at most LLM_MAX_CONCURRENCY calls in flight,
+    - token buckets sized to the account's requests and tokens per minute, so bursts
+      queue here instead of drawing 429s,
+    - retries with jittered exponential backoff; a 429 pauses every call for its Retry-After,
+    - a circuit breaker per model; while the primary's is open, calls go to LLM_FALLBACK_MODEL,
+    - optional hedging: if the primary hasn't answered within its LLM_HEDGE_PERCENTILE
+      latency, the request is also sent to the fallback model and the first answer wins.
+    When no answer is possible before the deadline, LLMUnavailable is raised.
+    """
+    def __init__(self, model: str = None, fallback_model: str = None, timeout: float = None,
+                 max_concurrency: int = None, rpm: int = None, tpm: int = None, burst_seconds: float = None,
+                 max_retries: int = None, hedge: bool = None, hedge_percentile: float = None):
+        self.model = model or settings.LLM_MODEL
+        self.fallback_model = settings.LLM_FALLBACK_MODEL if fallback_model is None else fallback_model
+        self.timeout = timeout or settings.LLM_TIMEOUT_SECONDS
+        self.max_concurrency = max_concurrency or settings.LLM_MAX_CONCURRENCY
+        self._slots = asyncio.Semaphore(self.max_concurrency)
+        self.in_flight = 0
+        rpm = settings.LLM_RATE_LIMIT_RPM if rpm is None else rpm
+        tpm = settings.LLM_RATE_LIMIT_TPM if tpm is None else tpm
+        burst = (burst_seconds or settings.LLM_RATE_LIMIT_BURST_SECONDS) / 60
+        self.requests = TokenBucket(rpm, max(1, rpm * burst)) if rpm > 0 else None
+        self.tokens = TokenBucket(tpm, tpm * burst) if tpm > 0 else None
+        self.backoff = RateLimitBackoff(
+            max_retries=settings.LLM_MAX_RETRIES if max_retries is None else max_retries,
+            base_delay=settings.LLM_RETRY_BASE_DELAY
+        )
+        self.hedge = (settings.LLM_HEDGE_ENABLED if hedge is None else hedge) and bool(self.fallback_model)
+        self.hedge_percentile = hedge_percentile or settings.LLM_HEDGE_PERCENTILE
+        self.hedge_min_samples = settings.LLM_HEDGE_MIN_SAMPLES
+        models = [self.model] + ([self.fallback_model] if self.fallback_model else [])
+        self.breakers = {m: CircuitBreaker(m) for m in models}
+        self.latency = {m: LatencyWindow() for m in models}
+        self.counts = {
+            "calls": 0, "ok": 0, "retries": 0, "rate_limited": 0, "errors": 0, "timeouts": 0,
+            "fallback": 0, "hedged": 0, "hedge_won": 0, "unavailable": 0,
+        }
+
+    async def run(self, call: Callable[[str, float], Awaitable[T]], tokens: int = 0,
+                  backoff: RateLimitBackoff = None, hedge: bool = True, limit: bool = True) -> T:
+        """
+        Returns call(model, timeout) under the policies above. `tokens` is the estimated
+        cost charged to the tokens-per-minute bucket. `backoff` replaces the retry budget
+        and collects retry counts for a group of calls (429 pauses apply to all calls
+        either way). `limit=False` when the caller already holds a slot().
+        Errors other than rate limits and transient failures are raised as they are.
+        """
+        deadline = time.monotonic() + self.timeout
+        policy = backoff or self.backoff
+        rate_limit_error, transient_errors, timeout_errors = _errors()
+        self.counts["calls"] += 1
+        attempt = 0
+        try:
+            while True:
+                await self.backoff.wait(deadline)
+                if self.requests is not None:
+                    await self.requests.acquire(1, deadline)
+                if self.tokens is not None and tokens:
+                    await self.tokens.acquire(tokens, deadline)
+                model = self._choose_model()
+                try:
+                    result = await self._attempt(call, model, deadline, hedge, limit, tokens)
+                    self.counts["ok"] += 1
+                    metrics.inc("rag_llm_requests_total", outcome="ok")
+                    return result
+                except rate_limit_error as e:
+                    delay = policy.delay(attempt, e)
+                    self.backoff.pause(delay)
+                    if policy is not self.backoff:
+                        policy.pause(delay)
+                    policy.rate_limited += 1
+                    self.counts["rate_limited"] += 1
+                    metrics.inc("rag_llm_requests_total", outcome="rate_limited")
+                except transient_errors as e:
+                    delay = policy.delay(attempt, e)
+                    timed_out = isinstance(e, timeout_errors)
+                    self.counts["timeouts" if timed_out else "errors"] += 1
+                    metrics.inc("rag_llm_requests_total", outcome="timeout" if timed_out else "error")
+                    logger.warning("llm_call_failed", model=model, attempt=attempt + 1, error=str(e) or type(e).__name__)
+                if attempt >= policy.max_retries:
+                    raise LLMUnavailable(f"LLM failed after {attempt + 1} attempts", retry_after=delay)
+                if time.monotonic() + delay >= deadline:
+                    raise LLMUnavailable("LLM retry would pass the deadline", retry_after=delay)
+                attempt += 1
+                policy.retries += 1
+                self.counts["retries"] += 1
+                metrics.inc("rag_llm_requests_total", outcome="retry")
+                await asyncio.sleep(delay)
+        except LLMUnavailable as e:
+            self.counts["unavailable"] += 1
+            metrics.inc("rag_llm_requests_total", outcome="unavailable")
+            logger.error("llm_unavailable", reason=str(e), attempts=attempt + 1)
+            raise
+
+    @asynccontextmanager
+    async def slot(self):
+        """Holds one of the LLM_MAX_CONCURRENCY call slots, e.g. for the length of a stream."""
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.timeout)
+        except asyncio.TimeoutError:
+            raise LLMUnavailable("No LLM call slot before the deadline")
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._slots.release()
+
+    def settle(self, estimated: int, actual: int):
+        """Charge the tokens-per-minute bucket with the difference once usage is known."""
+        if self.tokens is not None:
+            self.tokens.consume(actual - estimated)
+
+    def _choose_model(self) -> str:
+        if self.breakers[self.model].allow():
+            return self.model
+        if self.fallback_model and self.breakers[self.fallback_model].allow():
+            self.counts["fallback"] += 1
+            metrics.inc("rag_llm_requests_total", outcome="fallback")
+            return self.fallback_model
+        raise LLMUnavailable("LLM circuit open", retry_after=self.breakers[self.model].retry_after())
+
+    async def _acquire_slot(self, deadline: float):
+        try:
+            await asyncio.wait_for(self._slots.acquire(), max(deadline - time.monotonic(), 0))
+        except asyncio.TimeoutError:
+            raise LLMUnavailable("No LLM call slot before the deadline")
+        self.in_flight += 1
+
+    def _release_slot(self):
+        self.in_flight -= 1
+        self._slots.release()
+
+    async def _call(self, call: Callable[[str, float], Awaitable[T]], model: str, deadline: float) -> T:
+        breaker = self.breakers[model]
+        transient_errors = _errors()[1]
+        started = time.monotonic()
+        try:
+            if deadline <= started:
+                raise LLMUnavailable("LLM deadline passed before the call")
+            result = await asyncio.wait_for(call(model, deadline - started), deadline - started)
+        except transient_errors:
+            breaker.record_failure()
+            raise
+        except BaseException:
+            breaker.release()
+            raise
+        breaker.record_success()
+        self.latency[model].add(time.monotonic() - started)
+        return result
+
+    def _hedge_delay(self, model: str, deadline: float) -> Optional[float]:
+        if not self.hedge or model != self.model:
+            return None
+        delay = self.latency[model].percentile(self.hedge_percentile, self.hedge_min_samples)
+        if delay is None or time.monotonic() + delay >= deadline:
+            return None
+        return delay
+
+    async def _attempt(self, call: Callable[[str, float], Awaitable[T]], model: str, deadline: float,
+                       hedge: bool, limit: bool, tokens: int) -> T:
+        if limit:
+            try:
+                await self._acquire_slot(deadline)
+            except LLMUnavailable:
+                self.breakers[model].release()
+                raise
+        try:
+            delay = self._hedge_delay(model, deadline) if hedge else None
+            if delay is None:
+                return await self._call(call, model, deadline)
+            return await self._hedged(call, model, deadline, delay, limit, tokens)
+        finally:
+            if limit:
+                self._release_slot()
+
+    async def _hedged(self, call: Callable[[str, float], Awaitable[T]], model: str, deadline: float,
+                      delay: float, limit: bool, tokens: int) -> T:
+        primary = asyncio.ensure_future(self._call(call, model, deadline))
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=delay)
+        except asyncio.CancelledError:
+            primary.cancel()
+            raise
+        # A hedge needs a free slot and request quota right away, or it isn't sent
+        if (done or (limit and self._slots.locked())
+                or (self.requests is not None and not self.requests.try_acquire())
+                or not self.breakers[self.fallback_model].allow()):
+            return await primary
+
+        if limit:
+            try:
+                await self._acquire_slot(deadline)
+            except LLMUnavailable:
+                # No slot for the hedge after all: the primary is the only call
+                return await primary
+            except BaseException:
+                primary.cancel()
+                raise
+        self.counts["hedged"] += 1
+        metrics.inc("rag_llm_requests_total", outcome="hedge")
+        if self.tokens is not None and tokens:
+            self.tokens.consume(tokens)
+        secondary = asyncio.ensure_future(self._call(call, self.fallback_model, deadline))
+        pending, error = {primary, secondary}, None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                winner = None
+                for task in done:
+                    if task.exception() is None:
+                        winner = winner or task
+                    elif error is None or task is primary:
+                        error = task.exception()
+                if winner is not None:
+                    if winner is secondary:
+                        self.counts["hedge_won"] += 1
+                        metrics.inc("rag_llm_requests_total", outcome="hedge_won")
+                    return winner.result()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+            if limit:
+                self._release_slot()
+
+    def stats(self) -> dict:
+        return {
+            **self.counts,
+            "model": self.model,
+            "fallback_model": self.fallback_model or None,
+            "in_flight": self.in_flight,
+            "circuits": {
+                m: {"state": b.state, "opened": b.opened, "consecutive_failures": b.failures}
+                for m, b in self.breakers.items()
+            },
+            "hedge_after_ms": {
+                m: round(p * 1000, 1) if (p := w.percentile(self.hedge_percentile, self.hedge_min_samples)) else None
+                for m, w in self.latency.items()
+            } if self.hedge else None,
+            "quota_wait_seconds": round(
+                (self.requests.waited if self.requests else 0.0) + (self.tokens.waited if self.tokens else 0.0), 2
+            ),
+        }
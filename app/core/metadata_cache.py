@@ -0,0 +1,97 @@
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import get_settings
+from app.core.logging import logger
+from app.db.models import DocumentMetadata
+
+settings = get_settings()
+
+@dataclass(frozen=True)
+class CachedDocument:
+    title: Optional[str]
+    source: Optional[str]
+
+class DocumentMetadataCache:
+    """
+    In-process LRU of document id -> title/source, the only metadata search results need.
+    Misses for a whole result set are fetched with one IN query. Ingestion invalidates a
+    document when it writes its metadata; the TTL bounds staleness in other processes
+    (uvicorn/gunicorn workers) that don't see that invalidation.
+    """
+    def __init__(self, max_entries: int = None, ttl: float = None, enabled: bool = None):
+        self.max_entries = max_entries or settings.METADATA_CACHE_MAX_ENTRIES
+        self.ttl = settings.METADATA_CACHE_TTL_SECONDS if ttl is None else ttl
+        self.enabled = settings.METADATA_CACHE_ENABLED if enabled is None else enabled
+        self._entries: OrderedDict[uuid.UUID, tuple[CachedDocument, float]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _put(self, document_id: uuid.UUID, title: str, source: str, now: float):
+        self._entries[document_id] = (CachedDocument(title, source), now)
+        self._entries.move_to_end(document_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def get_many(self, document_ids: set[uuid.UUID], db: AsyncSession) -> dict[uuid.UUID, CachedDocument]:
+        """Metadata for the given documents; unknown ids are missing from the result."""
+        found, missing = {}, set()
+        now = time.monotonic()
+        for document_id in document_ids:
+            entry = self._entries.get(document_id) if self.enabled else None
+            if entry is not None and now - entry[1] < self.ttl:
+                self._entries.move_to_end(document_id)
+                found[document_id] = entry[0]
+            else:
+                missing.add(document_id)
+        self.hits += len(found)
+        self.misses += len(missing)
+        if missing:
+            rows = await db.execute(
+                select(DocumentMetadata.id, DocumentMetadata.title, DocumentMetadata.source)
+                .where(DocumentMetadata.id.in_(missing))
+            )
+            for document_id, title, source in rows:
+                found[document_id] = CachedDocument(title, source)
+                if self.enabled:
+                    self._put(document_id, title, source, now)
+        return found
+
+    async def warm(self, db: AsyncSession) -> int:
+        """Load the most recently uploaded documents, up to max_entries."""
+        if not self.enabled:
+            return 0
+        rows = await db.execute(
+            select(DocumentMetadata.id, DocumentMetadata.title, DocumentMetadata.source)
+            .order_by(DocumentMetadata.uploaded_at.desc())
+            .limit(self.max_entries)
+        )
+        now = time.monotonic()
+        # Oldest first, so the most recent documents end up last in LRU order
+        for document_id, title, source in reversed(rows.all()):
+            self._put(document_id, title, source, now)
+        logger.info("metadata_cache_warmed", entries=len(self._entries))
+        return len(self._entries)
+
+    def invalidate(self, document_id: uuid.UUID):
+        if self._entries.pop(document_id, None) is not None:
+            self.invalidations += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "invalidations": self.invalidations,
+        }
+
+# Singleton instance
+metadata_cache = DocumentMetadataCache()
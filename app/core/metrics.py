@@ -0,0 +1,241 @@
+import bisect
+import threading
+import time
+from app.core.config import get_settings
+from app.core.logging import logger
+
+settings = get_settings()
+
+# Seconds; covers sub-millisecond cache hits up to slow LLM calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+class Histogram:
+    """Cumulative-bucket histogram (Prometheus semantics) with bucket-interpolated quantiles."""
+    def __init__(self, buckets: tuple = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        if not self.count:
+            return 0.0
+        rank, seen = q * self.count, 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                lower = self.buckets[i - 1] if i else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else lower
+                return lower + (upper - lower) * (rank - seen) / n
+            seen += n
+        return self.buckets[-1]
+
+class _NoopSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NOOP_SPAN = _NoopSpan()
+
+class _Span:
+    __slots__ = ("registry", "stage", "start", "otel")
+
+    def __init__(self, registry: "Metrics", stage: str):
+        self.registry = registry
+        self.stage = stage
+        self.otel = None
+
+    def __enter__(self):
+        if self.registry._tracer is not None:
+            self.otel = self.registry._tracer.start_as_current_span(self.stage)
+            self.otel.__enter__()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.registry._observe(("rag_stage_seconds", (("stage", self.stage),)), time.perf_counter() - self.start)
+        if exc_type is not None:
+            self.registry.inc("rag_stage_errors_total", stage=self.stage)
+        if self.otel is not None:
+            self.otel.__exit__(exc_type, exc, tb)
+        return False
+
+class Metrics:
+    """
+    In-process metrics: stage timing histograms, counters and token usage, rendered in
+    the Prometheus text format on /metrics. span(stage) times a block of code (sync or
+    async) and, with OTEL_ENABLED, also records it as an OpenTelemetry span.
+    When disabled, span() returns a shared no-op context manager and inc()/observe()
+    return immediately (see benchmarks.metrics_overhead).
+    In process worker mode, timings recorded inside worker processes stay there; the
+    caller-side spans (e.g. embed_query around the worker call) still cover them.
+    """
+    def __init__(self, enabled: bool = None, otel: bool = None):
+        self.enabled = settings.METRICS_ENABLED if enabled is None else enabled
+        self._lock = threading.Lock()
+        self._histograms: dict[tuple, Histogram] = {}
+        self._counters: dict[tuple, float] = {}
+        self._help: dict[str, tuple[str, str]] = {}
+        self._tracer = None
+        if self.enabled and (settings.OTEL_ENABLED if otel is None else otel):
+            self._tracer = _otel_tracer()
+
+    @staticmethod
+    def _key(name: str, labels: dict) -> tuple:
+        return (name, tuple(sorted(labels.items())) if len(labels) > 1 else tuple(labels.items()))
+
+    def describe(self, name: str, kind: str, help_text: str):
+        self._help[name] = (kind, help_text)
+
+    def observe(self, name: str, value: float, **labels):
+        if not self.enabled:
+            return
+        self._observe(self._key(name, labels), value)
+
+    def _observe(self, key: tuple, value: float):
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def inc(self, name: str, value: float = 1, **labels):
+        if not self.enabled:
+            return
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def span(self, stage: str):
+        """`with metrics.span("vector_search"):` -> rag_stage_seconds{stage="vector_search"}."""
+        if not self.enabled:
+            return _NOOP_SPAN
+        return _Span(self, stage)
+
+    def reset(self):
+        """Drop all recorded series (e.g. between benchmark phases)."""
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    def summary(self) -> dict:
+        """p50/p95/p99 in ms per histogram series, for /stats."""
+        with self._lock:
+            items = list(self._histograms.items())
+        out = {}
+        for (name, labels), h in sorted(items):
+            series = name + "".join(f"[{v}]" for _, v in labels)
+            out[series] = {
+                "count": h.count,
+                "p50_ms": round(h.quantile(0.5) * 1000, 3),
+                "p95_ms": round(h.quantile(0.95) * 1000, 3),
+                "p99_ms": round(h.quantile(0.99) * 1000, 3),
+            }
+        return out
+
+    def render(self, series: list[tuple[str, str, tuple, float]] = None) -> str:
+        """
+        Prometheus text exposition format (version 0.0.4). `series` are extra
+        (name, "counter" or "gauge", labels, value) samples, e.g. the /stats values.
+        """
+        with self._lock:
+            histograms = {k: (list(h.counts), h.sum, h.count, h.buckets) for k, h in self._histograms.items()}
+            counters = dict(self._counters)
+        lines, described = [], set()
+
+        def header(name: str, kind: str):
+            if name not in described:
+                described.add(name)
+                help_text = self._help.get(name, (kind, name))[1]
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), value in sorted(counters.items()):
+            header(name, "counter")
+            lines.append(f"{name}{_labels(labels)} {value}")
+        for (name, labels), (counts, total, count, buckets) in sorted(histograms.items()):
+            header(name, "histogram")
+            cumulative = 0
+            for bound, n in zip((*buckets, "+Inf"), counts):
+                cumulative += n
+                lines.append(f"{name}_bucket{_labels(labels, le=bound)} {cumulative}")
+            lines.append(f"{name}_sum{_labels(labels)} {total}")
+            lines.append(f"{name}_count{_labels(labels)} {count}")
+        for name, kind, labels, value in sorted(series or [], key=lambda s: (s[0], s[2])):
+            header(name, kind)
+            lines.append(f"{name}{_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+def _labels(labels: tuple, **extra) -> str:
+    pairs = [*labels, *extra.items()]
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+def _otel_tracer():
+    # Optional dependency: opentelemetry-sdk (+ opentelemetry-exporter-otlp for export)
+    try:
+        from opentelemetry import trace
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+    except ImportError as e:
+        logger.warning("otel_unavailable", error=str(e))
+        return None
+    provider = TracerProvider(resource=Resource.create({"service.name": settings.OTEL_SERVICE_NAME}))
+    exporter = OTLPSpanExporter(endpoint=settings.OTEL_EXPORTER_OTLP_ENDPOINT or None)
+    provider.add_span_processor(BatchSpanProcessor(exporter))
+    trace.set_tracer_provider(provider)
+    logger.info("otel_enabled", endpoint=settings.OTEL_EXPORTER_OTLP_ENDPOINT or "default")
+    return trace.get_tracer("rag")
+
+# Singleton instance
+metrics = Metrics()
+metrics.describe("rag_stage_seconds", "histogram", "Wall time per pipeline stage")
+metrics.describe("rag_stage_errors_total", "counter", "Pipeline stages that raised")
+metrics.describe("rag_http_request_seconds", "histogram", "End-to-end HTTP request latency by route")
+metrics.describe("rag_llm_tokens_total", "counter", "LLM token usage")
+metrics.describe("rag_llm_requests_total", "counter", "LLM calls by outcome")
+metrics.describe("rag_embedding_texts_total", "counter", "Texts embedded, by embedding cache outcome")
+metrics.describe("rag_prompt_tokens_total", "counter", "QA prompt context tokens sent, and saved by context packing")
+metrics.describe("rag_ingest_stage_seconds", "histogram", "Ingestion time per document and stage")
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording rag_http_request_seconds{method, route, status}, measured
+    until the response body is fully sent (so streamed answers count in full). Only
+    installed when metrics are enabled.
+    """
+    def __init__(self, app, registry: Metrics = None):
+        self.app = app
+        self.registry = registry or metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        start = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # The matched route template keeps label cardinality bounded
+            route = scope.get("route")
+            self.registry.observe(
+                "rag_http_request_seconds", time.perf_counter() - start,
+                method=scope["method"], route=getattr(route, "path", "unmatched"), status=str(status)
+            )
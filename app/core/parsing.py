@@ -0,0 +1,52 @@
+import threading
+from collections import OrderedDict
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import pypdf
+
+# Open readers by path, so consecutive page ranges of one upload share the parsed xref
+# and page tree instead of re-reading them. Bounded in case a job dies mid-document.
+_MAX_OPEN_READERS = 8
+_readers: OrderedDict = OrderedDict()
+_readers_lock = threading.Lock()
+
+def _close_reader(path: str):
+    with _readers_lock:
+        entry = _readers.pop(path, None)
+    if entry is not None:
+        entry[0].close()
+
+def _get_reader(path: str) -> "pypdf.PdfReader":
+    with _readers_lock:
+        entry = _readers.get(path)
+        if entry is not None:
+            _readers.move_to_end(path)
+            return entry[1]
+    # Imported on the first PDF, not at app startup
+    import pypdf
+    # Pass a file handle, not the path: given a path, pypdf reads the whole file into memory
+    f = open(path, "rb")
+    reader = pypdf.PdfReader(f)
+    with _readers_lock:
+        _readers[path] = (f, reader)
+        while len(_readers) > _MAX_OPEN_READERS:
+            _, (old_file, _) = _readers.popitem(last=False)
+            old_file.close()
+    return reader
+
+def extract_pdf_pages(path: str, start: int, stop: int) -> tuple[list[str], int]:
+    """
+    Extract the text of pages [start, stop) of a PDF, one newline-terminated string per page.
+    Also returns the total page count. The reader is kept open between calls and closed
+    after the last page.
+    """
+    pdf_reader = _get_reader(path)
+    pages = pdf_reader.pages
+    total = len(pages)
+    texts = [pages[i].extract_text() + "\n" for i in range(start, min(stop, total))]
+    # Drop objects parsed for these pages (content streams, fonts); they are re-read on demand
+    pdf_reader.resolved_objects.clear()
+    if stop >= total:
+        _close_reader(path)
+    return texts, total
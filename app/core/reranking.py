@@ -0,0 +1,119 @@
+import asyncio
+import time
+from app.core.config import get_settings
+from app.core.logging import logger
+from app.core.workers import worker_pool, WorkerPoolSaturated
+
+settings = get_settings()
+
+class CrossEncoderReranker:
+    """
+    Small CPU cross-encoder that scores (query, passage) pairs, loaded lazily.
+    With quantize=True the model's Linear layers are converted to dynamic int8, which is
+    typically 2-3x faster on CPU for a negligible ranking difference; if the platform has
+    no quantized kernels the fp32 model is used.
+    """
+    def __init__(self, model_name: str = None, quantize: bool = None, batch_size: int = None):
+        self.model_name = model_name or settings.RERANK_MODEL
+        self.quantize = settings.RERANK_QUANTIZE if quantize is None else quantize
+        self.batch_size = batch_size or settings.RERANK_BATCH_SIZE
+        self._model = None
+
+    @property
+    def model(self):
+        if self._model is None:
+            logger.info("loading_rerank_model", model=self.model_name, quantize=self.quantize)
+            from sentence_transformers import CrossEncoder
+            model = CrossEncoder(self.model_name, device="cpu")
+            if self.quantize:
+                try:
+                    import torch
+                    model.model = torch.quantization.quantize_dynamic(model.model, {torch.nn.Linear}, dtype=torch.qint8)
+                except Exception as e:
+                    logger.warning("rerank_quantize_failed", error=str(e))
+            self._model = model
+        return self._model
+
+    def score(self, query: str, passages: list[str], deadline: float = None) -> list[float] | None:
+        """
+        Cross-encoder scores for the passages. With a deadline (time.monotonic()), returns
+        None instead of scoring the next batch once it has passed: the caller has given up.
+        """
+        if not passages:
+            return []
+        scores = []
+        for start in range(0, len(passages), self.batch_size):
+            if deadline is not None and time.monotonic() >= deadline:
+                return None
+            batch = passages[start:start + self.batch_size]
+            scores += self.model.predict(
+                [(query, p) for p in batch], batch_size=self.batch_size, convert_to_numpy=True, show_progress_bar=False
+            ).tolist()
+        return [float(s) for s in scores]
+
+# Singleton instance (one per worker process in process mode)
+cross_encoder = CrossEncoderReranker()
+
+# Module-level entry point for the worker pool (picklable in process mode)
+def rerank_scores(query: str, passages: list[str], deadline: float = None) -> list[float] | None:
+    return cross_encoder.score(query, passages, deadline)
+
+class RerankStage:
+    """
+    Reranking step of the search pipeline, run on the worker pool.
+    Each call gets a latency budget; when it is exceeded (or the pool is saturated, or
+    scoring fails) the caller gets None and keeps the retrieval order, so reranking can
+    only make a query slower by at most the budget.
+    """
+    def __init__(self, budget_ms: float = None):
+        self.budget = (settings.RERANK_BUDGET_MS if budget_ms is None else budget_ms) / 1000
+        self.calls = 0
+        self.candidates = 0
+        self.degraded = {"timeout": 0, "saturated": 0, "error": 0}
+        self._seconds = 0.0
+        self._max_seconds = 0.0
+
+    async def scores(self, query: str, passages: list[str]) -> list[float] | None:
+        if not passages:
+            return []
+        started = time.perf_counter()
+        try:
+            # On timeout the worker stops at its next batch (the deadline; monotonic time is
+            # shared with worker processes) and keeps its pool slot until then
+            deadline = time.monotonic() + self.budget
+            scores = await asyncio.wait_for(worker_pool.run(rerank_scores, query, passages, deadline), timeout=self.budget)
+            if scores is None:
+                raise asyncio.TimeoutError()
+        except asyncio.TimeoutError:
+            self.degraded["timeout"] += 1
+            logger.warning("rerank_budget_exceeded", candidates=len(passages), budget_ms=self.budget * 1000)
+            return None
+        except WorkerPoolSaturated:
+            self.degraded["saturated"] += 1
+            return None
+        except Exception as e:
+            self.degraded["error"] += 1
+            logger.error("rerank_failed", candidates=len(passages), error=str(e))
+            return None
+        elapsed = time.perf_counter() - started
+        self.calls += 1
+        self.candidates += len(passages)
+        self._seconds += elapsed
+        self._max_seconds = max(self._max_seconds, elapsed)
+        return scores
+
+    def stats(self) -> dict:
+        return {
+            "enabled": settings.RERANK_ENABLED,
+            "model": settings.RERANK_MODEL,
+            "budget_ms": self.budget * 1000,
+            "calls": self.calls,
+            "candidates": self.candidates,
+            "avg_ms": round(self._seconds / self.calls * 1000, 3) if self.calls else 0.0,
+            "max_ms": round(self._max_seconds * 1000, 3),
+            "avg_ms_per_candidate": round(self._seconds / self.candidates * 1000, 3) if self.candidates else 0.0,
+            "degraded": dict(self.degraded),
+        }
+
+# Singleton instance
+rerank_stage = RerankStage()
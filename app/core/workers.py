@@ -0,0 +1,116 @@
+import asyncio
+import multiprocessing
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from app.core.config import get_settings
+from app.core.logging import logger
+
+settings = get_settings()
+
+class WorkerPoolSaturated(Exception):
+    """Raised when the worker pool queue is full; surfaced to clients as HTTP 429."""
+
+def _timed_call(fn, args, kwargs):
+    # Runs inside the worker, so the measured time excludes queueing
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+class WorkerPool:
+    """
+    Bounded executor for CPU-bound work (encoding, PDF extraction, chunking) so it never
+    runs on the event loop. In "process" mode, submitted functions and their arguments
+    must be picklable (module-level functions).
+    """
+    def __init__(self, mode: str = None, max_workers: int = None, max_queue: int = None):
+        self.mode = mode or settings.WORKER_POOL_MODE
+        self.max_workers = max_workers or settings.WORKER_POOL_SIZE
+        self.max_queue = settings.WORKER_POOL_MAX_QUEUE if max_queue is None else max_queue
+        self._executor: Executor | None = None
+        self._in_flight = 0
+        self._in_flight_lock = threading.Lock()
+        self._rejected = 0
+        self._tasks: dict[str, dict] = {}
+
+    def start(self):
+        if self._executor is not None:
+            return
+        if self.mode == "process":
+            # spawn: forking a process that already holds torch/grpc threads is unsafe
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        elif self.mode == "thread":
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="cpu-worker")
+        else:
+            raise ValueError(f"Unknown WORKER_POOL_MODE: {self.mode}")
+        logger.info("worker_pool_started", mode=self.mode, workers=self.max_workers, max_queue=self.max_queue)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+            logger.info("worker_pool_stopped")
+
+    async def run(self, fn, *args, **kwargs):
+        """Run fn(*args, **kwargs) on the pool, rejecting work once the queue is full."""
+        if self._in_flight >= self.max_workers + self.max_queue:
+            self._rejected += 1
+            logger.warning("worker_pool_saturated", task=fn.__name__, in_flight=self._in_flight)
+            raise WorkerPoolSaturated(f"Worker pool saturated ({self._in_flight} tasks in flight)")
+
+        self.start()
+        with self._in_flight_lock:
+            self._in_flight += 1
+        submitted = time.perf_counter()
+        try:
+            future = self._executor.submit(_timed_call, fn, args, kwargs)
+        except BaseException:
+            # e.g. BrokenProcessPool, or a shutdown during lifespan teardown: no future will release the slot
+            with self._in_flight_lock:
+                self._in_flight -= 1
+            raise
+        # The slot is held until the work itself is done: a caller that stops waiting
+        # (e.g. a timed-out rerank) cancels the task only if it has not started yet
+        future.add_done_callback(self._release)
+        result, compute = await asyncio.wrap_future(future)
+        self._record(fn.__name__, wait=time.perf_counter() - submitted - compute, compute=compute)
+        return result
+
+    def _release(self, future):
+        # Runs on the worker thread (or the executor's management thread in process mode)
+        with self._in_flight_lock:
+            self._in_flight -= 1
+
+    def _record(self, task: str, wait: float, compute: float):
+        stats = self._tasks.setdefault(task, {
+            "count": 0, "queue_wait_total": 0.0, "queue_wait_max": 0.0, "compute_total": 0.0, "compute_max": 0.0
+        })
+        stats["count"] += 1
+        stats["queue_wait_total"] += wait
+        stats["queue_wait_max"] = max(stats["queue_wait_max"], wait)
+        stats["compute_total"] += compute
+        stats["compute_max"] = max(stats["compute_max"], compute)
+
+    def stats(self) -> dict:
+        tasks = {}
+        for name, s in self._tasks.items():
+            tasks[name] = {
+                "count": s["count"],
+                "queue_wait_avg_ms": round(s["queue_wait_total"] / s["count"] * 1000, 3),
+                "queue_wait_max_ms": round(s["queue_wait_max"] * 1000, 3),
+                "compute_avg_ms": round(s["compute_total"] / s["count"] * 1000, 3),
+                "compute_max_ms": round(s["compute_max"] * 1000, 3),
+            }
+        return {
+            "mode": self.mode,
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "in_flight": self._in_flight,
+            "rejected": self._rejected,
+            "tasks": tasks,
+        }
+
+# Singleton instance, started and stopped by the application lifespan
+worker_pool = WorkerPool()
@@ -0,0 +1,442 @@
+import asyncio
+import fcntl
+import json
+import os
+import re
+import sqlite3
+import threading
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+import numpy as np
+from app.core.config import get_settings
+from app.core.logging import logger
+from app.db.vector_store import ChunkFilter, ChunkHit, VectorStore
+
+settings = get_settings()
+
+# Rank constant for reciprocal rank fusion (same as Weaviate's ranked fusion)
+_RRF_K = 60
+# Hits taken from each side of a hybrid query before fusion
+_HYBRID_CANDIDATES = 100
+# Rows scored per numpy call
+_BLOCK_ROWS = 16384
+# SQLite bound-parameter limit
+_SQL_CHUNK = 500
+
+class LocalIndexLocked(RuntimeError):
+    """The index directory is open in another process (VECTOR_STORE=local is single-process)."""
+
+def _timestamp(value) -> str | None:
+    # Fixed-width UTC strings so they compare correctly as text
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+class LocalVectorStore(VectorStore):
+    """
+    In-process vector store for single-node deployments (VECTOR_STORE=local).
+    Vectors are L2-normalised into a memory-mapped float16/float32 matrix that grows by
+    doubling; rows freed by deletes are reused. Chunk properties and an FTS5 (BM25) index
+    live in SQLite next to it, so metadata filters and keyword search run locally too.
+    Small indexes are scanned exactly; above LOCAL_INDEX_IVF_MIN_ROWS an IVF index
+    (spherical k-means lists, LOCAL_INDEX_IVF_NPROBE probed per query) limits the scan,
+    retrained whenever the index has doubled since the last training.
+
+    Also acts as its own provider (open/close/acquire/run), like WeaviatePool.
+    Row liveness and IVF lists are kept in memory, so only one process may have an index
+    open: open() takes an exclusive lock on the directory and raises LocalIndexLocked
+    instead of letting a second process (e.g. another gunicorn worker) serve stale chunks.
+    """
+    def __init__(self, path: str = None, dtype: str = None):
+        self.path = path or settings.LOCAL_INDEX_PATH
+        self.dtype = np.dtype(dtype or settings.LOCAL_INDEX_DTYPE)
+        self.min_ivf_rows = settings.LOCAL_INDEX_IVF_MIN_ROWS
+        self.nprobe = settings.LOCAL_INDEX_IVF_NPROBE
+        self._lock = threading.RLock()
+        self._lock_file = None
+        self._db = None
+        self._matrix = None
+        self.dim = 0
+        self._capacity = 0
+        self._size = 0 # rows in use, including freed ones
+        self._alive = np.zeros(0, dtype=bool)
+        self._lists = np.zeros(0, dtype=np.int32) # IVF list per row, -1 = unassigned
+        self._centroids = None
+        self._trained_rows = 0
+
+    # Provider interface
+
+    def open(self):
+        with self._lock:
+            if self._db is not None:
+                return
+            os.makedirs(self.path, exist_ok=True)
+            lock_file = open(os.path.join(self.path, "lock"), "a+")
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                lock_file.close()
+                raise LocalIndexLocked(
+                    f"Local index {self.path} is open in another process; VECTOR_STORE=local serves one process "
+                    "(run a single worker, or use Weaviate)"
+                )
+            self._lock_file = lock_file
+            self._db = sqlite3.connect(os.path.join(self.path, "index.sqlite"), check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS chunks ("
+                "row INTEGER PRIMARY KEY, uuid TEXT NOT NULL UNIQUE, document_id TEXT, chunk_index INTEGER, "
+                "text TEXT, content_hash TEXT, tags TEXT, source TEXT, uploaded_at TEXT, ivf_list INTEGER)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS chunks_document_id ON chunks (document_id)")
+            self._db.execute("CREATE VIRTUAL TABLE IF NOT EXISTS chunks_fts USING fts5(text)")
+            self._db.commit()
+
+            meta = dict(self._db.execute("SELECT key, value FROM meta").fetchall())
+            if "dim" in meta:
+                # The stored layout wins over LOCAL_INDEX_DTYPE
+                self.dim, self._capacity = int(meta["dim"]), int(meta["capacity"])
+                self.dtype = np.dtype(meta["dtype"])
+                self._trained_rows = int(meta.get("trained_rows", 0))
+                self._matrix = self._map("r+")
+            self._alive = np.zeros(self._capacity, dtype=bool)
+            self._lists = np.full(self._capacity, -1, dtype=np.int32)
+            rows = self._db.execute("SELECT row, ivf_list FROM chunks").fetchall()
+            if rows:
+                ids = np.array([r for r, _ in rows])
+                self._alive[ids] = True
+                self._lists[ids] = [-1 if l is None else l for _, l in rows]
+                self._size = int(ids.max()) + 1
+            centroids_path = os.path.join(self.path, "centroids.npy")
+            if self._trained_rows and os.path.exists(centroids_path):
+                self._centroids = np.load(centroids_path)
+            logger.info("local_index_opened", path=self.path, chunks=len(rows), dim=self.dim, dtype=str(self.dtype))
+
+    def close(self):
+        with self._lock:
+            if self._matrix is not None:
+                self._matrix.flush()
+                self._matrix = None
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+            if self._lock_file is not None:
+                self._lock_file.close()
+                self._lock_file = None
+            logger.info("local_index_closed")
+
+    @contextmanager
+    def acquire(self):
+        self.open()
+        yield self
+
+    async def run(self, fn, *args, **kwargs):
+        """Call fn(store, *args, **kwargs) in a worker thread."""
+        self.open()
+        return await asyncio.to_thread(fn, self, *args, **kwargs)
+
+    # Storage
+
+    def _map(self, mode: str) -> np.memmap:
+        return np.memmap(os.path.join(self.path, "vectors.bin"), dtype=self.dtype, mode=mode, shape=(self._capacity, self.dim))
+
+    def _save_meta(self, **values):
+        self._db.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", [(k, str(v)) for k, v in values.items()])
+
+    def _reserve(self, rows_needed: int):
+        # Called with the lock held
+        if rows_needed <= self._capacity:
+            return
+        capacity = max(rows_needed, self._capacity * 2, 1024)
+        if self._matrix is not None:
+            self._matrix.flush()
+            self._matrix = None
+        with open(os.path.join(self.path, "vectors.bin"), "ab") as f:
+            f.truncate(capacity * self.dim * self.dtype.itemsize)
+        self._capacity = capacity
+        self._matrix = self._map("r+")
+        self._alive = np.concatenate([self._alive, np.zeros(capacity - len(self._alive), dtype=bool)])
+        self._lists = np.concatenate([self._lists, np.full(capacity - len(self._lists), -1, dtype=np.int32)])
+        self._save_meta(dim=self.dim, dtype=self.dtype.name, capacity=capacity)
+
+    def _rows_for(self, column: str, values: list[str]) -> list[tuple[int, str]]:
+        found = []
+        for start in range(0, len(values), _SQL_CHUNK):
+            part = values[start:start + _SQL_CHUNK]
+            found += self._db.execute(
+                f"SELECT row, uuid FROM chunks WHERE {column} IN ({','.join('?' * len(part))})", part
+            ).fetchall()
+        return found
+
+    # VectorStore
+
+    def init_schema(self):
+        self.open()
+
+    def insert_chunks(self, chunks: list[dict], batch_size: int = None, concurrent_requests: int = None) -> list[dict]:
+        if not chunks:
+            return []
+        vectors = _normalize(np.asarray([c["vector"] for c in chunks], dtype=np.float32))
+        with self._lock:
+            if not self.dim:
+                self.dim = vectors.shape[1]
+            if vectors.shape[1] != self.dim:
+                error = f"vector dimension {vectors.shape[1]} does not match index dimension {self.dim}"
+                logger.error("local_index_insert_error", error=error)
+                return [{"chunk_index": c["chunk_index"], "error": error} for c in chunks]
+
+            ids = [str(c.get("uuid") or uuid.uuid4()) for c in chunks]
+            existing = {u: r for r, u in self._rows_for("uuid", ids)}
+            free = iter(np.nonzero(~self._alive[:self._size])[0].tolist())
+            rows = []
+            for chunk_id in ids:
+                row = existing.get(chunk_id)
+                if row is None:
+                    row = next(free, None)
+                if row is None:
+                    row = self._size
+                    self._size += 1
+                existing[chunk_id] = row
+                rows.append(row)
+            self._reserve(self._size)
+
+            self._matrix[rows] = vectors.astype(self.dtype)
+            self._matrix.flush()
+            lists = self._assign(vectors) if self._centroids is not None else [-1] * len(rows)
+            self._db.executemany(
+                "INSERT OR REPLACE INTO chunks (row, uuid, document_id, chunk_index, text, content_hash, tags, source, uploaded_at, ivf_list) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (row, chunk_id, str(c["document_id"]), c["chunk_index"], c["text"], c.get("content_hash"),
+                     json.dumps(c.get("tags") or []), c.get("source"), _timestamp(c.get("uploaded_at")), int(lst))
+                    for row, chunk_id, c, lst in zip(rows, ids, chunks, lists)
+                ]
+            )
+            self._db.executemany("DELETE FROM chunks_fts WHERE rowid = ?", [(row,) for row in rows])
+            self._db.executemany("INSERT INTO chunks_fts (rowid, text) VALUES (?, ?)", [(row, c["text"]) for row, c in zip(rows, chunks)])
+            self._db.commit()
+            self._alive[rows] = True
+            self._lists[rows] = lists
+            self._maybe_train()
+        return []
+
+    def fetch_chunk_state(self, document_id: str) -> dict[str, dict]:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT uuid, chunk_index, tags, source FROM chunks WHERE document_id = ?", (str(document_id),)
+            ).fetchall()
+        return {u: {"chunk_index": i, "tags": json.loads(t or "[]"), "source": s} for u, i, t, s in rows}
+
+    def _delete_rows(self, rows: list[int]) -> int:
+        # Called with the lock held
+        if not rows:
+            return 0
+        self._db.executemany("DELETE FROM chunks WHERE row = ?", [(r,) for r in rows])
+        self._db.executemany("DELETE FROM chunks_fts WHERE rowid = ?", [(r,) for r in rows])
+        self._db.commit()
+        self._alive[rows] = False
+        self._lists[rows] = -1
+        return len(rows)
+
+    def delete_chunks(self, uuids: list[str]) -> int:
+        with self._lock:
+            return self._delete_rows([r for r, _ in self._rows_for("uuid", [str(u) for u in uuids])])
+
+    def delete_document_chunks(self, document_id: str) -> int:
+        with self._lock:
+            return self._delete_rows([r for r, _ in self._rows_for("document_id", [str(document_id)])])
+
+    def update_chunks(self, updates: dict[str, dict]):
+        columns = {"chunk_index", "content_hash", "tags", "source", "uploaded_at"}
+        with self._lock:
+            for chunk_id, properties in updates.items():
+                values = {k: v for k, v in properties.items() if k in columns}
+                if "tags" in values:
+                    values["tags"] = json.dumps(values["tags"] or [])
+                if "uploaded_at" in values:
+                    values["uploaded_at"] = _timestamp(values["uploaded_at"])
+                if values:
+                    self._db.execute(
+                        f"UPDATE chunks SET {', '.join(f'{k} = ?' for k in values)} WHERE uuid = ?",
+                        (*values.values(), str(chunk_id))
+                    )
+            self._db.commit()
+
+    def _filter_sql(self, filters: ChunkFilter) -> tuple[str, list]:
+        clauses, params = [], []
+        if filters.tags:
+            clauses.append(f"EXISTS (SELECT 1 FROM json_each(chunks.tags) WHERE json_each.value IN ({','.join('?' * len(filters.tags))}))")
+            params += filters.tags
+        if filters.source:
+            clauses.append("source = ?")
+            params.append(filters.source)
+        if filters.uploaded_after:
+            clauses.append("uploaded_at >= ?")
+            params.append(_timestamp(filters.uploaded_after))
+        if filters.uploaded_before:
+            clauses.append("uploaded_at < ?")
+            params.append(_timestamp(filters.uploaded_before))
+        return " AND ".join(clauses), params
+
+    def _candidates(self, filters: ChunkFilter = None) -> np.ndarray:
+        # Called with the lock held; boolean mask over rows [0, size)
+        mask = self._alive[:self._size].copy()
+        if filters:
+            where, params = self._filter_sql(filters)
+            allowed = np.zeros(self._size, dtype=bool)
+            rows = [r for (r,) in self._db.execute(f"SELECT row FROM chunks WHERE {where}", params)]
+            allowed[rows] = True
+            mask &= allowed
+        return mask
+
+    def _block(self, index) -> np.ndarray:
+        # numpy has no BLAS path for float16, so float16 rows are widened one block at a time
+        block = self._matrix[index]
+        return block if block.dtype == np.float32 else block.astype(np.float32)
+
+    def _vector_top(self, vector: list[float], limit: int, filters: ChunkFilter = None) -> tuple[np.ndarray, np.ndarray]:
+        # Called with the lock held; returns (rows, cosine similarities), best first
+        if self._matrix is None or not self._size:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        query = _normalize(np.asarray(vector, dtype=np.float32))
+        mask = self._candidates(filters)
+        if self._centroids is not None:
+            probe = np.argsort(-(self._centroids @ query))[:self.nprobe]
+            mask &= np.isin(self._lists[:self._size], probe)
+        rows = np.nonzero(mask)[0]
+        if len(rows) > self._size // 4:
+            # Dense candidate set: scan contiguous slices (no gather copy), then select
+            sims = np.empty(self._size, dtype=np.float32)
+            for start in range(0, self._size, _BLOCK_ROWS):
+                stop = min(self._size, start + _BLOCK_ROWS)
+                sims[start:stop] = self._block(slice(start, stop)) @ query
+            sims = sims[rows]
+        else:
+            sims = np.empty(len(rows), dtype=np.float32)
+            for start in range(0, len(rows), _BLOCK_ROWS):
+                block = rows[start:start + _BLOCK_ROWS]
+                sims[start:start + len(block)] = self._block(block) @ query
+        if len(rows) > limit:
+            top = np.argpartition(-sims, limit)[:limit]
+            rows, sims = rows[top], sims[top]
+        order = np.argsort(-sims)
+        return rows[order], sims[order]
+
+    def _keyword_top(self, query: str, limit: int, filters: ChunkFilter = None) -> tuple[list[int], list[float]]:
+        # Called with the lock held; BM25 over chunk text, best first
+        terms = re.findall(r"\w+", query.lower())
+        if not terms:
+            return [], []
+        sql = "SELECT rowid, -bm25(chunks_fts) FROM chunks_fts WHERE chunks_fts MATCH ?"
+        params = [" OR ".join(f'"{t}"' for t in terms)]
+        if filters:
+            where, filter_params = self._filter_sql(filters)
+            sql += f" AND rowid IN (SELECT row FROM chunks WHERE {where})"
+            params += filter_params
+        found = self._db.execute(sql + " ORDER BY bm25(chunks_fts) LIMIT ?", (*params, limit)).fetchall()
+        return [r for r, _ in found], [s for _, s in found]
+
+    def _hits(self, rows: list[int], distances: list = None, scores: list = None) -> list[ChunkHit]:
+        # Called with the lock held
+        props = {}
+        for start in range(0, len(rows), _SQL_CHUNK):
+            part = [int(r) for r in rows[start:start + _SQL_CHUNK]]
+            for row, chunk_id, document_id, chunk_index, text, tags, source, uploaded_at in self._db.execute(
+                "SELECT row, uuid, document_id, chunk_index, text, tags, source, uploaded_at "
+                f"FROM chunks WHERE row IN ({','.join('?' * len(part))})", part
+            ):
+                props[row] = (chunk_id, {
+                    "text": text, "document_id": document_id, "chunk_index": chunk_index,
+                    "tags": json.loads(tags or "[]"), "source": source, "uploaded_at": uploaded_at,
+                })
+        hits = []
+        for i, row in enumerate(rows):
+            chunk_id, properties = props[int(row)]
+            hits.append(ChunkHit(
+                uuid=uuid.UUID(chunk_id), properties=properties,
+                distance=None if distances is None else float(distances[i]),
+                score=None if scores is None else float(scores[i])
+            ))
+        return hits
+
+    def search(self, vector: list[float], limit: int = 5, filters: ChunkFilter = None) -> list[ChunkHit]:
+        with self._lock:
+            rows, sims = self._vector_top(vector, limit, filters)
+            return self._hits(rows.tolist(), distances=(1.0 - sims).tolist())
+
+    def hybrid_search(self, query: str, vector: list[float], limit: int = 5, alpha: float = None,
+                      fusion: str = "relative", filters: ChunkFilter = None) -> list[ChunkHit]:
+        alpha = settings.SEARCH_HYBRID_ALPHA if alpha is None else alpha
+        candidates = max(limit, _HYBRID_CANDIDATES)
+        with self._lock:
+            ranked = []
+            if alpha > 0:
+                rows, sims = self._vector_top(vector, candidates, filters)
+                ranked.append((alpha, rows.tolist(), sims.tolist()))
+            if alpha < 1:
+                ranked.append((1 - alpha, *self._keyword_top(query, candidates, filters)))
+
+            fused: dict[int, float] = {}
+            for weight, rows, scores in ranked:
+                if not rows:
+                    continue
+                if fusion == "rrf":
+                    parts = [weight / (_RRF_K + rank + 1) for rank in range(len(rows))]
+                else:
+                    # Relative score fusion: min-max normalise each side to [0, 1]
+                    low, high = min(scores), max(scores)
+                    parts = [weight * ((s - low) / (high - low) if high > low else 1.0) for s in scores]
+                for row, part in zip(rows, parts):
+                    fused[row] = fused.get(row, 0.0) + part
+
+            best = sorted(fused, key=fused.get, reverse=True)[:limit]
+            return self._hits(best, scores=[fused[r] for r in best])
+
+    # IVF
+
+    def _assign(self, vectors: np.ndarray) -> np.ndarray:
+        lists = np.empty(len(vectors), dtype=np.int32)
+        for start in range(0, len(vectors), _BLOCK_ROWS):
+            block = np.asarray(vectors[start:start + _BLOCK_ROWS], dtype=np.float32)
+            lists[start:start + len(block)] = np.argmax(block @ self._centroids.T, axis=1)
+        return lists
+
+    def _maybe_train(self):
+        # Called with the lock held
+        alive = int(self._alive.sum())
+        if alive < self.min_ivf_rows or (self._trained_rows and alive < 2 * self._trained_rows):
+            return
+        rows = np.nonzero(self._alive[:self._size])[0]
+        nlist = max(1, int(np.sqrt(alive)))
+        rng = np.random.default_rng(0)
+        sample = np.sort(rng.choice(rows, size=min(len(rows), 64 * nlist), replace=False))
+        data = np.asarray(self._matrix[sample], dtype=np.float32)
+        centroids = data[rng.choice(len(data), size=nlist, replace=False)]
+        for _ in range(10): # spherical k-means
+            labels = np.argmax(data @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, data)
+            empty = np.bincount(labels, minlength=nlist) == 0
+            sums[empty] = centroids[empty]
+            centroids = _normalize(sums)
+        self._centroids = centroids
+
+        for start in range(0, len(rows), _BLOCK_ROWS):
+            block = rows[start:start + _BLOCK_ROWS]
+            self._lists[block] = self._assign(self._matrix[block])
+        np.save(os.path.join(self.path, "centroids.npy"), centroids)
+        self._db.executemany("UPDATE chunks SET ivf_list = ? WHERE row = ?", [(int(self._lists[r]), int(r)) for r in rows])
+        self._trained_rows = alive
+        self._save_meta(trained_rows=alive)
+        self._db.commit()
+        logger.info("local_index_ivf_trained", rows=alive, lists=nlist)
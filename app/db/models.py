@@ -1,9 +1,13 @@
 import uuid
 from datetime import datetime
-from sqlalchemy import Column, String, DateTime, Text
+from sqlalchemy import Column, String, DateTime, Text, Integer, JSON, Index
 from sqlalchemy.dialects.postgresql import UUID
 from app.db.postgres import Base
 
+def split_tags(tags: str | None) -> list[str]:
+    """Comma separated tags string -> list of trimmed, non-empty tags."""
+    return [t.strip() for t in (tags or "").split(",") if t.strip()]
+
 class DocumentMetadata(Base):
     __tablename__ = "documents"
 
@@ -12,6 +16,46 @@ class DocumentMetadata(Base):
     source = Column(String, nullable=True) # e.g. filename
     tags = Column(String, nullable=True) # comma separated
     uploaded_at = Column(DateTime, default=datetime.utcnow)
+    content_updated_at = Column(DateTime, nullable=True) # last upload that added or removed chunks
+
+    __table_args__ = (
+        # Latest document for a source (re-ingestion looks it up on every upload)
+        Index("ix_documents_source_uploaded_at", "source", "uploaded_at"),
+    )
 
     def __repr__(self):
         return f"<DocumentMetadata(id={self.id}, title={self.title})>"
+
+class IngestionJob(Base):
+    __tablename__ = "ingestion_jobs"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    document_id = Column(UUID(as_uuid=True), nullable=False, default=uuid.uuid4)
+    title = Column(String, nullable=True)
+    source = Column(String, nullable=True)
+    tags = Column(String, nullable=True)
+    content_type = Column(String, nullable=False) # "pdf" or "text"
+    payload_path = Column(String, nullable=False) # spooled upload, removed once the job finishes
+    status = Column(String, nullable=False, default="queued", index=True) # queued, running, completed, failed
+    stage = Column(String, nullable=True) # parse, embed_write, reconcile, done
+    chunks_total = Column(Integer, nullable=False, default=0)
+    chunks_embedded = Column(Integer, nullable=False, default=0)
+    chunks_written = Column(Integer, nullable=False, default=0)
+    chunks_failed = Column(Integer, nullable=False, default=0)
+    chunks_unchanged = Column(Integer, nullable=False, default=0, server_default="0") # kept from an earlier upload
+    chunks_removed = Column(Integer, nullable=False, default=0, server_default="0") # no longer in the document
+    stage_seconds = Column(JSON, nullable=False, default=dict) # wall time spent per stage
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    claimed_by = Column(String, nullable=True) # host:pid of the worker process running the job
+    heartbeat_at = Column(DateTime, nullable=True) # refreshed while running; a stale one means the worker died
+
+    __table_args__ = (
+        # Latest job for a source, while its document is not stored yet
+        Index("ix_ingestion_jobs_source_created_at", "source", "created_at"),
+    )
+
+    def __repr__(self):
+        return f"<IngestionJob(id={self.id}, status={self.status}, stage={self.stage})>"
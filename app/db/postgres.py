@@ -1,10 +1,19 @@
+from sqlalchemy import inspect, text
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker, declarative_base
 from app.core.config import get_settings
 
 settings = get_settings()
 
-engine = create_async_engine(settings.DATABASE_URL, echo=False)
+engine = create_async_engine(
+    settings.DATABASE_URL,
+    echo=False,
+    pool_size=settings.POSTGRES_POOL_SIZE,
+    max_overflow=settings.POSTGRES_MAX_OVERFLOW,
+    pool_timeout=settings.POSTGRES_POOL_TIMEOUT,
+    pool_recycle=settings.POSTGRES_POOL_RECYCLE,
+    pool_pre_ping=settings.POSTGRES_POOL_PRE_PING,
+)
 AsyncSessionLocal = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
 Base = declarative_base()
@@ -13,6 +22,36 @@ async def get_db():
     async with AsyncSessionLocal() as session:
         yield session
 
+def _add_missing_columns(conn):
+    # create_all never alters existing tables; add columns introduced since they were created
+    inspector = inspect(conn)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {c["name"] for c in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            ddl = f"ALTER TABLE {table.name} ADD COLUMN IF NOT EXISTS {column.name} {column.type.compile(conn.dialect)}"
+            if column.server_default is not None:
+                ddl += f" DEFAULT {column.server_default.arg!r}"
+            conn.execute(text(ddl))
+
+def _add_missing_indexes(conn):
+    # Likewise for indexes declared after a table was created
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
+
+# Any constant shared by all processes of the app; see init_db
+_SCHEMA_LOCK_KEY = 0x6b696d6f
+
 async def init_db():
     async with engine.begin() as conn:
+        # Every worker runs this at startup: serialize them, so no two check-then-create the
+        # same table or index (the loser would fail with "already exists" and stop its worker).
+        # Released at commit.
+        await conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": _SCHEMA_LOCK_KEY})
         await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(_add_missing_columns)
+        await conn.run_sync(_add_missing_indexes)
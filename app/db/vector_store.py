@@ -0,0 +1,82 @@
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from functools import lru_cache
+from datetime import datetime, timezone
+from typing import Optional
+from uuid import UUID
+from app.core.config import get_settings
+
+settings = get_settings()
+
+@dataclass
+class ChunkFilter:
+    """Metadata filter applied inside the vector store, before the top k is taken."""
+    tags: list[str] = field(default_factory=list) # any of
+    source: Optional[str] = None
+    uploaded_after: Optional[datetime] = None
+    uploaded_before: Optional[datetime] = None
+
+    def __post_init__(self):
+        # Naive datetimes are taken as UTC, like the timestamps written by ingestion
+        for name in ("uploaded_after", "uploaded_before"):
+            value = getattr(self, name)
+            if value is not None and value.tzinfo is None:
+                setattr(self, name, value.replace(tzinfo=timezone.utc))
+
+    def __bool__(self):
+        return bool(self.tags or self.source or self.uploaded_after or self.uploaded_before)
+
+@dataclass
+class ChunkHit:
+    uuid: UUID
+    properties: dict # text, document_id, chunk_index, ...
+    distance: Optional[float] = None # cosine distance, set by vector search
+    score: Optional[float] = None # fused score, set by hybrid search
+
+class VectorStore(ABC):
+    """
+    Chunk storage and retrieval as used by ingestion and search. Methods are blocking;
+    the app reaches a store through a provider (WeaviatePool, LocalVectorStore) whose
+    async run(fn, ...) calls fn(store, ...) off the event loop.
+    """
+    @abstractmethod
+    def init_schema(self): ...
+
+    @abstractmethod
+    def insert_chunks(self, chunks: list[dict], batch_size: int = None, concurrent_requests: int = None) -> list[dict]:
+        """Insert (or overwrite by uuid) chunks; returns [{chunk_index, error}] for failed ones."""
+
+    @abstractmethod
+    def fetch_chunk_state(self, document_id: str) -> dict[str, dict]:
+        """uuid -> {chunk_index, tags, source} for every stored chunk of a document."""
+
+    @abstractmethod
+    def delete_chunks(self, uuids: list[str]) -> int: ...
+
+    @abstractmethod
+    def delete_document_chunks(self, document_id: str) -> int: ...
+
+    @abstractmethod
+    def update_chunks(self, updates: dict[str, dict]):
+        """Patch properties (uuid -> properties); text and vector are untouched."""
+
+    @abstractmethod
+    def search(self, vector: list[float], limit: int = 5, filters: ChunkFilter = None) -> list[ChunkHit]: ...
+
+    @abstractmethod
+    def hybrid_search(self, query: str, vector: list[float], limit: int = 5, alpha: float = None,
+                      fusion: str = "relative", filters: ChunkFilter = None) -> list[ChunkHit]:
+        """BM25 + vector; alpha=1 is pure vector, 0 pure keyword; fusion "relative" or "rrf"."""
+
+@lru_cache()
+def get_vector_store():
+    """
+    Shared provider for the backend picked by VECTOR_STORE ("weaviate" or "local"),
+    opened and closed by the application lifespan. Imported lazily so a local
+    deployment never loads the Weaviate client.
+    """
+    if settings.VECTOR_STORE == "local":
+        from app.db.local_index import LocalVectorStore
+        return LocalVectorStore()
+    from app.db.weaviate import weaviate_pool
+    return weaviate_pool
@@ -1,20 +1,78 @@
+import asyncio
+import queue
+import time
+from contextlib import contextmanager
 import weaviate
 from app.core.config import get_settings
 from app.core.logging import logger
+from app.db.vector_store import ChunkFilter, ChunkHit, VectorStore
 
 settings = get_settings()
 
-class WeaviateClient:
-    def __init__(self):
-        self.client = weaviate.connect_to_custom(
-            http_host="weaviate",
-            http_port=8080,
-            http_secure=False,
-            grpc_host="weaviate", 
-            grpc_port=50051,
-            grpc_secure=False
+Property = weaviate.classes.config.Property
+DataType = weaviate.classes.config.DataType
+Filter = weaviate.classes.query.Filter
+
+# Properties added after the Chunk collection was first created; init_schema adds any
+# that an existing collection lacks. All of them are filter-only (no BM25 index).
+# tags, source and uploaded_at are copied from the document so filters run inside the index.
+ADDED_PROPERTIES = [
+    Property(name="content_hash", data_type=DataType.TEXT, index_searchable=False, skip_vectorization=True),
+    Property(name="tags", data_type=DataType.TEXT_ARRAY, index_searchable=False, skip_vectorization=True,
+             tokenization=weaviate.classes.config.Tokenization.FIELD),
+    Property(name="source", data_type=DataType.TEXT, index_searchable=False, skip_vectorization=True,
+             tokenization=weaviate.classes.config.Tokenization.FIELD),
+    Property(name="uploaded_at", data_type=DataType.DATE, skip_vectorization=True),
+]
+
+# Chunk properties copied from DocumentMetadata
+DOCUMENT_PROPERTIES = ("tags", "source", "uploaded_at")
+
+# Hybrid fusion algorithms exposed on /search
+FUSION_TYPES = {
+    "relative": weaviate.classes.query.HybridFusion.RELATIVE_SCORE,
+    "rrf": weaviate.classes.query.HybridFusion.RANKED,
+}
+
+# Upper bound for ids per delete filter and objects per fetch page
+_PAGE_SIZE = 1000
+
+class WeaviateClient(VectorStore):
+    def __init__(self, host: str = None, http_port: int = None, grpc_port: int = None, secure: bool = None):
+        self.host = host or settings.WEAVIATE_HOST
+        self.http_port = http_port or settings.WEAVIATE_HTTP_PORT
+        self.grpc_port = grpc_port or settings.WEAVIATE_GRPC_PORT
+        self.secure = settings.WEAVIATE_SECURE if secure is None else secure
+        self.client = self._connect()
+        # Set to False whenever a call fails so the pool knows to reconnect on release
+        self.healthy = True
+        self.last_checked = time.monotonic()
+
+    def _connect(self):
+        return weaviate.connect_to_custom(
+            http_host=self.host,
+            http_port=self.http_port,
+            http_secure=self.secure,
+            grpc_host=self.host,
+            grpc_port=self.grpc_port,
+            grpc_secure=self.secure
         )
 
+    def is_ready(self) -> bool:
+        try:
+            return self.client.is_ready()
+        except Exception:
+            return False
+
+    def reconnect(self):
+        try:
+            self.client.close()
+        except Exception:
+            pass
+        self.client = self._connect()
+        self.healthy = True
+        self.last_checked = time.monotonic()
+
     def init_schema(self):
         # Weaviate v4 client style
         try:
@@ -23,15 +81,22 @@ class WeaviateClient:
                 self.client.collections.create(
                     name="Chunk",
                     properties=[
-                        weaviate.classes.config.Property(name="text", data_type=weaviate.classes.config.DataType.TEXT),
-                        weaviate.classes.config.Property(name="document_id", data_type=weaviate.classes.config.DataType.UUID),
-                        weaviate.classes.config.Property(name="chunk_index", data_type=weaviate.classes.config.DataType.INT),
+                        Property(name="text", data_type=DataType.TEXT),
+                        Property(name="document_id", data_type=DataType.UUID),
+                        Property(name="chunk_index", data_type=DataType.INT),
+                        *ADDED_PROPERTIES,
                     ],
                     vectorizer_config=weaviate.classes.config.Configure.Vectorizer.none()  # We push vectors manually
                 )
                 logger.info("weaviate_schema_created")
             else:
                 logger.info("weaviate_schema_exists")
+                chunks_collection = self.client.collections.get("Chunk")
+                existing = {p.name for p in chunks_collection.config.get().properties}
+                for prop in ADDED_PROPERTIES:
+                    if prop.name not in existing:
+                        chunks_collection.config.add_property(prop)
+                        logger.info("weaviate_schema_migrated", added=prop.name)
         except Exception as e:
             logger.error("weaviate_schema_init_error", error=str(e))
 
@@ -47,27 +112,286 @@ class WeaviateClient:
                 vector=vector
             )
         except Exception as e:
+            self.healthy = False
             logger.error("weaviate_insert_error", error=str(e))
             raise e
 
-    def search(self, vector: list[float], limit: int = 5):
+    def insert_chunks(self, chunks: list[dict], batch_size: int = None, concurrent_requests: int = None) -> list[dict]:
+        """
+        Bulk insert using fixed-size batches sent concurrently.
+        Each chunk is a dict with text, vector, document_id and chunk_index, plus optional
+        uuid and content_hash (set by ingestion so unchanged chunks can be recognised later)
+        and the document's tags, source and uploaded_at.
+        Per-object failures are collected and returned instead of raised, so one bad
+        chunk doesn't fail the whole document.
+        """
+        try:
+            chunks_collection = self.client.collections.get("Chunk")
+            with chunks_collection.batch.fixed_size(
+                batch_size=batch_size or settings.WEAVIATE_BATCH_SIZE,
+                concurrent_requests=concurrent_requests or settings.WEAVIATE_BATCH_CONCURRENCY
+            ) as batch:
+                for chunk in chunks:
+                    batch.add_object(
+                        properties={
+                            "text": chunk["text"],
+                            "document_id": chunk["document_id"],
+                            "chunk_index": chunk["chunk_index"],
+                            "content_hash": chunk.get("content_hash"),
+                            **{name: chunk[name] for name in DOCUMENT_PROPERTIES if chunk.get(name) is not None}
+                        },
+                        vector=chunk["vector"],
+                        uuid=chunk.get("uuid")
+                    )
+            failed = chunks_collection.batch.failed_objects
+        except Exception as e:
+            self.healthy = False
+            logger.error("weaviate_batch_insert_error", error=str(e))
+            raise e
+
+        errors = [
+            {
+                "chunk_index": (f.object_.properties or {}).get("chunk_index"),
+                "error": f.message
+            }
+            for f in failed
+        ]
+        if errors:
+            logger.warning("weaviate_batch_partial_failure", failed=len(errors), total=len(chunks))
+        return errors
+
+    def delete_document_chunks(self, document_id: str) -> int:
+        try:
+            chunks_collection = self.client.collections.get("Chunk")
+            result = chunks_collection.data.delete_many(
+                where=Filter.by_property("document_id").equal(document_id)
+            )
+            return result.successful
+        except Exception as e:
+            self.healthy = False
+            logger.error("weaviate_delete_error", error=str(e))
+            raise e
+
+    def fetch_chunk_state(self, document_id: str) -> dict[str, dict]:
+        """
+        Map of chunk uuid -> {chunk_index, tags, source} for every stored chunk of a
+        document (no text or vectors).
+        """
+        try:
+            chunks_collection = self.client.collections.get("Chunk")
+            found = {}
+            last_index = 0
+            # Keyset pagination on chunk_index; offset paging stops at QUERY_MAXIMUM_RESULTS
+            while True:
+                response = chunks_collection.query.fetch_objects(
+                    filters=Filter.by_property("document_id").equal(document_id)
+                    & Filter.by_property("chunk_index").greater_or_equal(last_index),
+                    sort=weaviate.classes.query.Sort.by_property("chunk_index"),
+                    limit=_PAGE_SIZE,
+                    return_properties=["chunk_index", "tags", "source"]
+                )
+                before = len(found)
+                for obj in response.objects:
+                    found[str(obj.uuid)] = obj.properties
+                    last_index = max(last_index, obj.properties.get("chunk_index") or 0)
+                if len(response.objects) < _PAGE_SIZE or len(found) == before:
+                    return found
+        except Exception as e:
+            self.healthy = False
+            logger.error("weaviate_fetch_error", error=str(e))
+            raise e
+
+    def delete_chunks(self, uuids: list[str]) -> int:
+        try:
+            chunks_collection = self.client.collections.get("Chunk")
+            deleted = 0
+            for start in range(0, len(uuids), _PAGE_SIZE):
+                result = chunks_collection.data.delete_many(
+                    where=Filter.by_id().contains_any(uuids[start:start + _PAGE_SIZE])
+                )
+                deleted += result.successful
+            return deleted
+        except Exception as e:
+            self.healthy = False
+            logger.error("weaviate_delete_error", error=str(e))
+            raise e
+
+    def update_chunks(self, updates: dict[str, dict]):
+        """
+        Patch properties of existing chunks (uuid -> properties), e.g. re-number chunks that
+        moved within their document or refresh their tags; text and vector are untouched.
+        """
+        try:
+            chunks_collection = self.client.collections.get("Chunk")
+            for chunk_uuid, properties in updates.items():
+                chunks_collection.data.update(uuid=chunk_uuid, properties=properties)
+        except Exception as e:
+            self.healthy = False
+            logger.error("weaviate_update_error", error=str(e))
+            raise e
+
+    @staticmethod
+    def _where(filters: ChunkFilter = None):
+        """ChunkFilter -> one Weaviate filter (None if nothing to filter on)."""
+        if not filters:
+            return None
+        conditions = []
+        if filters.tags:
+            conditions.append(Filter.by_property("tags").contains_any(filters.tags))
+        if filters.source:
+            conditions.append(Filter.by_property("source").equal(filters.source))
+        if filters.uploaded_after:
+            conditions.append(Filter.by_property("uploaded_at").greater_or_equal(filters.uploaded_after))
+        if filters.uploaded_before:
+            conditions.append(Filter.by_property("uploaded_at").less_than(filters.uploaded_before))
+        return Filter.all_of(conditions) if len(conditions) > 1 else conditions[0]
+
+    @staticmethod
+    def _hits(objects) -> list[ChunkHit]:
+        return [
+            ChunkHit(uuid=obj.uuid, properties=obj.properties, distance=obj.metadata.distance, score=obj.metadata.score)
+            for obj in objects
+        ]
+
+    def search(self, vector: list[float], limit: int = 5, filters: ChunkFilter = None) -> list[ChunkHit]:
         try:
             chunks_collection = self.client.collections.get("Chunk")
             # Using simple near_vector search
             response = chunks_collection.query.near_vector(
                 near_vector=vector,
                 limit=limit,
+                filters=self._where(filters),
                 return_metadata=weaviate.classes.query.MetadataQuery(distance=True)
             )
-            return response.objects
+            return self._hits(response.objects)
         except Exception as e:
+            self.healthy = False
             logger.error("weaviate_search_error", error=str(e))
             return []
-            
+
+    def hybrid_search(self, query: str, vector: list[float], limit: int = 5, alpha: float = None,
+                      fusion: str = "relative", filters: ChunkFilter = None) -> list[ChunkHit]:
+        """
+        BM25 + vector search fused inside Weaviate. alpha=1 is pure vector, alpha=0 pure
+        keyword; fusion is "relative" (score normalisation) or "rrf" (reciprocal rank).
+        """
+        try:
+            chunks_collection = self.client.collections.get("Chunk")
+            response = chunks_collection.query.hybrid(
+                query=query,
+                vector=vector,
+                alpha=settings.SEARCH_HYBRID_ALPHA if alpha is None else alpha,
+                fusion_type=FUSION_TYPES[fusion],
+                query_properties=["text"],
+                limit=limit,
+                filters=self._where(filters),
+                return_metadata=weaviate.classes.query.MetadataQuery(score=True)
+            )
+            return self._hits(response.objects)
+        except Exception as e:
+            self.healthy = False
+            logger.error("weaviate_hybrid_search_error", error=str(e))
+            return []
+
     def close(self):
         self.client.close()
 
+class WeaviatePool:
+    """
+    Fixed-size pool of long-lived Weaviate connections.
+    Connections are opened lazily, probed with a readiness check at most once per
+    WEAVIATE_HEALTHCHECK_INTERVAL, and re-established after a failed call.
+    """
+    def __init__(self, size: int = None, healthcheck_interval: float = None):
+        self.size = size or settings.WEAVIATE_POOL_SIZE
+        self.healthcheck_interval = (
+            settings.WEAVIATE_HEALTHCHECK_INTERVAL if healthcheck_interval is None else healthcheck_interval
+        )
+        self._reset_slots()
+
+    def _reset_slots(self):
+        # None marks a slot whose connection has not been (re)opened yet
+        self._slots = queue.LifoQueue(maxsize=self.size)
+        for _ in range(self.size):
+            self._slots.put(None)
+
+    def open(self):
+        """Pre-connect every slot. Failures are logged and retried on first use."""
+        clients = [self._slots.get() for _ in range(self.size)]
+        for i, client in enumerate(clients):
+            if client is None:
+                try:
+                    clients[i] = WeaviateClient()
+                except Exception as e:
+                    logger.error("weaviate_pool_connect_failed", error=str(e))
+            self._slots.put(clients[i])
+        logger.info("weaviate_pool_opened", size=self.size)
+
+    def close(self):
+        while True:
+            try:
+                client = self._slots.get_nowait()
+            except queue.Empty:
+                break
+            if client is not None:
+                try:
+                    client.close()
+                except Exception as e:
+                    logger.error("weaviate_pool_close_error", error=str(e))
+        self._reset_slots()
+        logger.info("weaviate_pool_closed")
+
+    def _checkout(self) -> WeaviateClient:
+        client = self._slots.get()
+        try:
+            if client is None:
+                return WeaviateClient()
+            if time.monotonic() - client.last_checked > self.healthcheck_interval:
+                if not client.is_ready():
+                    logger.warning("weaviate_pool_unhealthy_connection", action="reconnect")
+                    client.reconnect()
+                client.last_checked = time.monotonic()
+            return client
+        except Exception:
+            # Give the slot back empty so the next caller retries the connection
+            self._slots.put(None)
+            raise
+
+    def _checkin(self, client: WeaviateClient):
+        if not client.healthy:
+            try:
+                client.reconnect()
+            except Exception as e:
+                logger.error("weaviate_pool_reconnect_failed", error=str(e))
+                client = None
+        self._slots.put(client)
+
+    @contextmanager
+    def acquire(self):
+        """Borrow a connection for blocking use (scripts, worker threads)."""
+        client = self._checkout()
+        try:
+            yield client
+        except Exception:
+            client.healthy = False
+            raise
+        finally:
+            self._checkin(client)
+
+    async def run(self, fn, *args, **kwargs):
+        """
+        Async variant: borrow a connection and call fn(client, *args, **kwargs) in a worker
+        thread, so waiting for a free slot and the network call never block the event loop.
+        """
+        def call():
+            with self.acquire() as client:
+                return fn(client, *args, **kwargs)
+        return await asyncio.to_thread(call)
+
 # We need a predictable client instance or way to create it.
 # Since weaviate connection might fail if container isn't up, we'll instantiate lazily or in calling code.
 def get_weaviate_client():
     return WeaviateClient()
+
+# Shared pool, opened and closed by the application lifespan
+weaviate_pool = WeaviatePool()
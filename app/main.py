@@ -1,10 +1,21 @@
+import asyncio
+import math
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 from app.core.config import get_settings
 from app.core.logging import setup_logging, logger
-from app.db.postgres import init_db
-from app.db.weaviate import get_weaviate_client
-from app.api import ingest, search, qa
+from app.db.postgres import init_db, AsyncSessionLocal
+from app.db.vector_store import get_vector_store
+from app.core.workers import worker_pool, WorkerPoolSaturated
+from app.core.reranking import rerank_scores
+from app.core.embeddings import warm_up as warm_up_embeddings
+from app.core.context import count_tokens
+from app.core.ingestion import ingestion_queue, IngestQueueFull
+from app.core.metadata_cache import metadata_cache
+from app.api import ingest, search, qa, stats, metrics as metrics_api
+from app.core.metrics import MetricsMiddleware
+from app.core.llm_gateway import LLMUnavailable
 
 settings = get_settings()
 
@@ -17,20 +28,57 @@ async def lifespan(app: FastAPI):
     # Init Postgres
     logger.info("postgres_init")
     await init_db()
+
+    # Warm the document metadata cache so early searches skip the Postgres lookup
+    try:
+        async with AsyncSessionLocal() as db:
+            await metadata_cache.warm(db)
+    except Exception as e:
+        logger.error("metadata_cache_warm_failed", error=str(e))
     
-    # Init Weaviate Schema
+    # Start the CPU worker pool (encoding, PDF parsing, chunking)
+    worker_pool.start()
+
+    # Load the embedding model before serving, so the first query doesn't pay for it
+    try:
+        seconds = await worker_pool.run(warm_up_embeddings)
+        logger.info("embedding_warmup", backend=settings.EMBEDDING_BACKEND, seconds=round(seconds, 2))
+    except Exception as e:
+        logger.error("embedding_warmup_failed", error=str(e))
+
+    # QA context packing counts tokens in this process; load its tokenizer off the event loop
+    if settings.CONTEXT_PACKING_ENABLED:
+        await asyncio.to_thread(count_tokens, "warm up")
+
+    # Load the reranker now so the first queries don't spend their rerank budget on it
+    if settings.RERANK_ENABLED:
+        try:
+            await worker_pool.run(rerank_scores, "warm up", ["warm up"])
+        except Exception as e:
+            logger.error("rerank_warmup_failed", error=str(e))
+
+    # Init the vector store schema (Weaviate, or the in-process index with VECTOR_STORE=local)
     # Note: access weaviate inside docker network
     try:
-        w_client = get_weaviate_client()
-        w_client.init_schema()
-        w_client.close()
+        get_vector_store().open()
+        with get_vector_store().acquire() as store:
+            store.init_schema()
     except Exception as e:
-        logger.error("weaviate_init_failed", error=str(e))
+        logger.error("vector_store_init_failed", backend=settings.VECTOR_STORE, error=str(e))
+        # The local index has no container to wait for (e.g. it is open in another worker): fail startup
+        if settings.VECTOR_STORE == "local":
+            raise
         # Don't crash, might be temporary connection issue or race condition with docker up
+
+    # Start ingestion workers (resumes jobs interrupted by the last shutdown)
+    await ingestion_queue.start()
     
     yield
     # Shutdown
     logger.info("shutdown_event", message="Shutting down application")
+    await ingestion_queue.stop()
+    get_vector_store().close()
+    worker_pool.shutdown()
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
@@ -42,6 +90,22 @@ app = FastAPI(
 app.include_router(ingest.router, prefix=f"{settings.API_V1_STR}/ingest", tags=["Ingest"])
 app.include_router(search.router, prefix=f"{settings.API_V1_STR}/search", tags=["Search"])
 app.include_router(qa.router, prefix=f"{settings.API_V1_STR}/qa", tags=["QA"])
+app.include_router(stats.router, prefix=f"{settings.API_V1_STR}/stats", tags=["Stats"])
+app.include_router(metrics_api.router, prefix="/metrics", tags=["Metrics"])
+
+# End-to-end request latency per route; not installed at all when metrics are disabled
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
+@app.exception_handler(WorkerPoolSaturated)
+@app.exception_handler(IngestQueueFull)
+async def backpressure_handler(request: Request, exc: Exception):
+    return JSONResponse(status_code=429, content={"detail": str(exc)}, headers={"Retry-After": "1"})
+
+@app.exception_handler(LLMUnavailable)
+async def llm_unavailable_handler(request: Request, exc: LLMUnavailable):
+    retry_after = max(1, math.ceil(exc.retry_after))
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": str(retry_after)})
 
 @app.get("/")
 async def root():
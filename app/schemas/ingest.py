@@ -1,14 +1,45 @@
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field
+from typing import Optional, List
 from datetime import datetime
 from uuid import UUID
+from app.core.config import get_settings
 
-class IngestResponse(BaseModel):
+settings = get_settings()
+
+class IngestJobResponse(BaseModel):
+    job_id: UUID
     document_id: UUID
-    chunks_created: int
+    status: str
     message: str
 
+class IngestJobStatus(BaseModel):
+    job_id: UUID
+    document_id: UUID
+    title: Optional[str] = None
+    source: Optional[str] = None
+    status: str
+    stage: Optional[str] = None
+    chunks_total: int
+    chunks_embedded: int
+    chunks_written: int
+    chunks_failed: int
+    chunks_unchanged: int
+    chunks_removed: int
+    chunks_per_second: float
+    stage_seconds: dict[str, float]
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
 class TextIngestRequest(BaseModel):
     title: str
     text: str
     tags: Optional[str] = None
+    source: Optional[str] = None # re-ingesting the same source updates the document in place
+
+class TextBatchIngestRequest(BaseModel):
+    documents: List[TextIngestRequest] = Field(..., min_length=1, max_length=settings.INGEST_BATCH_MAX_DOCUMENTS)
+
+class IngestBatchResponse(BaseModel):
+    jobs: List[IngestJobResponse] # in request order
@@ -1,11 +1,36 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Optional
+from app.core.config import get_settings
 from app.schemas.search import SearchResult
 
+settings = get_settings()
+
 class QARequest(BaseModel):
     question: str
     k: int = 5
 
+class ContextStats(BaseModel):
+    chunks: int # retrieved chunks
+    passages: int # passages in the prompt after merging, dedup and the token budget
+    merged: int # chunks folded into an adjacent chunk of the same document
+    duplicates: int # passages dropped as near-duplicates
+    truncated: bool # the last passage was cut to fit the budget
+    tokens: int # context tokens sent
+    tokens_before: int # context tokens of the verbatim concatenation
+    tokens_saved: int
+
 class QAResponse(BaseModel):
     answer: str
     sources: List[SearchResult]
+    context: Optional[ContextStats] = None # how the prompt context was packed; None for cached answers
+
+class QABatchRequest(BaseModel):
+    questions: List[str] = Field(..., min_length=1, max_length=settings.SEARCH_BATCH_MAX_QUERIES)
+    k: int = 5
+
+class QABatchResponse(BaseModel):
+    answers: List[QAResponse] # in request order
+    questions: int
+    cached: int # answered from the QA cache
+    elapsed_ms: float
+    questions_per_second: float
@@ -1,13 +1,39 @@
-from pydantic import BaseModel
-from typing import Optional, List
+from pydantic import BaseModel, Field
+from typing import Literal, Optional, List
 from uuid import UUID
+from datetime import datetime
+from app.core.config import get_settings
+
+settings = get_settings()
 
 class SearchResult(BaseModel):
     document_id: UUID
+    chunk_id: Optional[UUID] = None
+    chunk_index: Optional[int] = None
     text: str
     score: float
+    rerank_score: Optional[float] = None # cross-encoder relevance, when reranked
     title: Optional[str] = None
     source: Optional[str] = None
 
 class SearchResponse(BaseModel):
     results: List[SearchResult]
+
+class SearchBatchRequest(BaseModel):
+    queries: List[str] = Field(..., min_length=1, max_length=settings.SEARCH_BATCH_MAX_QUERIES)
+    k: int = 5
+    # Same options and filters as GET /search, applied to every query
+    mode: Optional[Literal["vector", "hybrid"]] = None
+    alpha: Optional[float] = Field(None, ge=0.0, le=1.0)
+    fusion: Optional[Literal["relative", "rrf"]] = None
+    tags: Optional[str] = None
+    source: Optional[str] = None
+    uploaded_after: Optional[datetime] = None
+    uploaded_before: Optional[datetime] = None
+    rerank: Optional[bool] = None
+
+class SearchBatchResponse(BaseModel):
+    results: List[SearchResponse] # in request order
+    queries: int
+    elapsed_ms: float
+    queries_per_second: float
@@ -0,0 +1,97 @@
+"""
+Aggregate throughput of one-request-per-query vs. the batch endpoints:
+GET /search (N requests, client concurrency C) vs. POST /search/batch, and
+POST /qa vs. POST /qa/batch, over the labeled queries in benchmarks/data/search_queries.jsonl.
+
+Needs the API running with documents ingested (see benchmarks.search_recall --ingest).
+For QA, point it at the fake LLM and turn the answer cache off so every question hits it:
+
+    python -m benchmarks.fake_groq --port 8089 --first-token-ms 300 --token-ms 5
+    GROQ_BASE_URL=http://127.0.0.1:8089 QA_CACHE_ENABLED=false uvicorn app.main:app
+    python -m benchmarks.batch_api --url http://localhost:8000 --queries 256 --concurrency 8 --batch-size 64
+"""
+import argparse
+import asyncio
+import json
+import time
+import httpx
+from benchmarks.common import summarize, print_table
+from benchmarks.search_recall import QUERIES
+
+
+async def single(client: httpx.AsyncClient, questions: list[str], concurrency: int, qa: bool) -> list[float]:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(question: str):
+        async with semaphore:
+            start = time.perf_counter()
+            if qa:
+                response = await client.post("/api/v1/qa", json={"question": question, "k": 3})
+            else:
+                response = await client.get("/api/v1/search/", params={"q": question, "k": 3})
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(one(q) for q in questions))
+    return latencies
+
+
+async def batched(client: httpx.AsyncClient, questions: list[str], batch_size: int, qa: bool) -> list[float]:
+    latencies = []
+    for offset in range(0, len(questions), batch_size):
+        part = questions[offset:offset + batch_size]
+        start = time.perf_counter()
+        if qa:
+            response = await client.post("/api/v1/qa/batch", json={"questions": part, "k": 3})
+        else:
+            response = await client.post("/api/v1/search/batch", json={"queries": part, "k": 3})
+        response.raise_for_status()
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+async def run(args, questions: list[str]) -> list[dict]:
+    rows = []
+    async with httpx.AsyncClient(base_url=args.url, timeout=600) as client:
+        (await client.get("/api/v1/search/", params={"q": "warm up", "k": 3})).raise_for_status()
+        for endpoint, qa in (("search", False), ("qa", True)):
+            if qa and args.skip_qa:
+                continue
+            for run_id, (label, call, arg) in enumerate((
+                (f"{endpoint} x{len(questions)} (c={args.concurrency})", single, args.concurrency),
+                (f"{endpoint}/batch ({args.batch_size}/request)", batched, args.batch_size),
+            )):
+                # Fresh texts per run so the embedding cache doesn't favour the later one
+                texts = [f"{q} [{endpoint}{run_id}]" for q in questions]
+                start = time.perf_counter()
+                latencies = await call(client, texts, arg, qa)
+                elapsed = time.perf_counter() - start
+                summary = summarize(latencies)
+                rows.append({
+                    "mode": label,
+                    "queries_per_s": round(len(questions) / elapsed, 1),
+                    "requests": summary["n"],
+                    "request_p50_ms": summary["p50_ms"],
+                    "request_p95_ms": summary["p95_ms"],
+                })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--queries", type=int, default=256)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--skip-qa", action="store_true")
+    args = parser.parse_args()
+
+    with open(QUERIES) as f:
+        labeled = [json.loads(line)["query"] for line in f if line.strip()]
+    questions = [f"{labeled[i % len(labeled)]} ({i})" for i in range(args.queries)]
+    print_table(asyncio.run(run(args, questions)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Ingest throughput (chunks/sec): one insert per chunk vs. insert_chunks at several batch sizes.
+
+    WEAVIATE_URL=http://localhost:8080 python -m benchmarks.bulk_insert --chunks 2000 --batch-sizes 50,100,200,500
+"""
+import argparse
+import random
+import time
+import uuid
+import weaviate
+from app.db.weaviate import WeaviatePool
+from benchmarks.common import print_table
+
+DIM = 384
+
+
+def make_chunks(n: int, document_id: str) -> list[dict]:
+    return [
+        {
+            "text": f"synthetic chunk {i} " + "lorem ipsum " * 40,
+            "vector": [random.uniform(-1, 1) for _ in range(DIM)],
+            "document_id": document_id,
+            "chunk_index": i,
+        }
+        for i in range(n)
+    ]
+
+
+def delete_document(client, document_id: str):
+    client.client.collections.get("Chunk").data.delete_many(
+        where=weaviate.classes.query.Filter.by_property("document_id").equal(document_id)
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--batch-sizes", default="50,100,200,500")
+    parser.add_argument("--concurrency", type=int, default=2)
+    args = parser.parse_args()
+
+    pool = WeaviatePool(size=1)
+    rows = []
+    with pool.acquire() as client:
+        client.init_schema()
+
+        doc_id = str(uuid.uuid4())
+        chunks = make_chunks(args.chunks, doc_id)
+        start = time.perf_counter()
+        for c in chunks:
+            client.insert_chunk(chunk_text=c["text"], vector=c["vector"], document_id=doc_id, chunk_index=c["chunk_index"])
+        elapsed = time.perf_counter() - start
+        rows.append({"mode": "insert_chunk", "batch_size": 1, "chunks_per_s": round(args.chunks / elapsed, 1), "errors": 0})
+        delete_document(client, doc_id)
+
+        for size in (int(s) for s in args.batch_sizes.split(",")):
+            doc_id = str(uuid.uuid4())
+            chunks = make_chunks(args.chunks, doc_id)
+            start = time.perf_counter()
+            errors = client.insert_chunks(chunks, batch_size=size, concurrent_requests=args.concurrency)
+            elapsed = time.perf_counter() - start
+            rows.append({"mode": "insert_chunks", "batch_size": size, "chunks_per_s": round(args.chunks / elapsed, 1), "errors": len(errors)})
+            delete_document(client, doc_id)
+    pool.close()
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
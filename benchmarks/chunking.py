@@ -0,0 +1,117 @@
+"""
+Chunking engines: the legacy 500/100 word window vs. the token-aware, structure-aware
+TokenChunker. Reports throughput (chunks/s and MB/s, feeding text in ingestion-sized
+blocks), chunk sizes in model tokens, the share of tokens beyond max_seq_length (never
+embedded), and in-process retrieval recall on the labeled queries in
+benchmarks/data/search_queries.jsonl.
+
+Recall is measured on two corpora: each sample_docs file chunked on its own (as ingested),
+and all of them concatenated into one long "handbook" document, where a chunk counts
+for the file most of it came from.
+
+    python -m benchmarks.chunking --k 3 --repeat 200
+"""
+import argparse
+import bisect
+import json
+import os
+import time
+import numpy as np
+from app.core.chunking import StreamingChunker, TokenChunker
+from app.core.config import get_settings
+from app.core.embeddings import embedding_service, load_tokenizer
+from benchmarks.common import print_table
+from benchmarks.search_recall import QUERIES
+
+settings = get_settings()
+
+
+def load_docs(docs: str) -> dict[str, str]:
+    out = {}
+    for name in sorted(os.listdir(docs)):
+        if name.endswith(".txt"):
+            with open(os.path.join(docs, name), encoding="utf-8") as f:
+                out[name] = f.read()
+    return out
+
+
+def chunk(chunker, text: str, block: int) -> list[str]:
+    chunks = []
+    for start in range(0, len(text), block):
+        chunks += chunker.feed(text[start:start + block])
+    return chunks + chunker.flush()
+
+
+def handbook_chunks(make, docs: dict[str, str], block: int) -> list[tuple[str, str]]:
+    """Chunk the concatenated corpus; label each chunk with the file at its midpoint."""
+    text = "\n\n".join(docs.values())
+    flat, starts, sources, position = "", [], [], 0
+    for name, body in docs.items():
+        starts.append(len(flat))
+        sources.append(name)
+        flat += " ".join(body.split()) + " "
+    labeled = []
+    for c in chunk(make(), text, block):
+        normalized = " ".join(c.split())
+        found = flat.find(normalized[:80], position)
+        if found < 0:
+            found = flat.find(normalized[:80])
+        position = max(found, 0)
+        labeled.append((c, sources[bisect.bisect_right(starts, position + len(normalized) // 2) - 1]))
+    return labeled
+
+
+def recall(labeled: list[tuple[str, str]], queries: list[dict], k: int) -> dict:
+    vectors = np.array(embedding_service.embed_documents([c for c, _ in labeled]), dtype=np.float32)
+    hits, reciprocal_ranks = 0, 0.0
+    for q in queries:
+        query_vector = np.array(embedding_service.embed_text(q["query"]), dtype=np.float32)
+        top = np.argsort(-(vectors @ query_vector))[:k]
+        ranks = [i for i, row in enumerate(top) if labeled[row][1] in q["relevant"]]
+        if ranks:
+            hits += 1
+            reciprocal_ranks += 1 / (ranks[0] + 1)
+    return {f"recall@{k}": round(hits / len(queries), 3), "mrr": round(reciprocal_ranks / len(queries), 3)}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", default="sample_docs")
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=200, help="copies of the corpus in the throughput run")
+    parser.add_argument("--overlap", type=int, default=settings.CHUNK_OVERLAP_TOKENS)
+    args = parser.parse_args()
+
+    docs = load_docs(args.docs)
+    with open(QUERIES) as f:
+        queries = [json.loads(line) for line in f if line.strip()]
+    tokenizer, max_seq_length = load_tokenizer(embedding_service.model_name)
+    engines = {
+        "words 500/100": lambda: StreamingChunker(),
+        f"tokens {max_seq_length}/{args.overlap}": lambda: TokenChunker(tokenizer, max_seq_length, args.overlap),
+    }
+    block = settings.INGEST_TEXT_BLOCK_SIZE
+    big = "\n\n".join(docs.values()) * args.repeat
+
+    rows = []
+    for name, make in engines.items():
+        started = time.perf_counter()
+        produced = chunk(make(), big, block)
+        elapsed = time.perf_counter() - started
+        lengths = np.array([len(e.ids) for e in tokenizer.encode_batch(produced)])
+        row = {
+            "chunker": name,
+            "chunks_per_s": round(len(produced) / elapsed, 1),
+            "mb_per_s": round(len(big) / 1e6 / elapsed, 2),
+            "mean_tokens": round(float(lengths.mean()), 1),
+            "max_tokens": int(lengths.max()),
+            "truncated_pct": round(100 * float(np.clip(lengths - max_seq_length, 0, None).sum() / lengths.sum()), 1),
+        }
+        per_document = [(c, source) for source, text in docs.items() for c in chunk(make(), text, block)]
+        for corpus, labeled in (("per-doc", per_document), ("handbook", handbook_chunks(make, docs, block))):
+            rows.append({**row, "corpus": corpus, "chunks": len(labeled), **recall(labeled, queries, args.k)})
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+"""
+Shared helpers for the benchmark scripts.
+Benchmarks talk to local stand-ins (the docker-compose Weaviate/Postgres containers,
+or the fakes in this package), e.g.:
+
+    docker-compose up -d weaviate postgres
+    WEAVIATE_URL=http://localhost:8080 POSTGRES_HOST=localhost python -m benchmarks.weaviate_pool
+"""
+import statistics
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    idx = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+def summarize(samples: list[float]) -> dict:
+    """Latency summary in milliseconds for a list of durations in seconds."""
+    ms = [s * 1000 for s in samples]
+    return {
+        "n": len(ms),
+        "mean_ms": round(statistics.fmean(ms), 3) if ms else 0.0,
+        "p50_ms": round(percentile(ms, 50), 3),
+        "p95_ms": round(percentile(ms, 95), 3),
+        "p99_ms": round(percentile(ms, 99), 3),
+    }
+
+
+def print_table(rows: list[dict]):
+    if not rows:
+        return
+    headers = []
+    for r in rows:
+        headers += [h for h in r if h not in headers]
+    widths = [max(len(str(h)), *(len(str(r.get(h, ""))) for r in rows)) for h in headers]
+    print("  ".join(str(h).ljust(w) for h, w in zip(headers, widths)))
+    for r in rows:
+        print("  ".join(str(r.get(h, "")).ljust(w) for h, w in zip(headers, widths)))
@@ -0,0 +1,103 @@
+"""
+QA prompt context size with and without context packing (adjacent chunk merging,
+near-duplicate collapse, token budget), over the labeled queries in
+benchmarks/data/search_queries.jsonl retrieved in process from the sample_docs corpus.
+--copies ingests every file that many times under different document ids, as happens
+when the same policy is uploaded from several sources. Reports prompt tokens per
+question, tokens saved, passages kept, packing time, and whether a relevant file is
+still in the packed context.
+
+    python -m benchmarks.context_packing --k 8 --copies 2 --max-tokens 3000
+"""
+import argparse
+import json
+import time
+import uuid
+import numpy as np
+from app.core.chunking import StreamingChunker, TokenChunker
+from app.core.config import get_settings
+from app.core.context import ContextPacker
+from app.core.embeddings import embedding_service, load_tokenizer
+from app.schemas.search import SearchResult
+from benchmarks.chunking import chunk, load_docs
+from benchmarks.common import summarize, print_table
+from benchmarks.search_recall import QUERIES
+
+settings = get_settings()
+
+
+def corpus(make, docs: dict[str, str], copies: int) -> list[SearchResult]:
+    chunks = []
+    for name, text in docs.items():
+        pieces = chunk(make(), text, settings.INGEST_TEXT_BLOCK_SIZE)
+        for _ in range(copies):
+            document_id = uuid.uuid4()
+            chunks += [
+                SearchResult(document_id=document_id, chunk_index=i, text=piece, score=0.0, title=name)
+                for i, piece in enumerate(pieces)
+            ]
+    return chunks
+
+
+def run(chunks: list[SearchResult], queries: list[dict], k: int, packers: dict) -> list[dict]:
+    vectors = np.array(embedding_service.embed_documents([c.text for c in chunks]), dtype=np.float32)
+    stats = {name: [] for name in packers}
+    timings = {name: [] for name in packers}
+    found = {name: 0 for name in packers}
+    for q in queries:
+        query_vector = np.array(embedding_service.embed_text(q["query"]), dtype=np.float32)
+        scores = vectors @ query_vector
+        results = [chunks[i].model_copy(update={"score": float(scores[i])}) for i in np.argsort(-scores)[:k]]
+        for name, packer in packers.items():
+            started = time.perf_counter()
+            context, s = packer.pack(results)
+            timings[name].append(time.perf_counter() - started)
+            stats[name].append(s)
+            found[name] += any(f"Document: {source}\n" in context for source in q["relevant"])
+    rows = []
+    for name, packed in stats.items():
+        before = sum(s.tokens_before for s in packed)
+        sent = sum(s.tokens for s in packed)
+        rows.append({
+            "context": name,
+            "tokens_per_q": round(sent / len(packed), 1),
+            "saved_pct": round(100 * (before - sent) / before, 1) if before else 0.0,
+            "passages": round(sum(s.passages for s in packed) / len(packed), 2),
+            "merged": sum(s.merged for s in packed),
+            "duplicates": sum(s.duplicates for s in packed),
+            "truncated": sum(s.truncated for s in packed),
+            "relevant_in_context": round(found[name] / len(queries), 3),
+            "pack_p50_ms": summarize(timings[name])["p50_ms"],
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", default="sample_docs")
+    parser.add_argument("--k", type=int, default=8)
+    parser.add_argument("--copies", type=int, default=2)
+    parser.add_argument("--max-tokens", type=int, default=settings.CONTEXT_MAX_TOKENS)
+    args = parser.parse_args()
+
+    docs = load_docs(args.docs)
+    with open(QUERIES) as f:
+        queries = [json.loads(line) for line in f if line.strip()]
+    tokenizer, max_seq_length = load_tokenizer(embedding_service.model_name)
+    packers = {
+        "verbatim": ContextPacker(enabled=False),
+        f"packed ({args.max_tokens} tokens)": ContextPacker(max_tokens=args.max_tokens, enabled=True),
+    }
+    rows = []
+    for chunker, make in (
+        ("words 500/100", lambda: StreamingChunker()),
+        (f"tokens {max_seq_length}/{settings.CHUNK_OVERLAP_TOKENS}",
+         lambda: TokenChunker(tokenizer, max_seq_length, settings.CHUNK_OVERLAP_TOKENS)),
+    ):
+        for row in run(corpus(make, docs, args.copies), queries, args.k, packers):
+            rows.append({"chunker": chunker, **row})
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
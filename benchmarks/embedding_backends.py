@@ -0,0 +1,105 @@
+"""
+Embedding backends: startup time (import + model load + first encode), RSS and encode
+throughput for sentence-transformers on torch vs. onnxruntime (fp32 and int8), on chunks
+of sample_docs. Each backend runs in a fresh subprocess so imports and ru_maxrss are not
+shared. Also checks parity: cosine similarity of each backend's vectors against torch's.
+
+    python -m benchmarks.embedding_backends
+    python -m benchmarks.embedding_backends --backends torch,onnx --check 0.99   # exits 1 below the threshold
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+from benchmarks.common import print_table
+
+BACKENDS = {
+    "torch": {"EMBEDDING_BACKEND": "torch"},
+    "onnx": {"EMBEDDING_BACKEND": "onnx", "EMBEDDING_ONNX_FILE": "onnx/model.onnx"},
+    "onnx-int8": {"EMBEDDING_BACKEND": "onnx", "EMBEDDING_ONNX_FILE": "onnx/model_quint8_avx2.onnx"},
+}
+
+
+def load_texts(docs: str, limit: int) -> list[str]:
+    from app.core.chunking import chunk_text
+    texts = []
+    for name in sorted(os.listdir(docs)):
+        if name.endswith(".txt"):
+            with open(os.path.join(docs, name)) as f:
+                texts += chunk_text(f.read())
+    return texts[:limit]
+
+
+def child(texts_path: str, vectors_path: str, rounds: int):
+    with open(texts_path) as f:
+        texts = json.load(f)
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    started = time.perf_counter()
+    from app.core.embeddings import embedding_service, warm_up
+    warm_up()
+    startup = time.perf_counter() - started
+
+    # Encode through the model directly so the embedding cache is not measured
+    model = embedding_service.model
+    started = time.perf_counter()
+    for _ in range(rounds):
+        vectors = model.encode(texts)
+    elapsed = time.perf_counter() - started
+    np.save(vectors_path, np.asarray(vectors, dtype=np.float32))
+    print(json.dumps({
+        "startup_s": round(startup, 2),
+        "texts_per_s": round(len(texts) * rounds / elapsed, 1),
+        "rss_mb": round((resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - baseline) / 1024, 1),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", default="sample_docs")
+    parser.add_argument("--texts", type=int, default=256)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--backends", default="torch,onnx,onnx-int8")
+    parser.add_argument("--check", type=float, help="fail if any backend's min cosine vs. torch is below this")
+    parser.add_argument("--child", nargs=2, metavar=("TEXTS", "VECTORS"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        return child(*args.child, args.rounds)
+
+    backends = args.backends.split(",")
+    if "torch" not in backends:
+        backends.insert(0, "torch")  # the parity reference
+    rows, vectors = [], {}
+    with tempfile.TemporaryDirectory() as tmp:
+        texts_path = os.path.join(tmp, "texts.json")
+        with open(texts_path, "w") as f:
+            json.dump(load_texts(args.docs, args.texts), f)
+        for backend in backends:
+            vectors_path = os.path.join(tmp, f"{backend}.npy")
+            out = subprocess.run(
+                [sys.executable, "-m", "benchmarks.embedding_backends", "--rounds", str(args.rounds),
+                 "--child", texts_path, vectors_path],
+                env={**os.environ, **BACKENDS[backend], "EMBEDDING_CACHE_PATH": ""},
+                check=True, capture_output=True, text=True
+            ).stdout
+            rows.append({"backend": backend, **json.loads(out.strip().splitlines()[-1])})
+            vectors[backend] = np.load(vectors_path)
+
+    failed = False
+    for row in rows:
+        # Vectors are L2-normalized, so the row-wise dot product is the cosine similarity
+        cosine = (vectors[row["backend"]] * vectors["torch"]).sum(axis=1)
+        row["cos_min"] = round(float(cosine.min()), 4)
+        row["cos_mean"] = round(float(cosine.mean()), 4)
+        failed |= args.check is not None and row["cos_min"] < args.check
+    print_table(rows)
+    if failed:
+        raise SystemExit(f"parity check failed: min cosine below {args.check}")
+
+
+if __name__ == "__main__":
+    main()
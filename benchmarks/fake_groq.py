@@ -0,0 +1,153 @@
+"""
+Local stand-in for the Groq chat completions API (OpenAI-compatible), with
+configurable latency and injected faults: a requests-per-second quota answered with
+429 + Retry-After, random 500s, models that always fail, a slow tail and per-model
+latency. Point the app at it with GROQ_BASE_URL=http://127.0.0.1:<port>.
+
+    python -m benchmarks.fake_groq --port 8089 --first-token-ms 400 --token-ms 20 \\
+        --quota-rps 5 --error-rate 0.02 --slow-rate 0.05 --slow-factor 10
+"""
+import argparse
+import asyncio
+import json
+import random
+import socket
+import threading
+import time
+import uuid
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+ANSWER = (
+    "Employees receive 12 days of sick leave per calendar year. Unused sick leave does not "
+    "carry over, and absences longer than three days require a medical certificate."
+)
+
+
+def create_app(first_token_ms: float = 400, token_ms: float = 20, answer: str = ANSWER,
+               quota_rps: float = 0.0, error_rate: float = 0.0, failing_models: tuple = (),
+               slow_rate: float = 0.0, slow_factor: float = 10.0, model_latency: dict = None) -> FastAPI:
+    """
+    quota_rps: requests per second (burst of the same size) before answering 429 with the
+    Retry-After until the next free slot. error_rate: share of requests failing with 500;
+    models in failing_models always do. slow_rate: share of requests slow_factor times
+    slower. model_latency: latency multiplier per model name.
+    Every request is logged in app.state.log as {"at" (time.monotonic()), "model", "status",
+    "retry_after"}, in arrival order.
+    """
+    app = FastAPI()
+    tokens = [w + " " for w in answer.split()]
+    quota = {"level": quota_rps, "updated": time.monotonic()}
+    app.state.requests = {"ok": 0, "rate_limited": 0, "errors": 0}
+    app.state.log = []
+
+    def record(model: str, status: int, retry_after: float = None):
+        app.state.log.append({"at": time.monotonic(), "model": model, "status": status, "retry_after": retry_after})
+
+    def fault(model: str):
+        if quota_rps > 0:
+            now = time.monotonic()
+            quota["level"] = min(quota_rps, quota["level"] + (now - quota["updated"]) * quota_rps)
+            quota["updated"] = now
+            if quota["level"] < 1:
+                app.state.requests["rate_limited"] += 1
+                retry_after = (1 - quota["level"]) / quota_rps
+                record(model, 429, round(retry_after, 3))
+                return JSONResponse(
+                    {"error": {"message": "Rate limit reached", "type": "tokens", "code": "rate_limit_exceeded"}},
+                    status_code=429, headers={"retry-after": f"{retry_after:.3f}"}
+                )
+            quota["level"] -= 1
+        if model in failing_models or random.random() < error_rate:
+            app.state.requests["errors"] += 1
+            record(model, 500)
+            return JSONResponse({"error": {"message": "Internal server error", "type": "internal_server_error"}}, status_code=500)
+        app.state.requests["ok"] += 1
+        record(model, 200)
+        return None
+
+    def scale(model: str) -> float:
+        factor = (model_latency or {}).get(model, 1.0)
+        if slow_rate and random.random() < slow_rate:
+            factor *= slow_factor
+        return factor
+
+    def usage(body):
+        prompt_tokens = sum(len(m["content"].split()) for m in body["messages"])
+        return {"prompt_tokens": prompt_tokens, "completion_tokens": len(tokens), "total_tokens": prompt_tokens + len(tokens)}
+
+    @app.post("/openai/v1/chat/completions")
+    async def completions(request: Request):
+        body = await request.json()
+        created = int(time.time())
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        error = fault(body["model"])
+        if error is not None:
+            return error
+        factor = scale(body["model"])
+
+        if not body.get("stream"):
+            await asyncio.sleep(factor * (first_token_ms + token_ms * len(tokens)) / 1000)
+            return JSONResponse({
+                "id": completion_id, "object": "chat.completion", "created": created, "model": body["model"],
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": answer}, "finish_reason": "stop"}],
+                "usage": usage(body),
+            })
+
+        async def chunks():
+            await asyncio.sleep(factor * first_token_ms / 1000)
+            for i, token in enumerate(tokens):
+                if i:
+                    await asyncio.sleep(factor * token_ms / 1000)
+                chunk = {
+                    "id": completion_id, "object": "chat.completion.chunk", "created": created, "model": body["model"],
+                    "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}],
+                }
+                yield f"data: {json.dumps(chunk)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(chunks(), media_type="text/event-stream")
+
+    return app
+
+
+class FakeGroqServer:
+    """Runs the fake API on a background thread: `with FakeGroqServer() as server: server.base_url`."""
+    def __init__(self, app: FastAPI = None, port: int = 0, **kwargs):
+        self.app = app or create_app(**kwargs)
+        if not port:
+            with socket.socket() as s:
+                s.bind(("127.0.0.1", 0))
+                port = s.getsockname()[1]
+        self.port = port
+        self.base_url = f"http://127.0.0.1:{port}"
+        self._server = uvicorn.Server(uvicorn.Config(self.app, host="127.0.0.1", port=port, log_level="warning"))
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        while not self._server.started:
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc):
+        self._server.should_exit = True
+        self._thread.join()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--first-token-ms", type=float, default=400)
+    parser.add_argument("--token-ms", type=float, default=20)
+    parser.add_argument("--quota-rps", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--slow-rate", type=float, default=0.0)
+    parser.add_argument("--slow-factor", type=float, default=10.0)
+    args = parser.parse_args()
+    app = create_app(
+        args.first_token_ms, args.token_ms, quota_rps=args.quota_rps, error_rate=args.error_rate,
+        slow_rate=args.slow_rate, slow_factor=args.slow_factor
+    )
+    uvicorn.run(app, host="127.0.0.1", port=args.port)
@@ -0,0 +1,116 @@
+"""
+Peak RSS of parse + chunk on a large synthetic PDF: whole-document ingest (read upload,
+concatenate page text, split everything) vs. the streaming page-incremental pipeline.
+Each mode runs in a fresh subprocess so ru_maxrss is not shared.
+
+    python -m benchmarks.ingest_memory --pages 2000 --batch-size 64
+"""
+import argparse
+import io
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from benchmarks.common import print_table
+
+WORDS = "policy employee leave manager approval request days annual office remote travel expense".split()
+
+
+def write_synthetic_pdf(path: str, pages: int, lines_per_page: int = 45):
+    """Minimal PDF writer: one Helvetica text stream per page, written incrementally."""
+    offsets = []
+    with open(path, "wb") as f:
+        def obj(num: int, body: bytes):
+            offsets.append((num, f.tell()))
+            f.write(f"{num} 0 obj\n".encode() + body + b"\nendobj\n")
+
+        f.write(b"%PDF-1.4\n")
+        page_ids = [4 + 2 * i for i in range(pages)]
+        obj(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+        kids = " ".join(f"{p} 0 R" for p in page_ids).encode()
+        obj(2, b"<< /Type /Pages /Kids [" + kids + b"] /Count " + str(pages).encode() + b" >>")
+        obj(3, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+        rng = random.Random(0)
+        for page_id in page_ids:
+            lines = [" ".join(rng.choices(WORDS, k=12)) for _ in range(lines_per_page)]
+            text = b"BT /F1 10 Tf 40 800 Td 14 TL " + b" ".join(f"({line}) '".encode() for line in lines) + b" ET"
+            obj(page_id, b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] /Resources << /Font << /F1 3 0 R >> >> /Contents "
+                + str(page_id + 1).encode() + b" 0 R >>")
+            obj(page_id + 1, b"<< /Length " + str(len(text)).encode() + b" >>\nstream\n" + text + b"\nendstream")
+        xref = f.tell()
+        size = 4 + 2 * pages
+        f.write(f"xref\n0 {size}\n0000000000 65535 f \n".encode())
+        by_num = dict(offsets)
+        for num in range(1, size):
+            f.write(f"{by_num[num]:010d} 00000 n \n".encode())
+        f.write(f"trailer\n<< /Size {size} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode())
+
+
+def run_whole_document(path: str, batch_size: int) -> int:
+    import pypdf
+    from app.core.chunking import chunk_text
+    with open(path, "rb") as f:
+        content = f.read()
+    text = ""
+    for page in pypdf.PdfReader(io.BytesIO(content)).pages:
+        text += page.extract_text() + "\n"
+    return len(chunk_text(text))
+
+
+def run_streaming(path: str, batch_size: int) -> int:
+    from app.core.chunking import StreamingChunker
+    from app.core.parsing import extract_pdf_pages
+    chunker, ready, produced, start, total = StreamingChunker(), [], 0, 0, None
+    while total is None or start < total:
+        pages, total = extract_pdf_pages(path, start, start + 8)
+        start += 8
+        for page in pages:
+            ready.extend(chunker.feed(page))
+            while len(ready) >= batch_size:
+                produced += batch_size  # a batch would be embedded and written here
+                del ready[:batch_size]
+    return produced + len(ready) + len(chunker.flush())
+
+
+def child(mode: str, path: str, batch_size: int):
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    started = time.perf_counter()
+    chunks = {"whole_document": run_whole_document, "streaming": run_streaming}[mode](path, batch_size)
+    print(json.dumps({
+        "mode": mode,
+        "chunks": chunks,
+        "seconds": round(time.perf_counter() - started, 2),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "rss_growth_mb": round((resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - baseline) / 1024, 1),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--child", nargs=2, metavar=("MODE", "PATH"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        return child(args.child[0], args.child[1], args.batch_size)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "synthetic.pdf")
+        write_synthetic_pdf(path, args.pages)
+        print(f"synthetic PDF: {args.pages} pages, {os.path.getsize(path) / 1e6:.1f} MB")
+        rows = []
+        for mode in ("whole_document", "streaming"):
+            out = subprocess.run(
+                [sys.executable, "-m", "benchmarks.ingest_memory", "--batch-size", str(args.batch_size), "--child", mode, path],
+                check=True, capture_output=True, text=True
+            ).stdout
+            rows.append(json.loads(out.strip().splitlines()[-1]))
+        print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+Ingestion throughput in documents/sec against Postgres: --documents small text documents
+(paragraphs of sample_docs) submitted one per POST /ingest/text (--concurrency at a time)
+and in POST /ingest/batch requests of --batch-size. Reports how fast the API accepts
+them, end-to-end documents/sec until every job has finished, and the SQL statements
+Postgres executed per document.
+
+The app runs in process on a temporary local index (Postgres is the shared part being
+measured); rows created by the run are deleted afterwards.
+
+    docker-compose up -d postgres
+    POSTGRES_HOST=localhost python -m benchmarks.ingest_throughput --documents 2000 --batch-size 100
+"""
+import argparse
+import asyncio
+import contextlib
+import os
+import random
+import tempfile
+import time
+import uuid
+import httpx
+from benchmarks.common import print_table
+from benchmarks.load_test import load_docs
+
+API = "/api/v1"
+
+
+def make_documents(docs: dict[str, str], count: int, run_id: str, label: str) -> list[dict]:
+    paragraphs = [p for text in docs.values() for p in text.split("\n\n") if p.strip()]
+    rng = random.Random(0)
+    return [
+        {
+            "title": f"Document {i}",
+            "text": "\n\n".join(rng.sample(paragraphs, min(3, len(paragraphs)))),
+            "tags": ",".join(rng.sample(["hr", "policy", "it", "finance", "travel", "security"], 2)),
+            "source": f"ingestbench/{run_id}/{label}/{i}",
+        }
+        for i in range(count)
+    ]
+
+
+class StatementCounter:
+    """Counts SQL statements sent by the app's engine."""
+    def __init__(self):
+        from sqlalchemy import event
+        from app.db.postgres import engine
+        self.count = 0
+        event.listen(engine.sync_engine, "before_cursor_execute", self._count)
+
+    def _count(self, *args):
+        self.count += 1
+
+
+async def wait_finished(prefix: str, expected: int, timeout: float = 600) -> int:
+    from sqlalchemy import func, select
+    from app.db.models import IngestionJob
+    from app.db.postgres import AsyncSessionLocal
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        async with AsyncSessionLocal() as db:
+            rows = dict((await db.execute(
+                select(IngestionJob.status, func.count())
+                .where(IngestionJob.source.like(f"{prefix}%"))
+                .group_by(IngestionJob.status)
+            )).tuples().all())
+        if rows.get("completed", 0) + rows.get("failed", 0) >= expected:
+            return rows.get("failed", 0)
+        await asyncio.sleep(0.05)
+    raise TimeoutError(f"ingestion jobs under {prefix} not finished after {timeout}s")
+
+
+async def run(client: httpx.AsyncClient, counter: StatementCounter, mode: str, documents: list[dict],
+              concurrency: int, batch_size: int, prefix: str) -> dict:
+    statements = counter.count
+    started = time.perf_counter()
+    if mode == "batch":
+        for offset in range(0, len(documents), batch_size):
+            response = await client.post(f"{API}/ingest/batch", json={"documents": documents[offset:offset + batch_size]})
+            response.raise_for_status()
+    else:
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def submit(document):
+            async with semaphore:
+                (await client.post(f"{API}/ingest/text", json=document)).raise_for_status()
+
+        await asyncio.gather(*(submit(d) for d in documents))
+    accepted = time.perf_counter() - started
+    failed = await wait_finished(prefix, len(documents))
+    elapsed = time.perf_counter() - started
+    return {
+        "submit": mode if mode != "batch" else f"batch of {batch_size}",
+        "documents": len(documents),
+        "failed": failed,
+        "accepted_per_s": round(len(documents) / accepted, 1),
+        "ingested_per_s": round(len(documents) / elapsed, 1),
+        "seconds": round(elapsed, 2),
+        # Includes the polling queries of this benchmark (a few per 50 ms)
+        "sql_per_doc": round((counter.count - statements) / len(documents), 1),
+    }
+
+
+async def cleanup(run_id: str):
+    from sqlalchemy import delete
+    from app.db.models import DocumentMetadata, IngestionJob
+    from app.db.postgres import AsyncSessionLocal
+    async with AsyncSessionLocal() as db:
+        for model in (IngestionJob, DocumentMetadata):
+            await db.execute(delete(model).where(model.source.like(f"ingestbench/{run_id}/%")))
+        await db.commit()
+
+
+@contextlib.asynccontextmanager
+async def in_process_client():
+    with tempfile.TemporaryDirectory() as index:
+        # Settings are read at import, so the local index is configured before the app is imported
+        os.environ.update({"VECTOR_STORE": "local", "LOCAL_INDEX_PATH": index})
+        os.environ.setdefault("GROQ_API_KEY", "ingest-benchmark")
+        os.environ.setdefault("LOG_LEVEL", "WARNING")
+        from app.main import app
+        async with app.router.lifespan_context(app):
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://ingest-benchmark", timeout=120) as client:
+                yield client
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", default="sample_docs")
+    parser.add_argument("--documents", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=16, help="in-flight /ingest/text requests")
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--modes", default="single,batch")
+    args = parser.parse_args()
+
+    docs = load_docs(args.docs)
+    run_id = uuid.uuid4().hex[:8]
+    # Documents may wait for ingestion workers; the queue must hold a whole run
+    os.environ.setdefault("INGEST_MAX_PENDING", str(args.documents + args.batch_size))
+    rows = []
+    async with in_process_client() as client:
+        counter = StatementCounter()
+        try:
+            for mode in args.modes.split(","):
+                documents = make_documents(docs, args.documents, run_id, mode)
+                prefix = f"ingestbench/{run_id}/{mode}/"
+                rows.append(await run(client, counter, mode, documents, args.concurrency, args.batch_size, prefix))
+        finally:
+            await cleanup(run_id)
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
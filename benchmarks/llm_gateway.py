@@ -0,0 +1,124 @@
+"""
+LLM gateway policies against the fake Groq server with injected faults:
+
+- rate limit burst: more concurrent questions than the quota (--quota-rps, answered
+  with 429 + Retry-After) with no retries, with retries, and with the client-side
+  token bucket sized to the quota,
+- slow tail: --slow-rate of primary calls are --slow-factor times slower, without and
+  with hedging to the fallback model at the p90 primary latency (above the share of slow
+  calls; at p95 with 5% slow calls the percentile is as often a slow call as not). The
+  hedged variant first makes --hedge-warmup calls, not measured, so the percentile is
+  known from the start instead of after LLM_HEDGE_MIN_SAMPLES calls,
+- outage: every primary call fails with 500, without and with a fallback model
+  (the circuit breaker opens and stops spending retries on the primary).
+
+Reports answered vs. unavailable calls, latency of the answered ones and what the
+gateway did (retries, 429s, hedges).
+
+    python -m benchmarks.llm_gateway --calls 200 --concurrency 20 --quota-rps 10
+"""
+import argparse
+import asyncio
+import os
+import time
+from benchmarks.common import summarize, print_table
+from benchmarks.fake_groq import FakeGroqServer, create_app
+
+PRIMARY, FALLBACK = "primary-model", "fallback-model"
+
+
+async def drive(client, calls: int, concurrency: int) -> tuple[list[float], int, float]:
+    from app.core.llm_gateway import LLMUnavailable
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, unavailable = [], 0
+
+    async def one():
+        nonlocal unavailable
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                await client.generate(system_content="system", user_content="question")
+            except LLMUnavailable:
+                unavailable += 1
+                return
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(calls)))
+    return latencies, unavailable, time.perf_counter() - start
+
+
+async def scenario(name: str, app_options: dict, variants: dict, calls: int, concurrency: int,
+                   hedge_warmup: int = 0) -> list[dict]:
+    from app.core.llm import LLMClient
+    from app.core.llm_gateway import LLMGateway
+    rows = []
+    for variant, options in variants.items():
+        app = create_app(**app_options)
+        with FakeGroqServer(app=app) as server:
+            # Slots above the client concurrency, so hedges are never skipped for lack of one
+            gateway = LLMGateway(model=PRIMARY, **{
+                "fallback_model": "", "timeout": 30, "max_concurrency": 2 * concurrency, **options
+            })
+            client = LLMClient(gateway=gateway, base_url=server.base_url)
+            if gateway.hedge:
+                # Hedging waits for hedge_min_samples primary latencies; a fuller window gives a steadier percentile
+                await drive(client, max(hedge_warmup, gateway.hedge_min_samples), concurrency)
+                gateway.counts = dict.fromkeys(gateway.counts, 0)
+                app.state.requests = dict.fromkeys(app.state.requests, 0)
+            latencies, unavailable, elapsed = await drive(client, calls, concurrency)
+            await client.client.close()
+        stats = gateway.stats()
+        rows.append({
+            "scenario": name,
+            "gateway": variant,
+            "answered": len(latencies),
+            "unavailable": unavailable,
+            **{k: v for k, v in summarize(latencies).items() if k != "n"},
+            "seconds": round(elapsed, 2),
+            "server_429s": app.state.requests["rate_limited"],
+            "server_500s": app.state.requests["errors"],
+            "retries": stats["retries"],
+            "hedged": stats["hedged"],
+            "hedge_won": stats["hedge_won"],
+            "fallback": stats["fallback"],
+        })
+    return rows
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--first-token-ms", type=float, default=150)
+    parser.add_argument("--token-ms", type=float, default=2)
+    parser.add_argument("--quota-rps", type=float, default=10)
+    parser.add_argument("--slow-rate", type=float, default=0.05)
+    parser.add_argument("--slow-factor", type=float, default=10)
+    parser.add_argument("--hedge-warmup", type=int, default=100, help="unmeasured calls before the hedged run")
+    args = parser.parse_args()
+
+    latency = {"first_token_ms": args.first_token_ms, "token_ms": args.token_ms}
+    rows = []
+    rows += await scenario("rate limit burst", {**latency, "quota_rps": args.quota_rps}, {
+        "no retries": {"max_retries": 0},
+        "retries + Retry-After": {"max_retries": 8},
+        "retries + token bucket": {"max_retries": 8, "rpm": args.quota_rps * 60, "burst_seconds": 1},
+    }, args.calls, args.concurrency)
+    rows += await scenario("slow tail", {**latency, "slow_rate": args.slow_rate, "slow_factor": args.slow_factor}, {
+        "no hedging": {},
+        "hedge at p90": {"fallback_model": FALLBACK, "hedge": True, "hedge_percentile": 90},
+    }, args.calls, args.concurrency, args.hedge_warmup)
+    rows += await scenario("primary outage", {**latency, "failing_models": (PRIMARY,)}, {
+        "retries only": {"max_retries": 3},
+        "breaker + fallback": {"max_retries": 3, "fallback_model": FALLBACK},
+    }, args.calls, args.concurrency)
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    # Settings are read at import; the client needs a key even for the fake server
+    os.environ.setdefault("GROQ_API_KEY", "fake")
+    os.environ.setdefault("LLM_RETRY_BASE_DELAY", "0.05")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    asyncio.run(main())
@@ -0,0 +1,358 @@
+"""
+Load test for regression tracking between releases. Ingests sample_docs (--scale N
+copies for a bigger corpus) through /ingest/text, then replays a weighted request mix
+(benchmarks/data/load_mix.jsonl: /search, /qa, /qa/stream, /ingest) and writes a JSON
+report: throughput, p50/p95/p99 per request type, ingestion job times and the
+per-stage latency breakdown (rag_stage_seconds, as on /api/v1/stats).
+
+By default the app runs in process with local stand-ins: VECTOR_STORE=local on a
+temporary index and the fake Groq server (benchmarks.fake_groq), so only Postgres is
+needed; documents created by the run are deleted afterwards. --url targets a running
+deployment instead (its documents are left in place).
+
+Arrivals are open-loop Poisson at --rate requests/s, with at most --concurrency in
+flight; latency counts from the scheduled arrival, so queueing behind a slow server is
+not hidden. --rate 0 runs --concurrency closed-loop clients instead.
+With --baseline, p95 and throughput are compared per request type and the exit code
+is 1 when any of them regresses by more than --tolerance.
+
+    docker-compose up -d postgres
+    git checkout v1.2 && POSTGRES_HOST=localhost QA_CACHE_ENABLED=false \\
+        python -m benchmarks.load_test --scale 4 --rate 20 --requests 2000 --out baseline.json
+    git checkout main && POSTGRES_HOST=localhost QA_CACHE_ENABLED=false \\
+        python -m benchmarks.load_test --scale 4 --rate 20 --requests 2000 --out load.json --baseline baseline.json
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import random
+import subprocess
+import tempfile
+import time
+import uuid
+from datetime import datetime, timezone
+import httpx
+from benchmarks.common import summarize, print_table
+from benchmarks.reingest import TERMINAL
+from benchmarks.search_recall import QUERIES
+
+MIX = os.path.join(os.path.dirname(__file__), "data", "load_mix.jsonl")
+API = "/api/v1"
+
+
+def load_docs(docs: str) -> dict[str, str]:
+    # Not benchmarks.chunking.load_docs: that imports app modules, and the in-process app
+    # must not read its settings before the stand-ins are configured
+    out = {}
+    for name in sorted(os.listdir(docs)):
+        if name.endswith(".txt"):
+            with open(os.path.join(docs, name), encoding="utf-8") as f:
+                out[name] = f.read()
+    return out
+
+
+class Workload:
+    """Fills the placeholders of the mix templates with sample queries and documents."""
+    def __init__(self, mix: list[dict], queries: list[dict], docs: dict[str, str], run_id: str):
+        self.mix = mix
+        self.weights = [m["weight"] for m in mix]
+        self.queries = queries
+        self.docs = list(docs.items())
+        self.run_id = run_id
+        self.created = 0
+
+    def document(self) -> dict:
+        name, text = random.choice(self.docs)
+        paragraphs = text.split("\n\n")
+        random.shuffle(paragraphs)  # new chunk boundaries, so ingestion embeds and writes
+        self.created += 1
+        return {
+            "title": f"{name} (load test {self.created})",
+            "document": "\n\n".join(paragraphs),
+            "source": f"loadtest/{self.run_id}/{self.created}/{name}",
+        }
+
+    def next(self) -> tuple[str, dict]:
+        template = random.choices(self.mix, weights=self.weights)[0]
+        query = random.choice(self.queries)
+        values = {"query": query["query"], "tags": query.get("tags") or ""}
+        if template["path"].startswith(f"{API}/ingest"):
+            values.update(self.document())
+        request = {"method": template["method"], "url": template["path"]}
+        for field in ("params", "json"):
+            if field in template:
+                request[field] = fill(template[field], values)
+        return template["name"], request
+
+
+def fill(value, values: dict):
+    if isinstance(value, dict):
+        return {k: fill(v, values) for k, v in value.items()}
+    if isinstance(value, str):
+        return value.format_map(values)
+    return value
+
+
+async def seed(client: httpx.AsyncClient, docs: dict[str, str], scale: int, run_id: str) -> dict:
+    started = time.perf_counter()
+    job_ids = []
+    for copy in range(scale):
+        for name, text in docs.items():
+            response = await client.post(f"{API}/ingest/text", json={
+                "title": name, "text": text, "source": f"loadtest/{run_id}/seed/{copy}/{name}"
+            })
+            response.raise_for_status()
+            job_ids.append(response.json()["job_id"])
+    jobs = await wait_for_jobs(client, job_ids)
+    elapsed = time.perf_counter() - started
+    return {
+        "documents": len(jobs),
+        "chunks": sum(j["chunks_total"] for j in jobs),
+        "failed": sum(j["status"] != "completed" for j in jobs),
+        "seconds": round(elapsed, 2),
+        "documents_per_second": round(len(jobs) / elapsed, 2),
+    }
+
+
+async def wait_for_jobs(client: httpx.AsyncClient, job_ids: list[str], timeout: float = 600) -> list[dict]:
+    deadline = time.monotonic() + timeout
+    done = {}
+    while len(done) < len(job_ids) and time.monotonic() < deadline:
+        for job_id in job_ids:
+            if job_id in done:
+                continue
+            job = (await client.get(f"{API}/ingest/jobs/{job_id}")).json()
+            if job["status"] in TERMINAL:
+                done[job_id] = job
+        if len(done) < len(job_ids):
+            await asyncio.sleep(0.2)
+    return list(done.values())
+
+
+async def replay(client: httpx.AsyncClient, workload: Workload, requests: int, rate: float, concurrency: int) -> dict:
+    latencies: dict[str, list[float]] = {m["name"]: [] for m in workload.mix}
+    errors = {name: 0 for name in latencies}
+    rejected = {name: 0 for name in latencies}
+    job_ids = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def send(name: str, request: dict, scheduled: float):
+        async with semaphore:
+            try:
+                response = await client.request(**request)
+            except httpx.HTTPError:
+                errors[name] += 1
+                return
+        latency = time.perf_counter() - scheduled
+        if response.status_code == 429:
+            rejected[name] += 1
+        elif response.status_code >= 300:
+            errors[name] += 1
+        else:
+            latencies[name].append(latency)
+            if response.status_code == 202:
+                job_ids.append(response.json()["job_id"])
+
+    started = time.perf_counter()
+    if rate > 0:
+        tasks, scheduled = [], started
+        for _ in range(requests):
+            scheduled += random.expovariate(rate)
+            await asyncio.sleep(max(0.0, scheduled - time.perf_counter()))
+            tasks.append(asyncio.create_task(send(*workload.next(), scheduled)))
+        await asyncio.gather(*tasks)
+    else:
+        remaining = requests
+
+        async def client_loop():
+            nonlocal remaining
+            while remaining > 0:
+                remaining -= 1
+                await send(*workload.next(), time.perf_counter())
+
+        await asyncio.gather(*(client_loop() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    endpoints = {}
+    for name, samples in latencies.items():
+        endpoints[name] = {
+            **summarize(samples),
+            "errors": errors[name],
+            "rejected": rejected[name],
+            "throughput_rps": round(len(samples) / elapsed, 2),
+        }
+    completed = sum(len(s) for s in latencies.values())
+    overall = {
+        **summarize([x for s in latencies.values() for x in s]),
+        "errors": sum(errors.values()),
+        "rejected": sum(rejected.values()),
+        "throughput_rps": round(completed / elapsed, 2),
+    }
+    return {"elapsed_s": round(elapsed, 2), "overall": overall, "endpoints": endpoints, "job_ids": job_ids}
+
+
+def ingest_summary(jobs: list[dict]) -> dict:
+    """Queue-to-finish time of the ingest jobs submitted during the replay, and mean seconds per stage."""
+    finished = [j for j in jobs if j.get("finished_at")]
+    durations = [
+        (datetime.fromisoformat(j["finished_at"]) - datetime.fromisoformat(j["created_at"])).total_seconds()
+        for j in finished
+    ]
+    stages: dict[str, list[float]] = {}
+    for j in finished:
+        for stage, seconds in (j.get("stage_seconds") or {}).items():
+            stages.setdefault(stage, []).append(seconds)
+    return {
+        "jobs": len(jobs),
+        "failed": sum(j["status"] == "failed" for j in jobs),
+        "end_to_end": summarize(durations),
+        "stage_mean_s": {stage: round(sum(v) / len(v), 4) for stage, v in sorted(stages.items())},
+    }
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> tuple[list[dict], bool]:
+    rows, regressed = [], False
+    for name, current in report["endpoints"].items():
+        base = baseline.get("endpoints", {}).get(name)
+        if not base or not current["n"] or not base["n"]:
+            continue
+        p95_change = (current["p95_ms"] - base["p95_ms"]) / base["p95_ms"] if base["p95_ms"] else 0.0
+        rps_change = (current["throughput_rps"] - base["throughput_rps"]) / base["throughput_rps"] if base["throughput_rps"] else 0.0
+        bad = p95_change > tolerance or rps_change < -tolerance
+        regressed |= bad
+        rows.append({
+            "request": name,
+            "p95_ms": current["p95_ms"],
+            "baseline_p95_ms": base["p95_ms"],
+            "p95_change_pct": round(100 * p95_change, 1),
+            "rps": current["throughput_rps"],
+            "baseline_rps": base["throughput_rps"],
+            "rps_change_pct": round(100 * rps_change, 1),
+            "regressed": bad,
+        })
+    return rows, regressed
+
+
+@contextlib.asynccontextmanager
+async def in_process_client(args):
+    """The app with its lifespan, over ASGI, backed by a temporary local index and the fake LLM."""
+    from benchmarks.fake_groq import FakeGroqServer
+    with tempfile.TemporaryDirectory() as index, \
+            FakeGroqServer(first_token_ms=args.llm_first_token_ms, token_ms=args.llm_token_ms) as llm:
+        # Settings are read at import, so the stand-ins are configured before the app is imported
+        os.environ.update({"VECTOR_STORE": "local", "LOCAL_INDEX_PATH": index, "GROQ_BASE_URL": llm.base_url})
+        os.environ.setdefault("GROQ_API_KEY", "load-test")
+        os.environ.setdefault("LOG_LEVEL", "WARNING")
+        from app.main import app
+        async with app.router.lifespan_context(app):
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://load-test", timeout=120) as client:
+                yield client
+
+
+async def cleanup(run_id: str):
+    from sqlalchemy import delete
+    from app.db.models import DocumentMetadata, IngestionJob
+    from app.db.postgres import AsyncSessionLocal
+    async with AsyncSessionLocal() as db:
+        for model in (IngestionJob, DocumentMetadata):
+            await db.execute(delete(model).where(model.source.like(f"loadtest/{run_id}/%")))
+        await db.commit()
+
+
+async def stage_breakdown(client: httpx.AsyncClient, in_process: bool) -> dict:
+    if in_process:
+        from app.core.metrics import metrics
+        return metrics.summary()
+    return (await client.get(f"{API}/stats")).json().get("latency", {})
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return ""
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", help="target a running deployment instead of the in-process app")
+    parser.add_argument("--mix", default=MIX)
+    parser.add_argument("--docs", default="sample_docs")
+    parser.add_argument("--scale", type=int, default=1, help="copies of sample_docs to ingest before the replay")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--warmup", type=int, default=50, help="requests replayed before measuring")
+    parser.add_argument("--rate", type=float, default=20.0, help="arrivals per second; 0 = closed loop")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--llm-first-token-ms", type=float, default=300)
+    parser.add_argument("--llm-token-ms", type=float, default=5)
+    parser.add_argument("--out", default="load_test.json")
+    parser.add_argument("--baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed p95/throughput regression (fraction)")
+    args = parser.parse_args()
+
+    with open(args.mix) as f:
+        mix = [json.loads(line) for line in f if line.strip()]
+    with open(QUERIES) as f:
+        queries = [json.loads(line) for line in f if line.strip()]
+    docs = load_docs(args.docs)
+    run_id = uuid.uuid4().hex[:8]
+    workload = Workload(mix, queries, docs, run_id)
+
+    if args.url:
+        client_context = httpx.AsyncClient(base_url=args.url, timeout=120)
+    else:
+        client_context = in_process_client(args)
+    try:
+        async with client_context as client:
+            seeded = await seed(client, docs, args.scale, run_id)
+            print(f"seeded {seeded['documents']} documents ({seeded['chunks']} chunks) in {seeded['seconds']}s")
+            if args.warmup:
+                await replay(client, workload, args.warmup, args.rate, args.concurrency)
+            if not args.url:
+                from app.core.metrics import metrics
+                metrics.reset()
+            result = await replay(client, workload, args.requests, args.rate, args.concurrency)
+            jobs = await wait_for_jobs(client, result.pop("job_ids"))
+            stages = await stage_breakdown(client, in_process=not args.url)
+    finally:
+        if not args.url:
+            await cleanup(run_id)
+
+    report = {
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "revision": git_revision(),
+        "config": {
+            "target": args.url or "in-process",
+            "mix": {m["name"]: m["weight"] for m in mix},
+            "scale": args.scale,
+            "requests": args.requests,
+            "rate": args.rate,
+            "concurrency": args.concurrency,
+            "llm_first_token_ms": None if args.url else args.llm_first_token_ms,
+            "llm_token_ms": None if args.url else args.llm_token_ms,
+        },
+        "seed": seeded,
+        **result,
+        "ingest": ingest_summary(jobs),
+        "stages": stages,
+    }
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print_table([{"request": name, **row} for name, row in {**result["endpoints"], "all": result["overall"]}.items()])
+    print_table([{"stage": name, **row} for name, row in stages.items() if name.startswith("rag_stage_seconds")])
+    print(f"report written to {args.out}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            rows, regressed = compare(report, json.load(f), args.tolerance)
+        print_table(rows)
+        if regressed:
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
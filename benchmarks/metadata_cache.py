@@ -0,0 +1,107 @@
+"""
+/search latency under concurrent load with the document metadata cache on vs. off
+(off = one Postgres IN query per search, as before). Runs the search router in process
+over ASGI against the configured Postgres and vector store, with synthetic documents;
+reranking is off so the metadata hop is a visible share of the request.
+
+    POSTGRES_HOST=localhost VECTOR_STORE=local LOCAL_INDEX_PATH=/tmp/bench_index \
+        python -m benchmarks.metadata_cache --documents 500 --requests 1000 --concurrency 16
+"""
+import argparse
+import asyncio
+import random
+import time
+import uuid
+import httpx
+from fastapi import FastAPI
+from sqlalchemy import delete
+from app.api import search
+from app.core.embeddings import embed_batch
+from app.core.metadata_cache import metadata_cache
+from app.core.workers import worker_pool
+from app.db.models import DocumentMetadata
+from app.db.postgres import AsyncSessionLocal, init_db
+from app.db.vector_store import get_vector_store
+from benchmarks.common import summarize, print_table
+
+WORDS = "leave policy sick vacation remote office expense travel holiday security incident deployment benefits".split()
+
+
+def random_text(n: int) -> str:
+    return " ".join(random.choices(WORDS, k=n))
+
+
+async def seed(documents: int) -> list[uuid.UUID]:
+    doc_ids = [uuid.uuid4() for _ in range(documents)]
+    async with AsyncSessionLocal() as db:
+        db.add_all(DocumentMetadata(id=d, title=f"Benchmark {i}", source=f"bench_{i}.txt") for i, d in enumerate(doc_ids))
+        await db.commit()
+    texts = [random_text(40) for _ in doc_ids]
+    vectors = embed_batch(texts)
+    with get_vector_store().acquire() as store:
+        store.insert_chunks([
+            {"uuid": str(uuid.uuid4()), "text": t, "vector": v, "document_id": str(d), "chunk_index": 0}
+            for t, v, d in zip(texts, vectors, doc_ids)
+        ])
+    return doc_ids
+
+
+async def cleanup(doc_ids: list[uuid.UUID]):
+    with get_vector_store().acquire() as store:
+        for d in doc_ids:
+            store.delete_document_chunks(str(d))
+    async with AsyncSessionLocal() as db:
+        await db.execute(delete(DocumentMetadata).where(DocumentMetadata.id.in_(doc_ids)))
+        await db.commit()
+
+
+async def drive(client: httpx.AsyncClient, label: str, queries: list[str], concurrency: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(q: str):
+        async with semaphore:
+            start = time.perf_counter()
+            response = await client.get("/search/", params={"q": q, "k": 5, "rerank": "false"})
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(q) for q in queries))
+    elapsed = time.perf_counter() - start
+    return {"metadata": label, **summarize(latencies), "req_per_s": round(len(queries) / elapsed, 1)}
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--documents", type=int, default=500)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    await init_db()
+    worker_pool.start()
+    get_vector_store().open()
+    app = FastAPI()
+    app.include_router(search.router, prefix="/search")
+    doc_ids = await seed(args.documents)
+    # A fixed query set, embedded once up front, so both runs do the same searches
+    queries = [random_text(6) for _ in range(200)]
+    embed_batch(queries)
+    rows = []
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+            for label, enabled in (("postgres per query", False), ("cache", True)):
+                metadata_cache.enabled = enabled
+                await drive(client, label, queries, args.concurrency)  # warm-up
+                rows.append(await drive(client, label, random.choices(queries, k=args.requests), args.concurrency))
+    finally:
+        await cleanup(doc_ids)
+        get_vector_store().close()
+        worker_pool.shutdown()
+    print_table(rows)
+    print(metadata_cache.stats())
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
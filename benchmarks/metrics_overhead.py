@@ -0,0 +1,78 @@
+"""
+Cost of the metrics instrumentation per call: span(), inc() and observe() with metrics
+disabled vs. enabled, against an empty loop, plus a request-shaped mix (6 spans + 4
+counters, roughly what one /qa call records) and the time to render /metrics.
+
+    python -m benchmarks.metrics_overhead --iterations 200000
+"""
+import argparse
+import time
+from app.core.metrics import Metrics
+from benchmarks.common import print_table
+
+
+def per_call_ns(fn, iterations: int) -> float:
+    fn(1000)  # warm up
+    best = float("inf")
+    for _ in range(5):
+        start = time.perf_counter()
+        fn(iterations)
+        best = min(best, time.perf_counter() - start)
+    return best / iterations * 1e9
+
+
+def workloads(m: Metrics) -> dict:
+    def empty(n):
+        for _ in range(n):
+            pass
+
+    def span(n):
+        for _ in range(n):
+            with m.span("vector_search"):
+                pass
+
+    def inc(n):
+        for _ in range(n):
+            m.inc("rag_llm_requests_total", outcome="ok")
+
+    def observe(n):
+        for _ in range(n):
+            m.observe("rag_ingest_stage_seconds", 0.01, stage="embed")
+
+    def request(n):
+        for _ in range(n):
+            for stage in ("embed_query", "vector_search", "rerank", "metadata", "llm_generate", "embed_encode"):
+                with m.span(stage):
+                    pass
+            m.inc("rag_llm_requests_total", outcome="ok")
+            m.inc("rag_llm_tokens_total", 500, type="prompt")
+            m.inc("rag_llm_tokens_total", 80, type="completion")
+            m.inc("rag_embedding_texts_total", 1, cache="miss")
+
+    return {"empty loop": empty, "span": span, "inc": inc, "observe": observe, "request (6 spans + 4 inc)": request}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=200_000)
+    args = parser.parse_args()
+
+    disabled, enabled = Metrics(enabled=False), Metrics(enabled=True, otel=False)
+    off, on = workloads(disabled), workloads(enabled)
+    rows = []
+    for name in off:
+        iterations = args.iterations // 10 if name.startswith("request") else args.iterations
+        rows.append({
+            "operation": name,
+            "disabled_ns": round(per_call_ns(off[name], iterations), 1),
+            "enabled_ns": round(per_call_ns(on[name], iterations), 1),
+        })
+    print_table(rows)
+
+    start = time.perf_counter()
+    body = enabled.render()
+    print(f"render: {len(body.splitlines())} lines in {(time.perf_counter() - start) * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+Time-to-first-token vs. total latency: LLMClient.generate() vs. LLMClient.stream(),
+against the local fake Groq server.
+
+    python -m benchmarks.qa_streaming --requests 20 --first-token-ms 400 --token-ms 20
+"""
+import argparse
+import asyncio
+import os
+import time
+from benchmarks.common import summarize, print_table
+from benchmarks.fake_groq import FakeGroqServer
+
+
+async def measure(llm_client, requests: int):
+    generate_total, stream_ttft, stream_total = [], [], []
+    for _ in range(requests):
+        start = time.perf_counter()
+        await llm_client.generate(system_content="system", user_content="question")
+        generate_total.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        first = None
+        async for _ in llm_client.stream(system_content="system", user_content="question"):
+            if first is None:
+                first = time.perf_counter() - start
+        stream_ttft.append(first)
+        stream_total.append(time.perf_counter() - start)
+    return [
+        {"mode": "generate (first byte = full answer)", **summarize(generate_total)},
+        {"mode": "stream time-to-first-token", **summarize(stream_ttft)},
+        {"mode": "stream total", **summarize(stream_total)},
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--first-token-ms", type=float, default=400)
+    parser.add_argument("--token-ms", type=float, default=20)
+    args = parser.parse_args()
+
+    with FakeGroqServer(first_token_ms=args.first_token_ms, token_ms=args.token_ms) as server:
+        os.environ["GROQ_BASE_URL"] = server.base_url
+        os.environ.setdefault("GROQ_API_KEY", "fake")
+        from app.core.llm import LLMClient
+        print_table(asyncio.run(measure(LLMClient(), args.requests)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Query embedding throughput and tail latency under synthetic concurrent load:
+one encode call per query vs. the EmbeddingBatcher at several window sizes.
+
+    python -m benchmarks.query_batching --queries 2000 --concurrency 64 --windows 1,5,10
+"""
+import argparse
+import asyncio
+import random
+import time
+from app.core.batching import EmbeddingBatcher
+from app.core.embeddings import embed_query, embedding_service
+from app.core.workers import worker_pool
+from benchmarks.common import summarize, print_table
+
+WORDS = "leave policy sick vacation remote office expense travel holiday security incident deployment benefits".split()
+
+
+def random_query() -> str:
+    return " ".join(random.choices(WORDS, k=random.randint(4, 12))) + "?"
+
+
+async def drive(label: str, embed, queries: int, concurrency: int) -> dict:
+    sem = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one():
+        async with sem:
+            start = time.perf_counter()
+            await embed(random_query())
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(queries)))
+    elapsed = time.perf_counter() - start
+    return {"mode": label, "qps": round(queries / elapsed, 1), **summarize(latencies)}
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--windows", default="1,5,10", help="batch windows in ms")
+    parser.add_argument("--max-batch-size", type=int, default=32)
+    args = parser.parse_args()
+
+    # Load the model before timing anything
+    embedding_service.embed_text("warm up")
+    worker_pool.max_queue = args.concurrency
+
+    rows = [await drive("unbatched", lambda q: worker_pool.run(embed_query, q), args.queries, args.concurrency)]
+    for window in (float(w) for w in args.windows.split(",")):
+        batcher = EmbeddingBatcher(window_ms=window, max_batch_size=args.max_batch_size)
+        row = await drive(f"batched({window}ms)", batcher.embed, args.queries, args.concurrency)
+        row["avg_batch"] = batcher.stats()["avg_batch_size"]
+        rows.append(row)
+    worker_pool.shutdown()
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
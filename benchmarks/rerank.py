@@ -0,0 +1,65 @@
+"""
+Cross-encoder rerank cost on CPU: latency per call and per candidate for several
+candidate counts, fp32 vs. dynamic int8, plus how often the quantized model keeps the
+fp32 top-3. Passages are the sample_docs paragraphs, queries the labeled search set.
+
+    python -m benchmarks.rerank --candidates 10,20,50 --repeats 5
+
+For the effect on retrieval quality run benchmarks.search_recall (vector vs. vector+rerank).
+"""
+import argparse
+import json
+import os
+import random
+import time
+from app.core.reranking import CrossEncoderReranker
+from benchmarks.common import summarize, print_table
+from benchmarks.search_recall import QUERIES
+
+
+def load_passages(docs: str) -> list[str]:
+    passages = []
+    for name in sorted(os.listdir(docs)):
+        if name.endswith(".txt"):
+            with open(os.path.join(docs, name), encoding="utf-8") as f:
+                passages += [p.strip() for p in f.read().split("\n\n") if len(p.split()) > 5]
+    return passages
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", default="sample_docs")
+    parser.add_argument("--candidates", default="10,20,50")
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    passages = load_passages(args.docs)
+    with open(QUERIES) as f:
+        queries = [json.loads(line)["query"] for line in f if line.strip()]
+    rerankers = {"fp32": CrossEncoderReranker(quantize=False), "int8": CrossEncoderReranker(quantize=True)}
+    for reranker in rerankers.values():
+        reranker.score("warm up", ["warm up"])
+
+    rows = []
+    for n in (int(c) for c in args.candidates.split(",")):
+        samples = [(q, random.choices(passages, k=n)) for q in queries[:args.repeats * 4]]
+        top3 = {}
+        for label, reranker in rerankers.items():
+            latencies, top3[label] = [], []
+            for query, candidates in samples:
+                start = time.perf_counter()
+                scores = reranker.score(query, candidates)
+                latencies.append(time.perf_counter() - start)
+                top3[label].append(set(sorted(range(n), key=lambda i: -scores[i])[:3]))
+            summary = summarize(latencies)
+            rows.append({
+                "candidates": n, "model": label, **summary,
+                "ms_per_candidate": round(summary["mean_ms"] / n, 3),
+            })
+        agreement = sum(len(a & b) for a, b in zip(top3["fp32"], top3["int8"])) / (3 * len(samples))
+        rows[-1]["top3_agreement"] = round(agreement, 3)
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
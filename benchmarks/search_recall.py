@@ -0,0 +1,105 @@
+"""
+Retrieval quality vs. latency for /search: vector, BM25 (hybrid alpha=0), hybrid at a few
+alphas, reciprocal rank fusion and cross-encoder reranking, each with and without the tags
+filter pushed down into Weaviate. Uses the labeled queries in benchmarks/data/search_queries.jsonl over sample_docs
+(relevant = source file name; tags = the document's department).
+
+Needs the API running (uvicorn app.main:app) with Postgres and Weaviate up. --ingest uploads
+sample_docs first, tagged from sample_docs/metadata.json.
+
+    python -m benchmarks.search_recall --url http://localhost:8000 --ingest --k 3
+"""
+import argparse
+import json
+import os
+import time
+import httpx
+from benchmarks.common import summarize, print_table
+from benchmarks.reingest import wait
+
+QUERIES = os.path.join(os.path.dirname(__file__), "data", "search_queries.jsonl")
+
+CONFIGS = [
+    ("vector", {"mode": "vector", "rerank": False}),
+    ("bm25", {"mode": "hybrid", "alpha": 0.0, "rerank": False}),
+    ("hybrid a=0.25", {"mode": "hybrid", "alpha": 0.25, "rerank": False}),
+    ("hybrid a=0.5", {"mode": "hybrid", "alpha": 0.5, "rerank": False}),
+    ("hybrid a=0.75", {"mode": "hybrid", "alpha": 0.75, "rerank": False}),
+    ("rrf a=0.5", {"mode": "hybrid", "alpha": 0.5, "fusion": "rrf", "rerank": False}),
+    ("vector+rerank", {"mode": "vector", "rerank": True}),
+    ("hybrid a=0.5+rerank", {"mode": "hybrid", "alpha": 0.5, "rerank": True}),
+]
+
+
+def ingest(client: httpx.Client, docs: str):
+    job_ids = []
+    with open(os.path.join(docs, "metadata.json")) as f:
+        for meta in json.load(f):
+            path = os.path.join(docs, meta["filename"])
+            with open(path, "rb") as doc:
+                response = client.post(
+                    "/api/v1/ingest/file",
+                    files={"file": (meta["filename"], doc.read(), "text/plain")},
+                    data={"title": meta["title"], "tags": ",".join([meta["department"], *meta["tags"]])}
+                )
+            response.raise_for_status()
+            job_ids.append(response.json()["job_id"])
+    failed = [j for j in wait(client, job_ids) if j["status"] != "completed"]
+    if failed:
+        raise SystemExit(f"{len(failed)} ingestion jobs failed: {failed[0]['error']}")
+
+
+def evaluate(client: httpx.Client, queries: list[dict], params: dict, k: int, filtered: bool) -> dict:
+    hits, reciprocal_ranks, latencies = 0, 0.0, []
+    for q in queries:
+        query_params = {"q": q["query"], "k": k, **params}
+        if filtered:
+            query_params["tags"] = q["tags"]
+        start = time.perf_counter()
+        response = client.get("/api/v1/search/", params=query_params)
+        latencies.append(time.perf_counter() - start)
+        response.raise_for_status()
+        sources = [r["source"] for r in response.json()["results"]]
+        ranks = [i for i, s in enumerate(sources) if s in q["relevant"]]
+        if ranks:
+            hits += 1
+            reciprocal_ranks += 1 / (ranks[0] + 1)
+    summary = summarize(latencies)
+    return {
+        f"recall@{k}": round(hits / len(queries), 3),
+        "mrr": round(reciprocal_ranks / len(queries), 3),
+        "p50_ms": summary["p50_ms"],
+        "p95_ms": summary["p95_ms"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--docs", default="sample_docs")
+    parser.add_argument("--queries", default=QUERIES)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--ingest", action="store_true")
+    args = parser.parse_args()
+
+    with open(args.queries) as f:
+        queries = [json.loads(line) for line in f if line.strip()]
+
+    rows = []
+    with httpx.Client(base_url=args.url, timeout=60) as client:
+        if args.ingest:
+            ingest(client, args.docs)
+        # Warm up the embedding model and connections
+        client.get("/api/v1/search/", params={"q": "warm up", "k": args.k}).raise_for_status()
+        for name, params in CONFIGS:
+            for filtered in (False, True):
+                rows.append({
+                    "config": name,
+                    "filter": "tags" if filtered else "-",
+                    **evaluate(client, queries, params, args.k, filtered)
+                })
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
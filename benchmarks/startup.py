@@ -0,0 +1,162 @@
+"""
+Startup cost and memory of a multi-worker deployment:
+
+- import: `import app.main` in a fresh interpreter (median of --repeats), and which
+  heavy modules that pulls in before the first request,
+- serving: --workers N workers started by uvicorn --workers, gunicorn without preload,
+  and gunicorn with preload_app (gunicorn.conf.py, the embedding model loaded once in
+  the master and shared by the forked workers). Time to ready is from launch until
+  every worker has finished its lifespan; memory is the RSS and PSS summed over the
+  master and its workers, read from /proc (Linux). RSS counts shared pages once per
+  process, PSS splits them between the processes sharing them, so PSS is the
+  deployment's real footprint.
+
+Uses the same settings as the app (.env / environment). Postgres must be reachable
+(workers resume ingestion jobs at startup); a missing Weaviate only logs an error.
+
+    python -m benchmarks.startup --workers 4
+"""
+import argparse
+import json
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import httpx
+from benchmarks.common import print_table
+
+HEAVY_MODULES = ("torch", "sentence_transformers", "onnxruntime", "weaviate", "groq", "httpx", "pypdf", "asyncpg")
+READY_LINE = "Application startup complete"
+
+IMPORT_SNIPPET = f"""
+import json, sys, time
+started = time.perf_counter()
+import app.main
+print(json.dumps({{
+    "seconds": time.perf_counter() - started,
+    "loaded": [m for m in {HEAVY_MODULES!r} if m in sys.modules],
+}}))
+"""
+
+
+def import_time(repeats: int) -> dict:
+    runs = []
+    for _ in range(repeats):
+        out = subprocess.run([sys.executable, "-c", IMPORT_SNIPPET], capture_output=True, text=True, check=True)
+        runs.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    return {
+        "import_s": round(statistics.median(r["seconds"] for r in runs), 3),
+        "heavy_modules_at_import": ",".join(runs[-1]["loaded"]) or "-",
+    }
+
+
+def process_tree(root: int) -> list[int]:
+    children = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # The command name may contain spaces; ppid is the second field after it
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+    pids, pending = [], [root]
+    while pending:
+        pid = pending.pop()
+        pids.append(pid)
+        pending += children.get(pid, [])
+    return pids
+
+
+def memory_kb(pid: int) -> dict:
+    values = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                name, _, rest = line.partition(":")
+                if name in ("Rss", "Pss"):
+                    values[name] = int(rest.split()[0])
+    except OSError:
+        pass
+    return values
+
+
+def serve(name: str, command: list[str], env: dict, workers: int, port: int, timeout: float) -> dict:
+    started = time.perf_counter()
+    proc = subprocess.Popen(
+        command, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, start_new_session=True
+    )
+    ready = threading.Event()
+    log_tail = []
+
+    def read_log():
+        seen = 0
+        for line in proc.stdout:
+            log_tail[:] = (log_tail + [line.rstrip()])[-20:]
+            if READY_LINE in line:
+                seen += 1
+                if seen >= workers:
+                    ready.set()
+
+    threading.Thread(target=read_log, daemon=True).start()
+    try:
+        if not ready.wait(timeout):
+            raise RuntimeError(f"{name}: {workers} workers not ready after {timeout}s:\n" + "\n".join(log_tail))
+        ready_s = time.perf_counter() - started
+        httpx.get(f"http://127.0.0.1:{port}/", timeout=10).raise_for_status()
+        # Let the workers settle (first request, lazy allocations) before reading memory
+        time.sleep(1)
+        pids = process_tree(proc.pid)
+        usage = [memory_kb(pid) for pid in pids]
+        return {
+            "server": name,
+            "workers": workers,
+            "processes": len(pids),
+            "ready_s": round(ready_s, 2),
+            "rss_mb": round(sum(u.get("Rss", 0) for u in usage) / 1024, 1),
+            "pss_mb": round(sum(u.get("Pss", 0) for u in usage) / 1024, 1),
+        }
+    finally:
+        os.killpg(proc.pid, signal.SIGTERM)
+        try:
+            proc.wait(30)
+        except subprocess.TimeoutExpired:
+            os.killpg(proc.pid, signal.SIGKILL)
+            proc.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--timeout", type=float, default=300)
+    args = parser.parse_args()
+
+    imports = import_time(args.repeats)
+    print_table([imports])
+    print()
+
+    bind = ["--bind", f"127.0.0.1:{args.port}", "--workers", str(args.workers)]
+    gunicorn = [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "app.main:app", *bind]
+    variants = {
+        "uvicorn --workers": ([
+            sys.executable, "-m", "uvicorn", "app.main:app",
+            "--host", "127.0.0.1", "--port", str(args.port), "--workers", str(args.workers),
+        ], {}),
+        "gunicorn": (gunicorn, {"PRELOAD_APP": "false"}),
+        "gunicorn preload": (gunicorn, {"PRELOAD_APP": "true"}),
+    }
+    rows = []
+    for name, (command, extra_env) in variants.items():
+        rows.append(serve(name, command, {**os.environ, **extra_env}, args.workers, args.port, args.timeout))
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Query latency, recall and memory: in-process LocalVectorStore (float16 / float32, exact
+or IVF) vs. the Weaviate path, on the same synthetic chunks. Each backend runs in a fresh
+subprocess so ru_maxrss is not shared; for Weaviate the client process is measured (the
+server's memory is in its container: docker stats).
+
+    WEAVIATE_URL=http://localhost:8080 python -m benchmarks.vector_store --chunks 20000 --queries 500
+    python -m benchmarks.vector_store --backends local-f16,local-f32 --ivf-min-rows 10000
+"""
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+import numpy as np
+from benchmarks.common import summarize, print_table
+
+DIM = 384
+
+
+def make_data(n: int, queries: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    vectors = rng.normal(size=(n, DIM)).astype(np.float32)
+    # Queries are noisy copies of known chunks, so recall@1 can be checked
+    targets = rng.choice(n, size=queries, replace=False)
+    probes = vectors[targets] + rng.normal(scale=0.5, size=(queries, DIM)).astype(np.float32)
+    return vectors, targets, probes
+
+
+def open_store(backend: str, path: str, ivf_min_rows: int):
+    if backend == "weaviate":
+        from app.db.weaviate import WeaviateClient
+        store = WeaviateClient()
+        store.init_schema()
+        return store
+    from app.db.local_index import LocalVectorStore
+    store = LocalVectorStore(path=path, dtype="float16" if backend == "local-f16" else "float32")
+    store.min_ivf_rows = ivf_min_rows
+    store.open()
+    return store
+
+
+def child(backend: str, chunks: int, queries: int, ivf_min_rows: int):
+    vectors, targets, probes = make_data(chunks, queries)
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    document_id = str(uuid.uuid4())
+    ids = [str(uuid.uuid4()) for _ in range(chunks)]
+    with tempfile.TemporaryDirectory() as tmp:
+        store = open_store(backend, tmp, ivf_min_rows)
+        started = time.perf_counter()
+        for start in range(0, chunks, 1000):
+            store.insert_chunks([
+                {"uuid": ids[i], "text": f"synthetic chunk {i}", "vector": vectors[i].tolist(),
+                 "document_id": document_id, "chunk_index": i}
+                for i in range(start, min(chunks, start + 1000))
+            ])
+        insert_seconds = time.perf_counter() - started
+
+        latencies, hits = [], 0
+        for probe, target in zip(probes, targets):
+            started = time.perf_counter()
+            result = store.search(probe.tolist(), limit=5)
+            latencies.append(time.perf_counter() - started)
+            hits += bool(result) and str(result[0].uuid) == ids[target]
+        store.delete_document_chunks(document_id)
+        store.close()
+
+    summary = summarize(latencies)
+    print(json.dumps({
+        "backend": backend,
+        "chunks": chunks,
+        "insert_chunks_per_s": round(chunks / insert_seconds, 1),
+        "p50_ms": summary["p50_ms"],
+        "p95_ms": summary["p95_ms"],
+        "recall@1": round(hits / queries, 3),
+        "rss_growth_mb": round((resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - baseline) / 1024, 1),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--backends", default="local-f16,local-f32,weaviate")
+    parser.add_argument("--ivf-min-rows", type=int, default=50_000, help="local index switches from exact scan to IVF here")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        return child(args.child, args.chunks, args.queries, args.ivf_min_rows)
+
+    rows = []
+    for backend in args.backends.split(","):
+        out = subprocess.run(
+            [sys.executable, "-m", "benchmarks.vector_store", "--chunks", str(args.chunks), "--queries", str(args.queries),
+             "--ivf-min-rows", str(args.ivf_min_rows), "--child", backend],
+            check=True, capture_output=True, text=True
+        ).stdout
+        rows.append(json.loads(out.strip().splitlines()[-1]))
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Per-request Weaviate latency: connect/close per request vs. the shared WeaviatePool.
+
+    WEAVIATE_URL=http://localhost:8080 python -m benchmarks.weaviate_pool --requests 200 --concurrency 8
+"""
+import argparse
+import asyncio
+import random
+import time
+from app.db.weaviate import WeaviateClient, WeaviatePool, get_weaviate_client
+from benchmarks.common import summarize, print_table
+
+DIM = 384
+
+
+def random_vector() -> list[float]:
+    return [random.uniform(-1, 1) for _ in range(DIM)]
+
+
+def search_per_request(vector):
+    client = get_weaviate_client()
+    try:
+        return client.search(vector, limit=5)
+    finally:
+        client.close()
+
+
+async def run(label, call, requests: int, concurrency: int):
+    sem = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one():
+        async with sem:
+            start = time.perf_counter()
+            await call(random_vector())
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    elapsed = time.perf_counter() - start
+    return {"mode": label, **summarize(latencies), "req_per_s": round(requests / elapsed, 1)}
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--pool-size", type=int, default=4)
+    args = parser.parse_args()
+
+    pool = WeaviatePool(size=args.pool_size)
+    pool.open()
+    with pool.acquire() as client:
+        client.init_schema()
+
+    rows = [
+        await run("connect_per_request", lambda v: asyncio.to_thread(search_per_request, v), args.requests, args.concurrency),
+        await run(f"pool(size={args.pool_size})", lambda v: pool.run(WeaviateClient.search, v, limit=5), args.requests, args.concurrency),
+    ]
+    pool.close()
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
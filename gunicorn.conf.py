@@ -0,0 +1,46 @@
+"""
+Multi-worker serving with one shared copy of the embedding model:
+
+    gunicorn -c gunicorn.conf.py app.main:app
+
+With preload_app the master imports the app and loads the embedding weights once, then
+forks the workers, which share those pages copy-on-write instead of each loading its own
+copy (uvicorn --workers N loads N). Each worker still runs the application lifespan
+(database, vector store, worker pool, warm-up encode) after the fork.
+
+WEB_CONCURRENCY sets the worker count, BIND the address and PRELOAD_APP=false turns
+sharing off (every worker imports and loads everything itself). VECTOR_STORE=local
+needs WEB_CONCURRENCY=1; gunicorn refuses to start with more workers.
+"""
+import gc
+import os
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = os.getenv("PRELOAD_APP", "true").lower() == "true"
+# Model loading happens in the lifespan when nothing was preloaded
+timeout = 120
+
+
+def on_starting(server):
+    # The local index keeps per-process state; several workers would serve each other's stale chunks
+    from app.core.config import get_settings
+    if get_settings().VECTOR_STORE == "local" and server.cfg.workers > 1:
+        raise RuntimeError("VECTOR_STORE=local serves one process: set WEB_CONCURRENCY=1 or use Weaviate")
+
+
+def when_ready(server):
+    # Runs in the master after the app import and before the first fork
+    if not preload_app:
+        return
+    from app.core.config import get_settings
+    from app.core.embeddings import preload
+    settings = get_settings()
+    # onnxruntime sessions start thread pools that do not survive fork; each worker loads its own
+    # (as do process-mode worker pools, whose children are spawned)
+    if settings.EMBEDDING_BACKEND == "torch" and settings.WORKER_POOL_MODE == "thread":
+        seconds = preload()
+        server.log.info("Preloaded embedding model in %.2fs", seconds)
+    # Keep the garbage collector from writing to (and so un-sharing) the master's objects
+    gc.freeze()
@@ -0,0 +1,8 @@
+import os
+import sys
+
+# Settings are read at import; the client needs a key even for the fake server
+os.environ.setdefault("GROQ_API_KEY", "fake")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+os.environ.setdefault("LLM_RETRY_BASE_DELAY", "0.01")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
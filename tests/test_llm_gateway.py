@@ -0,0 +1,149 @@
+"""
+LLM gateway policies against the fake Groq server (benchmarks/fake_groq.py): when
+retries, fallbacks and hedges reach the server, and that call slots are given back.
+The server logs every request with its arrival time, which the tests check.
+
+    python -m pytest tests
+"""
+import asyncio
+import pytest
+from benchmarks.fake_groq import ANSWER, FakeGroqServer, create_app
+from app.core.config import get_settings
+from app.core.llm import LLMClient
+from app.core.llm_gateway import LLMGateway, LLMUnavailable
+
+PRIMARY, FALLBACK = "primary-model", "fallback-model"
+
+
+def run(server: FakeGroqServer, scenario, **options) -> LLMGateway:
+    """Runs scenario(gateway, client) against the server; returns the gateway for its counters."""
+    gateway = LLMGateway(model=PRIMARY, **{"fallback_model": "", "timeout": 30, "rpm": 0, "tpm": 0, **options})
+
+    async def main():
+        client = LLMClient(gateway=gateway, base_url=server.base_url)
+        try:
+            await scenario(gateway, client)
+        finally:
+            await client.client.close()
+
+    asyncio.run(main())
+    return gateway
+
+
+def prime_latency(gateway: LLMGateway, seconds: float):
+    # Enough observed primary latencies for the hedge percentile to be known
+    for _ in range(gateway.hedge_min_samples):
+        gateway.latency[PRIMARY].add(seconds)
+
+
+async def ask(client: LLMClient) -> str:
+    return await client.generate(system_content="system", user_content="question")
+
+
+def test_rate_limit_retried_no_sooner_than_retry_after():
+    app = create_app(first_token_ms=10, token_ms=0, quota_rps=2)
+
+    async def scenario(gateway, client):
+        # One after another: the quota's burst runs out and the next call draws a 429
+        for _ in range(4):
+            assert await ask(client) == ANSWER
+
+    with FakeGroqServer(app=app) as server:
+        gateway = run(server, scenario, max_retries=5)
+
+    log = app.state.log
+    limited = [i for i, request in enumerate(log) if request["status"] == 429]
+    assert limited and gateway.counts["rate_limited"] == len(limited)
+    for i in limited:
+        retry = log[i + 1]
+        assert retry["at"] - log[i]["at"] >= log[i]["retry_after"]
+
+
+def test_open_breaker_routes_to_fallback_model():
+    failures = get_settings().LLM_BREAKER_FAILURES
+    app = create_app(first_token_ms=10, token_ms=0, failing_models=(PRIMARY,))
+
+    async def scenario(gateway, client):
+        for _ in range(5):
+            assert await ask(client) == ANSWER
+
+    with FakeGroqServer(app=app) as server:
+        gateway = run(server, scenario, fallback_model=FALLBACK, max_retries=failures)
+
+    models = [request["model"] for request in app.state.log]
+    # The primary is tried until its circuit opens, then every call goes to the fallback
+    assert models == [PRIMARY] * failures + [FALLBACK] * 5
+    assert gateway.breakers[PRIMARY].state == "open"
+    assert gateway.counts["fallback"] == 5
+
+
+def test_hedge_fires_after_percentile_delay():
+    hedge_after = 0.3
+    # The primary takes 2s, the fallback 50ms
+    app = create_app(first_token_ms=50, token_ms=0, model_latency={PRIMARY: 40})
+
+    async def scenario(gateway, client):
+        prime_latency(gateway, hedge_after)
+        assert await ask(client) == ANSWER
+
+    with FakeGroqServer(app=app) as server:
+        gateway = run(server, scenario, fallback_model=FALLBACK, hedge=True)
+
+    primary, hedge = app.state.log
+    assert (primary["model"], hedge["model"]) == (PRIMARY, FALLBACK)
+    # Arrival times include each request's own transport delay
+    assert hedge_after - 0.05 <= hedge["at"] - primary["at"] < hedge_after + 0.5
+    assert gateway.counts["hedged"] == gateway.counts["hedge_won"] == 1
+
+
+def test_hedge_without_slot_waits_for_primary():
+    app = create_app(first_token_ms=300, token_ms=0)
+
+    async def scenario(gateway, client):
+        prime_latency(gateway, 0.05)
+        acquire = gateway._acquire_slot
+        calls = 0
+
+        async def first_slot_only(deadline):
+            # The primary gets its slot; the hedge finds none before the deadline
+            nonlocal calls
+            calls += 1
+            if calls > 1:
+                raise LLMUnavailable("No LLM call slot before the deadline")
+            await acquire(deadline)
+
+        gateway._acquire_slot = first_slot_only
+        assert await ask(client) == ANSWER
+        assert gateway.in_flight == 0
+
+    with FakeGroqServer(app=app) as server:
+        gateway = run(server, scenario, fallback_model=FALLBACK, hedge=True)
+
+    assert [request["model"] for request in app.state.log] == [PRIMARY]
+    assert gateway.counts["hedged"] == 0
+
+
+@pytest.mark.parametrize("hedge", [False, True])
+def test_cancelled_call_releases_slots(hedge):
+    app = create_app(first_token_ms=2000, token_ms=0)
+
+    async def scenario(gateway, client):
+        prime_latency(gateway, 0.1)
+        task = asyncio.create_task(ask(client))
+        # Both the primary and the hedge hold a slot once the hedge is sent
+        expected = 2 if hedge else 1
+        for _ in range(100):
+            if gateway.in_flight == expected:
+                break
+            await asyncio.sleep(0.01)
+        assert gateway.in_flight == expected
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert gateway.in_flight == 0
+
+    with FakeGroqServer(app=app) as server:
+        gateway = run(server, scenario, fallback_model=FALLBACK, hedge=hedge, max_concurrency=4)
+
+    assert gateway._slots._value == gateway.max_concurrency
+    assert gateway.breakers[PRIMARY].state == "closed"